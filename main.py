@@ -9,7 +9,16 @@ import sdl2.ext
 # User Imports.
 from src.entities import GuiCore, Roomba, TileSet
 from src.logging import init_logging
-from src.misc import calc_trash_distances, calc_traveling_salesman, DataManager, handle_key_press, handle_mouse_click
+from src.misc import (
+    apply_tour_improvements,
+    calc_trash_distances,
+    calc_traveling_salesman,
+    DataManager,
+    handle_key_press,
+    handle_mouse_click,
+    run_tour_annealing,
+)
+from src.planning import TourImprover
 from src.systems import AISystem, MovementSystem, SoftwareRendererSystem
 
 
@@ -90,10 +99,19 @@ def main():
         # Update render window.
         world.process()
 
+        # Take any improved overall path found by background planning. Never waits on the planning itself.
+        # Otherwise, improve path directly, for a short time each frame.
+        if data_manager.tour_improver is not None:
+            apply_tour_improvements(data_manager)
+        else:
+            run_tour_annealing(data_manager)
+
         # Wait slightly until next tick.
         sdl2.SDL_Delay(10)
 
     # Call final library teardown logic.
+    if data_manager.tour_improver is not None:
+        data_manager.tour_improver.stop()
     sdl2.ext.quit()
 
 
@@ -169,6 +187,7 @@ def initialize_data():
         'gui_center_w': gui_center_w,
         'gui_center_h': gui_center_h,
         'optimal_counter': 999999,
+        'optimal_lower_bound': None,
         'total_move_counter': -1,
     }
     tile_data = {
@@ -224,6 +243,11 @@ def initialize_data():
     # Initialize GUI object data.
     data_manager.gui = GuiCore(data_manager)
 
+    # Start background planning, so that overall path keeps improving between frames.
+    if data_manager.background_tour_improvement:
+        data_manager.tour_improver = TourImprover()
+        data_manager.tour_improver.start()
+
     # Calculate path distances for initial setup.
     calc_trash_distances(data_manager)
     calc_traveling_salesman(data_manager)
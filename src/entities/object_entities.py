@@ -10,7 +10,7 @@ import sdl2.ext
 # User Imports.
 from .system_entities import AI, Movement, TrashPile, Walls
 from src.logging import init_logging
-from src.misc import calc_trash_distances, calc_traveling_salesman
+from src.misc import calc_trash_distances, calc_traveling_salesman, get_tile_index
 
 
 # Initialize logger.
@@ -150,12 +150,13 @@ class TileSet:
                     tile_y=row_index,
                 )
                 # Update graph data structure for tile.
+                # Graph only holds tile adjacency. Whether an edge is blocked is held by the data manager wall grid.
                 node_id = self.get_tile_id(tile)
                 data_manager.graph.add_node(node_id)
                 if col_index > 0:
-                    data_manager.graph.add_edge(node_id, self.get_tile_id(tile, west_neighbor=True), open=True)
+                    data_manager.graph.add_edge(node_id, self.get_tile_id(tile, west_neighbor=True))
                 if row_index > 0:
-                    data_manager.graph.add_edge(node_id, self.get_tile_id(tile, north_neighbor=True), open=True)
+                    data_manager.graph.add_edge(node_id, self.get_tile_id(tile, north_neighbor=True))
 
                 # Add node to current row.
                 curr_row.append(tile)
@@ -168,7 +169,9 @@ class TileSet:
         logger.info('graph.number_of_edges(): {0}'.format(data_manager.graph.number_of_edges()))
         logger.info('graph.nodes(): {0}'.format(data_manager.graph.nodes(data=True)))
         logger.info('graph.edges(): {0}'.format(data_manager.graph.edges(data=True)))
-        logger.info('graph.neighbors(1, 1): {0}'.format(list(data_manager.graph.neighbors('1, 1'))))
+        logger.info('graph.neighbors(1, 1): {0}'.format(
+            list(data_manager.graph.neighbors(get_tile_index(data_manager, 1, 1))),
+        ))
         logger.info('')
 
     def get_tile_id(self, tile, north_neighbor=False, east_neighbor=False, south_neighbor=False, west_neighbor=False):
@@ -179,7 +182,7 @@ class TileSet:
         :param east_neighbor: Bool indicating if we instead get id of neighbor to direct east.
         :param south_neighbor: Bool indicating if we instead get id of neighbor to direct south.
         :param west_neighbor: Bool indicating if we instead get id of neighbor to direct west.
-        :return: Corresponding identifier for graph data structure.
+        :return: Corresponding identifier for graph data structure. This is the packed integer tile index.
         """
         # Validate kwargs.
         neighbor_check = 0
@@ -232,7 +235,7 @@ class TileSet:
                 raise ValueError('Tile "{0}, {1}" does not have western neighbor!'.format(tile_x, tile_y))
 
         # Convert into expected format.
-        id = '{0}, {1}'.format(tile_x, tile_y)
+        id = get_tile_index(self.data_manager, tile_x, tile_y)
         logger.info('    found_id: "{0}"'.format(id))
         return id
 
@@ -275,7 +278,7 @@ class TileSet:
 
         # Recalculate path distances for new wall setup.
         calc_trash_distances(self.data_manager)
-        calc_traveling_salesman(self.data_manager)
+        calc_traveling_salesman(self.data_manager, multi_start=True)
 
     def randomize_trash(self):
         """
@@ -301,7 +304,7 @@ class TileSet:
 
         # Recalculate path distances for new trash pile setup.
         calc_trash_distances(self.data_manager)
-        calc_traveling_salesman(self.data_manager)
+        calc_traveling_salesman(self.data_manager, multi_start=True)
 
 
 class Trash(sdl2.ext.Entity):
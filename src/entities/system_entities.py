@@ -8,7 +8,8 @@ import random
 
 # User Imports.
 from src.logging import init_logging
-from src.misc import get_tile_coord_from_id
+from src.misc import build_flood_fill_kernel, get_tile_coord_from_index, get_tile_index
+from src.pathing import WALL_EAST, WALL_NORTH, WALL_SOUTH, WALL_WEST
 
 
 # Initialize logger.
@@ -103,22 +104,21 @@ class AI:
 class Walls:
     """
     Holds tile wall data for a "tile" entity.
+
+    Actual wall values live in the data manager's wall grid. This is only a view of the grid for a single tile, which
+    also keeps the tile's wall sprites in sync with it.
     """
     def __init__(self, data_manager, tile_x, tile_y, wall_data):
         self.data_manager = data_manager
         self.tile_x = tile_x
         self.tile_y = tile_y
+        self.tile_id = get_tile_index(data_manager, tile_x, tile_y)
         self.walls = wall_data
+        self._wall_grid = data_manager.wall_grid
 
         # Handle for edge tile walls. These walls should unconditionally display.
-        self.has_walls = False
-        self._wall_state = 0
         self._wall_state_max = 14
         self._disallowed_states = []
-        self._has_wall_north = False
-        self._has_wall_east = False
-        self._has_wall_south = False
-        self._has_wall_west = False
 
         if tile_y == 0:
             # Set north (upper) wall to active.
@@ -161,10 +161,15 @@ class Walls:
 
     # region Class Properties
 
+    @property
+    def has_walls(self):
+        logger.debug('Walls.has_walls()')
+        return self._wall_grid.cells[self.tile_id] != 0
+
     @property
     def wall_state(self):
         logger.debug('Walls.wall_state()')
-        return self._wall_state
+        return self._wall_grid.get_state(self.tile_id)
 
     @wall_state.setter
     def wall_state(self, value):
@@ -178,118 +183,13 @@ class Walls:
                 value,
             ))
 
-        self._wall_state = value
-
-        # Update internal wall data, based on state.
-        if value == 0:
-            # Set all walls to inactive.
-            self.has_wall_north = False
-            self.has_wall_east = False
-            self.has_wall_south = False
-            self.has_wall_west = False
-
-        elif value == 1:
-            # Set only north wall to active.
-            self.has_wall_north = True
-            self.has_wall_east = False
-            self.has_wall_south = False
-            self.has_wall_west = False
-
-        elif value == 2:
-            # Set only east wall to active.
-            self.has_wall_north = False
-            self.has_wall_east = True
-            self.has_wall_south = False
-            self.has_wall_west = False
-
-        elif value == 3:
-            # Set only south wall to active.
-            self.has_wall_north = False
-            self.has_wall_east = False
-            self.has_wall_south = True
-            self.has_wall_west = False
-
-        elif value == 4:
-            # Set only west wall to active.
-            self.has_wall_north = False
-            self.has_wall_east = False
-            self.has_wall_south = False
-            self.has_wall_west = True
-
-        elif value == 5:
-            # Set north and east walls to active.
-            self.has_wall_north = True
-            self.has_wall_east = True
-            self.has_wall_south = False
-            self.has_wall_west = False
-
-        elif value == 6:
-            # Set north and south walls to active.
-            self.has_wall_north = True
-            self.has_wall_east = False
-            self.has_wall_south = True
-            self.has_wall_west = False
-
-        elif value == 7:
-            # Set north and west walls to active.
-            self.has_wall_north = True
-            self.has_wall_east = False
-            self.has_wall_south = False
-            self.has_wall_west = True
-
-        elif value == 8:
-            # Set east and south walls to active.
-            self.has_wall_north = False
-            self.has_wall_east = True
-            self.has_wall_south = True
-            self.has_wall_west = False
-
-        elif value == 9:
-            # Set east and west walls to active.
-            self.has_wall_north = False
-            self.has_wall_east = True
-            self.has_wall_south = False
-            self.has_wall_west = True
-
-        elif value == 10:
-            # Set south and west walls to active.
-            self.has_wall_north = False
-            self.has_wall_east = False
-            self.has_wall_south = True
-            self.has_wall_west = True
-
-        elif value == 11:
-            # Set all except north to active.
-            self.has_wall_north = False
-            self.has_wall_east = True
-            self.has_wall_south = True
-            self.has_wall_west = True
-
-        elif value == 12:
-            # Set all except east to active.
-            self.has_wall_north = True
-            self.has_wall_east = False
-            self.has_wall_south = True
-            self.has_wall_west = True
-
-        elif value == 13:
-            # Set all except south to active.
-            self.has_wall_north = True
-            self.has_wall_east = True
-            self.has_wall_south = False
-            self.has_wall_west = True
-
-        elif value == 14:
-            # Set all except west to active.
-            self.has_wall_north = True
-            self.has_wall_east = True
-            self.has_wall_south = True
-            self.has_wall_west = False
+        # Update wall grid. Grid also handles updating walls of adjacent tiles.
+        self._update_sprites(self._wall_grid.set_state(self.tile_id, value))
 
     @property
     def has_wall_north(self):
         logger.debug('Walls.has_wall_north()')
-        return self._has_wall_north
+        return self._wall_grid.has_wall(self.tile_id, WALL_NORTH)
 
     @has_wall_north.setter
     def has_wall_north(self, value):
@@ -298,288 +198,49 @@ class Walls:
         if not isinstance(value, bool):
             raise TypeError('Must be boolean.')
 
-        # Handle value.
-        if value:
-            # Setting to True.
-
-            # Update wall displaying/rendering.
-            self.walls['north'].sprite.depth = self.data_manager.sprite_depth['wall']
-
-            # Update tile management variables.
-            self.has_walls = True
-            self._has_wall_north = True
-            self._wall_state = self.get_new_state()
-
-            # Check if full tileset has been initialized. Otherwise skip further logic.
-            if self.data_manager.tile_set:
-
-                # Update adjacent tile variables.
-                if self.tile_y > 0:
-                    adj_tile = self.data_manager.tile_set.tiles[self.tile_y - 1][self.tile_x]
-                    # Prevent infinite loops.
-                    if not adj_tile.walls.has_wall_south:
-                        adj_tile.walls.has_wall_south = True
-
-                # Update graph data structure. This is used for search algorithms.
-                if self.tile_y > 0:
-                    curr_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
-                    neighbor_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y - 1)
-                    self.data_manager.graph[curr_tile_id][neighbor_tile_id]['open'] = False
-
-        else:
-            # Setting to False.
-
-            # Update wall displaying/rendering.
-            self.walls['north'].sprite.depth = self.data_manager.sprite_depth['inactive']
-
-            # Update tile management variables.
-            self._has_wall_north = False
-            self._wall_state = self.get_new_state()
-            if (
-                not self.has_wall_north and
-                not self.has_wall_east and
-                not self.has_wall_south and
-                not self.has_wall_west
-            ):
-                self.has_walls = False
-
-            # Check if full tileset has been initialized. Otherwise skip further logic.
-            if self.data_manager.tile_set:
-
-                # Update adjacent tile variables.
-                if self.tile_y > 0:
-                    adj_tile = self.data_manager.tile_set.tiles[self.tile_y - 1][self.tile_x]
-                    # Prevent infinite loops.
-                    if adj_tile.walls.has_wall_south:
-                        adj_tile.walls.has_wall_south = False
-
-                # Update graph data structure. This is used for search algorithms.
-                if self.tile_y > 0:
-                    curr_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
-                    neighbor_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y - 1)
-                    self.data_manager.graph[curr_tile_id][neighbor_tile_id]['open'] = True
+        self._update_sprites(self._wall_grid.set_wall(self.tile_id, WALL_NORTH, value))
 
     @property
     def has_wall_east(self):
         logger.debug('Walls.has_wall_east()')
-        return self._has_wall_east
+        return self._wall_grid.has_wall(self.tile_id, WALL_EAST)
 
     @has_wall_east.setter
     def has_wall_east(self, value):
         logger.debug('Walls.has_wall_east()')
-
         # Validate passed value.
         if not isinstance(value, bool):
             raise TypeError('Must be boolean.')
 
-        # Handle value.
-        if value:
-            # Setting to True.
-
-            # Update wall displaying/rendering.
-            self.walls['east'].sprite.depth = self.data_manager.sprite_depth['wall']
-
-            # Update tile management variables.
-            self.has_walls = True
-            self._has_wall_east = True
-            self._wall_state = self.get_new_state()
-
-            # Check if full tileset has been initialized. Otherwise skip further logic.
-            if self.data_manager.tile_set:
-
-                # Update adjacent tile variables.
-                if self.tile_x < (self.data_manager.tile_data['tile_w_count'] - 1):
-                    adj_tile = self.data_manager.tile_set.tiles[self.tile_y][self.tile_x + 1]
-                    # Prevent infinite loops.
-                    if not adj_tile.walls.has_wall_west:
-                        adj_tile.walls.has_wall_west = True
-
-                # Update graph data structure. This is used for search algorithms.
-                if self.tile_x < (self.data_manager.tile_data['tile_w_count'] - 1):
-                    curr_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
-                    neighbor_tile_id = '{0}, {1}'.format(self.tile_x + 1, self.tile_y)
-                    self.data_manager.graph[curr_tile_id][neighbor_tile_id]['open'] = False
-
-        else:
-            # Setting to False.
-
-            # Update wall displaying/rendering.
-            self.walls['east'].sprite.depth = self.data_manager.sprite_depth['inactive']
-
-            # Update tile management variables.
-            self._has_wall_east = False
-            self._wall_state = self.get_new_state()
-            if (
-                not self.has_wall_north and
-                not self.has_wall_east and
-                not self.has_wall_south and
-                not self.has_wall_west
-            ):
-                self.has_walls = False
-
-            # Check if full tileset has been initialized. Otherwise skip further logic.
-            if self.data_manager.tile_set:
-
-                # Update adjacent tile variables.
-                if self.tile_x < (self.data_manager.tile_data['tile_w_count'] - 1):
-                    adj_tile = self.data_manager.tile_set.tiles[self.tile_y][self.tile_x + 1]
-                    # Prevent infinite loops.
-                    if adj_tile.walls.has_wall_west:
-                        adj_tile.walls.has_wall_west = False
-
-                # Update graph data structure. This is used for search algorithms.
-                if self.tile_x < (self.data_manager.tile_data['tile_w_count'] - 1):
-                    curr_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
-                    neighbor_tile_id = '{0}, {1}'.format(self.tile_x + 1, self.tile_y)
-                    self.data_manager.graph[curr_tile_id][neighbor_tile_id]['open'] = True
+        self._update_sprites(self._wall_grid.set_wall(self.tile_id, WALL_EAST, value))
 
     @property
     def has_wall_south(self):
         logger.debug('Walls.has_wall_south()')
-        return self._has_wall_south
+        return self._wall_grid.has_wall(self.tile_id, WALL_SOUTH)
 
     @has_wall_south.setter
     def has_wall_south(self, value):
         logger.debug('Walls.has_wall_south()')
-
         # Validate passed value.
         if not isinstance(value, bool):
             raise TypeError('Must be boolean.')
 
-        # Handle value.
-        if value:
-            # Setting to True.
-
-            # Update wall displaying/rendering.
-            self.walls['south'].sprite.depth = self.data_manager.sprite_depth['wall']
-
-            # Update tile management variables.
-            self.has_walls = True
-            self._has_wall_south = True
-            self._wall_state = self.get_new_state()
-
-            # Check if full tileset has been initialized. Otherwise skip further logic.
-            if self.data_manager.tile_set:
-
-                # Update adjacent tile variables.
-                if self.tile_y < (self.data_manager.tile_data['tile_h_count'] - 1):
-                    adj_tile = self.data_manager.tile_set.tiles[self.tile_y + 1][self.tile_x]
-                    # Prevent infinite loops.
-                    if not adj_tile.walls.has_wall_north:
-                        adj_tile.walls.has_wall_north = True
-
-                # Update graph data structure. This is used for search algorithms.
-                if self.tile_y < (self.data_manager.tile_data['tile_h_count'] - 1):
-                    curr_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
-                    neighbor_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y + 1)
-                    self.data_manager.graph[curr_tile_id][neighbor_tile_id]['open'] = False
-
-        else:
-            # Setting to False.
-
-            # Update wall displaying/rendering.
-            self.walls['south'].sprite.depth = self.data_manager.sprite_depth['inactive']
-
-            # Update tile management variables.
-            self._has_wall_south = False
-            self._wall_state = self.get_new_state()
-            if (
-                not self.has_wall_north and
-                not self.has_wall_east and
-                not self.has_wall_south and
-                not self.has_wall_west
-            ):
-                self.has_walls = False
-
-            # Check if full tileset has been initialized. Otherwise skip further logic.
-            if self.data_manager.tile_set:
-
-                # Update adjacent tile variables.
-                if self.tile_y < (self.data_manager.tile_data['tile_h_count'] - 1):
-                    adj_tile = self.data_manager.tile_set.tiles[self.tile_y + 1][self.tile_x]
-                    # Prevent infinite loops.
-                    if adj_tile.walls.has_wall_north:
-                        adj_tile.walls.has_wall_north = False
-
-                # Update graph data structure. This is used for search algorithms.
-                if self.tile_y < (self.data_manager.tile_data['tile_h_count'] - 1):
-                    curr_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
-                    neighbor_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y + 1)
-                    self.data_manager.graph[curr_tile_id][neighbor_tile_id]['open'] = True
+        self._update_sprites(self._wall_grid.set_wall(self.tile_id, WALL_SOUTH, value))
 
     @property
     def has_wall_west(self):
         logger.debug('Walls.has_wall_west()')
-        return self._has_wall_west
+        return self._wall_grid.has_wall(self.tile_id, WALL_WEST)
 
     @has_wall_west.setter
     def has_wall_west(self, value):
         logger.debug('Walls.has_wall_west()')
-
         # Validate passed value.
         if not isinstance(value, bool):
             raise TypeError('Must be boolean.')
 
-        # Handle value.
-        if value:
-            # Setting to True.
-
-            # Update wall displaying/rendering.
-            self.walls['west'].sprite.depth = self.data_manager.sprite_depth['wall']
-
-            # Update tile management variables.
-            self.has_walls = True
-            self._has_wall_west = True
-            self._wall_state = self.get_new_state()
-
-            # Check if full tileset has been initialized. Otherwise skip further logic.
-            if self.data_manager.tile_set:
-
-                # Update adjacent tile variables.
-                if self.tile_x > 0:
-                    adj_tile = self.data_manager.tile_set.tiles[self.tile_y][self.tile_x - 1]
-                    # Prevent infinite loops.
-                    if not adj_tile.walls.has_wall_east:
-                        adj_tile.walls.has_wall_east = True
-
-                # Update graph data structure. This is used for search algorithms.
-                if self.tile_x > 0:
-                    curr_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
-                    neighbor_tile_id = '{0}, {1}'.format(self.tile_x - 1, self.tile_y)
-                    self.data_manager.graph[curr_tile_id][neighbor_tile_id]['open'] = False
-
-        else:
-            # Setting to False.
-
-            # Update wall displaying/rendering.
-            self.walls['west'].sprite.depth = self.data_manager.sprite_depth['inactive']
-
-            # Update tile management variables.
-            self._has_wall_west = False
-            self._wall_state = self.get_new_state()
-            if (
-                not self.has_wall_north and
-                not self.has_wall_east and
-                not self.has_wall_south and
-                not self.has_wall_west
-            ):
-                self.has_walls = False
-
-            # Check if full tileset has been initialized. Otherwise skip further logic.
-            if self.data_manager.tile_set:
-
-                # Update adjacent tile variables.
-                if self.tile_x > 0:
-                    adj_tile = self.data_manager.tile_set.tiles[self.tile_y][self.tile_x - 1]
-                    # Prevent infinite loops.
-                    if adj_tile.walls.has_wall_east:
-                        adj_tile.walls.has_wall_east = False
-
-                # Update graph data structure. This is used for search algorithms.
-                if self.tile_x > 0:
-                    curr_tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
-                    neighbor_tile_id = '{0}, {1}'.format(self.tile_x - 1, self.tile_y)
-                    self.data_manager.graph[curr_tile_id][neighbor_tile_id]['open'] = True
+        self._update_sprites(self._wall_grid.set_wall(self.tile_id, WALL_WEST, value))
 
     # endregion Class Properties
 
@@ -687,7 +348,7 @@ class Walls:
             curr_problem_child = red_tiles.pop(0)
 
             # Get actual problem tile.
-            pos_x, pos_y = get_tile_coord_from_id(curr_problem_child)
+            pos_x, pos_y = get_tile_coord_from_index(self.data_manager, curr_problem_child)
             tile = self.data_manager.tile_set.tiles[pos_y][pos_x]
 
             # Fetch neighbor tiles.
@@ -696,7 +357,7 @@ class Walls:
             # Check if north is green.
             if is_red and pos_y > 0:
                 north_neighbor = self.data_manager.tile_set.tiles[pos_y - 1][pos_x]
-                north_id = '{0}, {1}'.format(north_neighbor.sprite.tile[0], north_neighbor.sprite.tile[1])
+                north_id = get_tile_index(self.data_manager, *north_neighbor.sprite.tile)
 
                 if north_id in green_tiles:
                     # North is green. Break wall and set to green also.
@@ -707,7 +368,7 @@ class Walls:
             # Check if east is green.
             if is_red and pos_x < (self.data_manager.tile_data['tile_w_count'] - 1):
                 east_neighbor = self.data_manager.tile_set.tiles[pos_y][pos_x + 1]
-                east_id = '{0}, {1}'.format(east_neighbor.sprite.tile[0], east_neighbor.sprite.tile[1])
+                east_id = get_tile_index(self.data_manager, *east_neighbor.sprite.tile)
 
                 if east_id in green_tiles:
                     # East is green. Break wall and set to green also.
@@ -718,7 +379,7 @@ class Walls:
             # Check if south is green.
             if is_red and pos_y < (self.data_manager.tile_data['tile_h_count'] - 1):
                 south_neighbor = self.data_manager.tile_set.tiles[pos_y + 1][pos_x]
-                south_id = '{0}, {1}'.format(south_neighbor.sprite.tile[0], south_neighbor.sprite.tile[1])
+                south_id = get_tile_index(self.data_manager, *south_neighbor.sprite.tile)
 
                 if south_id in green_tiles:
                     # South is green. Break wall and set to green also.
@@ -729,7 +390,7 @@ class Walls:
             # Check if west is green.
             if is_red and pos_x > 0:
                 west_neighbor = self.data_manager.tile_set.tiles[pos_y][pos_x - 1]
-                west_id = '{0}, {1}'.format(west_neighbor.sprite.tile[0], west_neighbor.sprite.tile[1])
+                west_id = get_tile_index(self.data_manager, *west_neighbor.sprite.tile)
 
                 if west_id in green_tiles:
                     # West is green. Break wall and set to green also.
@@ -756,73 +417,13 @@ class Walls:
         # Get roomba location.
         roomba_x, roomba_y = self.data_manager.roomba.sprite.tile
 
-        # Initialize all tiles to "red".
-        graph = self.data_manager.graph
-        red_tiles = list(graph.nodes())
-        green_tiles = []
-        pending_tile_list = []
-
-        # Start by setting roomba tile to "green".
-        tile_id = '{0}, {1}'.format(roomba_x, roomba_y)
-        green_tiles.append(tile_id)
-        red_tiles.remove(tile_id)
-        pending_tile_list.append(tile_id)
-
-        # Loop through pending list until it's empty.
-        # Here, we loop through all "green" tiles, checking for additional connected tiles to set to "green".
-        while len(pending_tile_list) > 0:
-
-            # Grab tile at start of list.
-            tile_id = pending_tile_list.pop(0)
-            pos_x, pos_y = get_tile_coord_from_id(tile_id)
-
-            # Get literal tile entity.
-            curr_tile = self.data_manager.tile_set.tiles[pos_y][pos_x]
-
-            # Fetch neighbor tiles.
-            if not curr_tile.walls.has_wall_north and pos_y > 0:
-                # North tile is connected.
-                north_neighbor = self.data_manager.tile_set.tiles[pos_y - 1][pos_x]
-                north_id = '{0}, {1}'.format(north_neighbor.sprite.tile[0], north_neighbor.sprite.tile[1])
-
-                # Set tile to "green", if not already.
-                if north_id in red_tiles:
-                    green_tiles.append(north_id)
-                    red_tiles.remove(north_id)
-                    pending_tile_list.append(north_id)
-
-            if not curr_tile.walls.has_wall_east and self.tile_y < (self.data_manager.tile_data['tile_w_count'] + 1):
-                # East tile is connected.
-                east_neighbor = self.data_manager.tile_set.tiles[pos_y][pos_x + 1]
-                east_id = '{0}, {1}'.format(east_neighbor.sprite.tile[0], east_neighbor.sprite.tile[1])
+        # Flood fill outwards from roomba tile. Every tile reached is "green".
+        kernel = build_flood_fill_kernel(self.data_manager)
+        green_mask = kernel.calc_reachable(kernel.get_index(roomba_x, roomba_y))
 
-                # Set tile to "green", if not already.
-                if east_id in red_tiles:
-                    green_tiles.append(east_id)
-                    red_tiles.remove(east_id)
-                    pending_tile_list.append(east_id)
-
-            if not curr_tile.walls.has_wall_south and self.tile_y < (self.data_manager.tile_data['tile_h_count'] - 1):
-                # South tile is connected.
-                south_neighbor = self.data_manager.tile_set.tiles[pos_y + 1][pos_x]
-                south_id = '{0}, {1}'.format(south_neighbor.sprite.tile[0], south_neighbor.sprite.tile[1])
-
-                # Set tile to "green", if not already.
-                if south_id in red_tiles:
-                    green_tiles.append(south_id)
-                    red_tiles.remove(south_id)
-                    pending_tile_list.append(south_id)
-
-            if not curr_tile.walls.has_wall_west and pos_x > 0:
-                # West tile is connected.
-                west_neighbor = self.data_manager.tile_set.tiles[pos_y][pos_x - 1]
-                west_id = '{0}, {1}'.format(west_neighbor.sprite.tile[0], west_neighbor.sprite.tile[1])
-
-                # Set tile to "green", if not already.
-                if west_id in red_tiles:
-                    green_tiles.append(west_id)
-                    red_tiles.remove(west_id)
-                    pending_tile_list.append(west_id)
+        # Sort tiles into their respective colors. Tile ids match kernel bit indexes.
+        green_tiles = list(kernel.iter_indexes(green_mask))
+        red_tiles = list(kernel.iter_indexes(kernel.full_mask & ~green_mask))
 
         return green_tiles, red_tiles
 
@@ -875,145 +476,39 @@ class Walls:
     def get_new_state(self):
         """
         Determine new state counter, based on internal wall data.
-        :return:
+        :return: Wall state value (0-14) of tile.
         """
         logger.debug('Walls.get_new_state()')
+        return self._wall_grid.get_state(self.tile_id)
+
+    def update_wall_sprites(self):
+        """
+        Updates display of tile wall sprites, to match current wall grid values.
+        """
+        wall_mask = self._wall_grid.cells[self.tile_id]
+        for direction, wall in (('north', WALL_NORTH), ('east', WALL_EAST), ('south', WALL_SOUTH), ('west', WALL_WEST)):
+            if wall_mask & wall:
+                self.walls[direction].sprite.depth = self.data_manager.sprite_depth['wall']
+            else:
+                self.walls[direction].sprite.depth = self.data_manager.sprite_depth['inactive']
+
+    def _update_sprites(self, changed_tile_ids):
+        """
+        Updates wall sprites of all tiles changed by a wall grid update.
+        :param changed_tile_ids: List of ids of tiles that had their walls change.
+        """
+        # Any wall change invalidates routes that were planned around the old walls.
+        if changed_tile_ids:
+            self.data_manager.environment_version += 1
+
+        for tile_id in changed_tile_ids:
+            if tile_id == self.tile_id:
+                self.update_wall_sprites()
 
-        # All walls inactive.
-        if (
-
-            self.has_wall_north is False and
-            self.has_wall_east is False and
-            self.has_wall_south is False and
-            self.has_wall_west is False
-        ):
-            return 0
-
-        # Only north wall active.
-        elif (
-            self.has_wall_north is True and
-            self.has_wall_east is False and
-            self.has_wall_south is False and
-            self.has_wall_west is False
-        ):
-            return 1
-
-        # Only east wall active.
-        elif (
-            self.has_wall_north is False and
-            self.has_wall_east is True and
-            self.has_wall_south is False and
-            self.has_wall_west is False
-        ):
-            return 2
-
-        # Only south wall active.
-        elif (
-            self.has_wall_north is False and
-            self.has_wall_east is False and
-            self.has_wall_south is True and
-            self.has_wall_west is False
-        ):
-            return 3
-
-        # Only west wall active.
-        elif (
-            self.has_wall_north is False and
-            self.has_wall_east is False and
-            self.has_wall_south is False and
-            self.has_wall_west is True
-        ):
-            return 4
-
-        # North and east walls active.
-        elif (
-            self.has_wall_north is True and
-            self.has_wall_east is True and
-            self.has_wall_south is False and
-            self.has_wall_west is False
-        ):
-            return 5
-
-        # North and south walls active.
-        elif (
-            self.has_wall_north is True and
-            self.has_wall_east is False and
-            self.has_wall_south is True and
-            self.has_wall_west is False
-        ):
-            return 6
-
-        # North and west walls active.
-        elif (
-            self.has_wall_north is True and
-            self.has_wall_east is False and
-            self.has_wall_south is False and
-            self.has_wall_west is True
-        ):
-            return 7
-
-        # East and south walls active.
-        elif (
-            self.has_wall_north is False and
-            self.has_wall_east is True and
-            self.has_wall_south is True and
-            self.has_wall_west is False
-        ):
-            return 8
-
-        # East and west walls active.
-        elif (
-            self.has_wall_north is False and
-            self.has_wall_east is True and
-            self.has_wall_south is False and
-            self.has_wall_west is True
-        ):
-            return 9
-
-        # South and west walls active.
-        elif (
-            self.has_wall_north is False and
-            self.has_wall_east is False and
-            self.has_wall_south is True and
-            self.has_wall_west is True
-        ):
-            return 10
-
-        # All except north wall active.
-        elif (
-            self.has_wall_north is False and
-            self.has_wall_east is True and
-            self.has_wall_south is True and
-            self.has_wall_west is True
-        ):
-            return 11
-
-        # All except east wall active.
-        elif (
-            self.has_wall_north is True and
-            self.has_wall_east is False and
-            self.has_wall_south is True and
-            self.has_wall_west is True
-        ):
-            return 12
-
-        # All except south wall active.
-        elif (
-            self.has_wall_north is True and
-            self.has_wall_east is True and
-            self.has_wall_south is False and
-            self.has_wall_west is True
-        ):
-            return 13
-
-        # All except west wall active.
-        elif (
-            self.has_wall_north is True and
-            self.has_wall_east is True and
-            self.has_wall_south is True and
-            self.has_wall_west is False
-        ):
-            return 14
+            # Check if full tileset has been initialized. Otherwise adjacent tiles don't exist yet.
+            elif self.data_manager.tile_set:
+                tile_x, tile_y = get_tile_coord_from_index(self.data_manager, tile_id)
+                self.data_manager.tile_set.tiles[tile_y][tile_x].walls.update_wall_sprites()
 
     # region Random Wall Assignment
 
@@ -1237,9 +732,10 @@ class TrashPile:
 
                 # Update internal trackers.
                 self.exists = True
+                self.data_manager.environment_version += 1
 
                 # Update graph data.
-                tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
+                tile_id = get_tile_index(self.data_manager, self.tile_x, self.tile_y)
                 if tile_id not in self.data_manager.graph.data['trash_tiles']:
                     self.data_manager.graph.data['trash_tiles'].append(tile_id)
 
@@ -1261,7 +757,7 @@ class TrashPile:
             self.exists = False
 
             # Update trash entity data.
-            tile_id = '{0}, {1}'.format(self.tile_x, self.tile_y)
+            tile_id = get_tile_index(self.data_manager, self.tile_x, self.tile_y)
             self.data_manager.graph.data['trash_tiles'].remove(tile_id)
             # Remove tile from path ordering, if present.
             if tile_id in self.data_manager.ideal_overall_path['ordering']:
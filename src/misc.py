@@ -11,11 +11,48 @@ Sprite Depth Values (0 is lowest. Higher values will display ontop of lower ones
 """
 
 # System Imports.
-import sdl2.ext
-import networkx, random
+import logging, sdl2.ext
+import networkx
 
 # User Imports.
 from src.logging import init_logging
+from src.pathing import (
+    calc_distance_field,
+    calc_distance_fields,
+    CandidateDistanceTable,
+    DistanceTable,
+    FloodFillKernel,
+    MIN_PARALLEL_WORK,
+    PATHING_MODES,
+    RouteCursor,
+    UNREACHABLE,
+    WALL_EAST,
+    WALL_NORTH,
+    WALL_SOUTH,
+    WALL_WEST,
+    WallGrid,
+)
+from src.planning import (
+    add_cluster_nodes,
+    build_candidate_tour,
+    build_cost_matrix,
+    calc_branch_and_bound_tour,
+    calc_exact_tour,
+    calc_hierarchical_tour,
+    calc_initial_tour,
+    calc_multi_start_tour,
+    calc_tour_clusters,
+    calc_tour_cost,
+    calc_tour_lower_bound,
+    CandidateMatrix,
+    CONSTRUCTION_METHODS,
+    ConvergenceMonitor,
+    improve_candidate_tour,
+    improve_lin_kernighan,
+    IMPROVEMENT_METHODS,
+    repair_tour,
+    TourAnnealer,
+)
 
 
 # Initialize logger.
@@ -48,8 +85,36 @@ class DataManager:
         self.ai_active = False
         self.ai_can_fail = False
         self.roomba_vision = 2
-        self.ideal_trash_paths = None
+        self.pathing_mode = 'flood_fill'
+        self.pathing_workers = None
+        self.min_parallel_work = MIN_PARALLEL_WORK
+        self.exact_tour_max_trash = 12
+        self.branch_and_bound_max_trash = 40
+        self.branch_and_bound_budget_ms = 250
+        self.tour_construction_methods = list(CONSTRUCTION_METHODS)
+        self.tour_improvement_method = 'lin_kernighan'
+        self.background_tour_improvement = True
+        self.tour_anneal_budget_ms = 5
+        self.multi_start_count = 4
+        self.tour_bound_iterations = 50
+        self.tour_bound_stall_iterations = 10
+        self.tour_stall_steps_per_node = 500
+        self.tour_min_improvement_per_ms = 0.001
+        self.tour_target_gap = None
+        self.sparse_planning_min_trash = 200
+        self.candidate_neighbor_count = 10
+        self.hierarchical_planning_min_trash = 1000
+        self.tour_cluster_size = 40
+        self.multi_start_seed = 0
+        self.tour_annealer = None
+        self.tour_improver = None
+        self.tour_bound_penalties = None
+        self.trash_distances = None
         self.ideal_overall_path = None
+        self.tour_clusters = None
+        self.route_cursor = None
+        self.environment_version = 0
+        self.wall_grid = WallGrid(tile_data['tile_w_count'], tile_data['tile_h_count'])
         self.graph = networkx.Graph()
         self.graph.data = {
             'trash_tiles': []
@@ -137,6 +202,8 @@ def handle_mouse_click(data_manager, button_state, pos_x, pos_y):
 
         # Get clicked tile object.
         tile = data_manager.tile_set.tiles[tile_y][tile_x]
+        prev_wall_mask = data_manager.wall_grid.get_mask(tile.walls.tile_id)
+        had_trash = tile.trashpile.exists
 
         # Check what click type occurred.
         if button_state == 1:
@@ -154,6 +221,7 @@ def handle_mouse_click(data_manager, button_state, pos_x, pos_y):
             # Else if tile is empty and has trash, remove.
             elif tile.trashpile.exists:
                 tile.trashpile.clean()
+                data_manager.environment_version += 1
 
             # Otherwise reset wall state.
             else:
@@ -172,9 +240,15 @@ def handle_mouse_click(data_manager, button_state, pos_x, pos_y):
             logger.info('    Decrementing tile walls.')
             tile.walls.decrement_wall_state()
 
-        # Recalculate path distances for new tile wall setup.
-        calc_trash_distances(data_manager)
-        calc_traveling_salesman(data_manager)
+        # Recalculate path distances for new tile setup.
+        if tile.trashpile.exists == had_trash:
+            # Only walls changed. Repair existing distances where possible.
+            update_trash_distances_for_walls(data_manager, tile.walls.tile_id, prev_wall_mask)
+            calc_traveling_salesman(data_manager)
+        else:
+            # Only trash changed. Just add or drop the one tile's distances, then repair the existing path.
+            update_trash_distances_for_trash(data_manager)
+            repair_traveling_salesman(data_manager)
 
 
 def set_roomba_vision_range_0(data_manager):
@@ -250,10 +324,14 @@ def toggle_roomba_failure(data_manager):
 
 # region General Logic Functions
 
+# Tiles are identified by a single packed integer index of (y * tile_w_count + x). This is the id used by the graph,
+# trash tracking, and all pathing logic.
+# The "x, y" string ids below are only kept as a display/compatibility layer, and should be kept out of any hot loops.
+
 def get_tile_coord_from_id(tile_id):
     """
-    Parses tile id into respective integer coordinates.
-    :param tile_id: Identifier for tile.
+    Parses "x, y" string tile id into respective integer coordinates.
+    :param tile_id: String identifier for tile.
     :return: Tuple of (x_coord, y_coord) for tile.
     """
     logger.debug('get_tile_coord_from_id()')
@@ -266,9 +344,9 @@ def get_tile_coord_from_id(tile_id):
 
 def get_tile_from_id(data_manager, tile_id):
     """
-    Gets corresponding tile entity, from provided id.
+    Gets corresponding tile entity, from provided "x, y" string id.
     :param data_manager: Data manager data structure. Consolidates useful program data to one location.
-    :param tile_id: Id of tile to get entity for.
+    :param tile_id: String id of tile to get entity for.
     :return: Corresponding tile entity.
     """
     logger.debug('get_tile_from_id()')
@@ -278,10 +356,10 @@ def get_tile_from_id(data_manager, tile_id):
 
 def get_id_from_coord(tile_x, tile_y):
     """
-    Get corresponding tile id, from tile coordinates.
+    Get corresponding "x, y" string tile id, from tile coordinates.
     :param tile_x: Tile x coordinate.
     :param tile_y: Tile y coordinate.
-    :return: Corresponding tile id.
+    :return: Corresponding string tile id.
     """
     logger.debug('get_id_from_coord()')
     return '{0}, {1}'.format(tile_x, tile_y)
@@ -289,15 +367,58 @@ def get_id_from_coord(tile_x, tile_y):
 
 def get_id_from_tile(tile_entity):
     """
-    Gets corresponding tile id, from provided tile entity.
+    Gets corresponding "x, y" string tile id, from provided tile entity.
     :param tile_entity: Tile entity to generate id for.
-    :return: Corresponding tile id.
+    :return: Corresponding string tile id.
     """
     logger.debug('get_id_from_tile()')
     tile_x, tile_y = tile_entity.sprite.tile
     return get_id_from_coord(tile_x, tile_y)
 
 
+def get_tile_index(data_manager, tile_x, tile_y):
+    """
+    Get corresponding tile index (the canonical tile id), from tile coordinates.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param tile_x: Tile x coordinate.
+    :param tile_y: Tile y coordinate.
+    :return: Corresponding tile index.
+    """
+    return tile_y * data_manager.tile_data['tile_w_count'] + tile_x
+
+
+def get_tile_coord_from_index(data_manager, tile_index):
+    """
+    Parses tile index (the canonical tile id) into respective integer coordinates.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param tile_index: Index of tile.
+    :return: Tuple of (x_coord, y_coord) for tile.
+    """
+    tile_y, tile_x = divmod(tile_index, data_manager.tile_data['tile_w_count'])
+    return tile_x, tile_y
+
+
+def get_tile_from_index(data_manager, tile_index):
+    """
+    Gets corresponding tile entity, from provided tile index.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param tile_index: Index of tile to get entity for.
+    :return: Corresponding tile entity.
+    """
+    tile_x, tile_y = get_tile_coord_from_index(data_manager, tile_index)
+    return data_manager.tile_set.tiles[tile_y][tile_x]
+
+
+def get_display_id(data_manager, tile_index):
+    """
+    Gets "x, y" string tile id from tile index. For logging/display only.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param tile_index: Index of tile.
+    :return: Corresponding string tile id.
+    """
+    return get_id_from_coord(*get_tile_coord_from_index(data_manager, tile_index))
+
+
 def calc_distance_cost(start_tile_x, start_tile_y, end_tile_x, end_tile_y):
     """
     Determines the minimum distance between two tiles, assuming no walls or barriers exist between them.
@@ -312,20 +433,93 @@ def calc_distance_cost(start_tile_x, start_tile_y, end_tile_x, end_tile_y):
     return distance
 
 
+def get_open_neighbor_ids(data_manager, tile_id):
+    """
+    Gets ids of all tiles directly accessible from provided tile. Skips any neighbors that are blocked by a wall.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param tile_id: Index of tile to get neighbors of.
+    :return: List of neighboring tile indexes.
+    """
+    return data_manager.wall_grid.get_open_neighbor_ids(tile_id)
+
+
+def build_flood_fill_kernel(data_manager, ignore_walls=False):
+    """
+    Creates flood fill distance kernel, matching current tile wall layout.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param ignore_walls: Bool indicating if walls should be left out of kernel, and only grid bounds respected.
+    :return: Flood fill kernel instance.
+    """
+    logger.debug('build_flood_fill_kernel()')
+
+    return FloodFillKernel(
+        data_manager.tile_data['tile_w_count'],
+        data_manager.tile_data['tile_h_count'],
+        wall_grid=(None if ignore_walls else data_manager.wall_grid),
+    )
+
+
+def calc_tile_distances(data_manager, start_tile_id, end_tile_ids):
+    """
+    Calculates distances from one tile to each of a set of tiles, using the current pathing mode.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param start_tile_id: Id of tile to search from.
+    :param end_tile_ids: Iterable of tile ids to find distances to.
+    :return: Distance field of search.
+    """
+    field = calc_distance_field(
+        data_manager.wall_grid,
+        start_tile_id,
+        end_tile_ids,
+        pathing_mode=data_manager.pathing_mode,
+    )
+    log_unreachable_tiles(data_manager, field, end_tile_ids)
+    return field
+
+
+def log_unreachable_tiles(data_manager, field, end_tile_ids):
+    """
+    Logs a warning for each end tile that a search failed to reach.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param field: Distance field of search.
+    :param end_tile_ids: Iterable of tile ids that search was meant to reach.
+    """
+    for end_tile_id in end_tile_ids:
+        if field.get_distance(end_tile_id) == UNREACHABLE:
+            logger.warning('No path exists from ({0}) to ({1}).'.format(
+                get_display_id(data_manager, field.source_id),
+                get_display_id(data_manager, end_tile_id),
+            ))
+
+
 def calc_trash_distances(data_manager, roomba_only=False):
     """
     Calculates the "ideal" distance from every trash pile to every other trash pile.
     Accounts for walls and barriers.
 
-    This function should be called every time any wall or trash entity is added/removed/otherwise changed.
+    This function should be called every time any wall or trash entity is added/removed/otherwise changed. For changes
+    to a single tile, see update_trash_distances_for_walls() and update_trash_distances_for_trash() instead.
+
+    Search method is determined by the data manager "pathing_mode" value:
+     * "a_star" - Runs a separate A* search for each pair of tiles.
+     * "multi_target" - Runs a single breadth-first expansion from each tile, which finds all distances from that tile
+       at once.
+     * "flood_fill" - Same as "multi_target", but each expansion runs a full search layer at a time, via the flood fill
+       kernel. Default.
+
+    Only distances are saved, as a distance field for each search. Actual paths are rebuilt on request.
+    With at least "sparse_planning_min_trash" trash tiles, each trash tile only finds distances to its nearest
+    "candidate_neighbor_count" other trash tiles. See CandidateDistanceTable in src/pathing.py.
+    Flood fills always cover the full grid, so that the table can be repaired in place when walls change. See
+    update_trash_distances_for_walls().
     :param data_manager: Data manager data structure. Consolidates useful program data to one location.
-    :param roomba_only: Bool indicating if only roomba paths should be calculated.
-    :return: Set of all calculated "ideal paths" from each trash tile to every other trash tile.
+    :param roomba_only: Bool indicating if only roomba distances should be calculated.
     """
     logger.debug('calc_trash_distances()')
 
-    priority_queue = []
-    handled_tiles = {}
+    # Validate pathing mode.
+    if data_manager.pathing_mode not in PATHING_MODES:
+        raise ValueError('Unknown pathing mode "{0}".'.format(data_manager.pathing_mode))
 
     # Clear all debug entities.
     clear_debug_entities(data_manager)
@@ -336,427 +530,81 @@ def calc_trash_distances(data_manager, roomba_only=False):
         """
         logger.debug('calc_trash_distances()._calc_trash_distances()')
 
-        # Tell function to use variables in larger function scope.
-        nonlocal priority_queue
-        nonlocal handled_tiles
-
-        calculated_set = {}
-
         # Get list of all known trash piles.
-        trash_tiles = data_manager.graph.data['trash_tiles']
+        trash_tiles = list(data_manager.graph.data['trash_tiles'])
         logger.debug('trash_tiles: {0}'.format(trash_tiles))
-
-        # Grab each tile with a trash pile.
-        for start_tile_id in trash_tiles:
-            # Add tile to final data structure.
-            calculated_set[start_tile_id] = {}
-
-            # Parse out coordinates for tile.
-            start_tile_x, start_tile_y = get_tile_coord_from_id(start_tile_id)
-            start_tile = get_tile_from_id(data_manager, start_tile_id)
-
-            logger.debug('Calculating from tile ({0}, {1}):'.format(start_tile_x, start_tile_y))
-
-            # Find distance from current trash pile to each other trash pile.
-            for end_tile_id in trash_tiles:
-                # Reset data structures for new tile.
-                priority_queue = []
-                handled_tiles = {}
-                final_path = []
-
-                # Ensure tiles are different.
-                if start_tile_id != end_tile_id:
-                    # Check if reverse path was already calculated.
-                    try:
-                        logger.debug('Attempting to get path ({0}) -> ({1})'.format(start_tile_id, end_tile_id))
-                        final_path = calculated_set[end_tile_id][start_tile_id]
-
-                        # If we got this far, then reverse path (end_tile -> start_tile) was already found.
-                        # Invert and use that instead of re-calculating.
-                        final_path = list(reversed(final_path))
-                        logger.debug('    Path found: {0}'.format(final_path))
-
-                        # Save path for future reference.
-                        calculated_set[start_tile_id][end_tile_id] = final_path
-
-                        # Skip to start of loop for next path calculation.
-                        continue
-                    except KeyError:
-                        # Reverse path was not yet calculated.
-                        # Calculate path to tiles from scratch.
-                        logger.debug('    Path not found. Calculating from scratch.')
-
-                    # Parse out coordinates for tile.
-                    end_tile_x, end_tile_y = get_tile_coord_from_id(end_tile_id)
-
-                    # Initialize queue by calculating first tile distance and setting as first element.
-                    curr_id = get_id_from_tile(start_tile)
-                    curr_path = [curr_id]
-                    _calc_neighbor_costs(start_tile, end_tile_x, end_tile_y, 1, curr_path)
-                    logger.debug('    to ({0}, {1}): {2}'.format(end_tile_x, end_tile_y, priority_queue))
-
-                    # Iterate until we make it to our desired ending tile.
-                    # Always use priority queue to check the shortest-distance tile.
-                    iterate = True
-                    while iterate:
-                        # Parse out data for next tile.
-                        curr_tile_data = priority_queue.pop(0)
-                        curr_tile_id = curr_tile_data['id']
-                        logger.debug('Handling {0}: {1}'.format(curr_tile_id, curr_tile_data))
-                        curr_tile_backward_cost = curr_tile_data['backward_cost']
-                        curr_tile_path = curr_tile_data['path']
-                        curr_tile = get_tile_from_id(data_manager, curr_tile_id)
-
-                        # Check if tile is at desired end position.
-                        curr_tile_x, curr_tile_y = curr_tile.sprite.tile
-                        if curr_tile_x == end_tile_x and curr_tile_y == end_tile_y:
-                            # Found path. Stop checking further tiles.
-                            final_path = curr_tile_path
-                            iterate = False
-
-                            # Save found path for future reference.
-                            calculated_set[start_tile_id][end_tile_id] = final_path
-                        else:
-                            # Not yet at final tile.
-                            # Calculate distance costs of fellow neighbor tiles.
-                            _calc_neighbor_costs(
-                                curr_tile,
-                                end_tile_x,
-                                end_tile_y,
-                                curr_tile_backward_cost,
-                                curr_tile_path,
-                            )
-                            logger.debug('    to ({0}, {1}): {2}'.format(end_tile_x, end_tile_y, priority_queue))
-
-                    # Optionally display debug tile sprites.
-                    if debug:
-                        from src.entities.object_entities import DebugTile
-
-                        # Loop through all found tiles in final path. Display debug sprites for each.
-                        for tile_id in final_path:
-                            tile_x, tile_y = get_tile_coord_from_id(tile_id)
-                            debug_tile_sprite = data_manager.sprite_factory.from_image(
-                                RESOURCES.get_path('search_overlay.png')
-                            )
-                            debug_entity = DebugTile(
-                                data_manager.world,
-                                debug_tile_sprite,
-                                data_manager,
-                                tile_x,
-                                tile_y,
-                            )
-                            data_manager.debug_entities.append(debug_entity)
+        if len(trash_tiles) >= data_manager.sparse_planning_min_trash:
+            # Too many trash tiles for a full table. Each tile only searches out to its nearest few other tiles.
+            distance_table = CandidateDistanceTable(
+                data_manager.wall_grid,
+                trash_tiles,
+                data_manager.candidate_neighbor_count,
+            )
+            distance_table.calc_candidates()
+        else:
+            distance_table = DistanceTable(trash_tiles)
+
+            # Grab each tile with a trash pile.
+            # Distances to all earlier tiles were already found by the searches from those tiles. So each search only
+            # needs to find all later tiles. Flood fills always run in full, so the last tile still gets a field of its
+            # own.
+            searches = []
+            for start_index, start_tile_id in enumerate(trash_tiles):
+                later_tile_ids = trash_tiles[(start_index + 1):]
+                if later_tile_ids or data_manager.pathing_mode == 'flood_fill':
+                    searches.append((start_tile_id, later_tile_ids))
+
+            # Searches are independent of each other, so large sets are split across multiple processes.
+            fields = calc_distance_fields(
+                data_manager.wall_grid,
+                searches,
+                pathing_mode=data_manager.pathing_mode,
+                max_workers=data_manager.pathing_workers,
+                min_parallel_work=data_manager.min_parallel_work,
+            )
+            for (start_tile_id, later_tile_ids), field in zip(searches, fields):
+                log_unreachable_tiles(data_manager, field, later_tile_ids)
+                distance_table.set_row(start_tile_id, field)
 
         # Save calculated data to data manager.
-        data_manager.ideal_trash_paths = calculated_set
+        data_manager.trash_distances = distance_table
 
         # Also update distance from roomba to all trash tiles.
-        _calc_roomba_distance(debug=debug)
-
-        # Optionally print out calculated path set to console.
-        if debug:
-            logger.info('calculated_paths:')
-            for start_tile_id, start_set in calculated_set.items():
-                logger.info('({0})'.format(start_tile_id))
-                for end_tile_id, calculated_path in start_set.items():
-                    logger.info('    to ({0}):   {1}'.format(end_tile_id, calculated_path))
-        else:
-            # Print calculated path set to log files only.
-            logger.debug('calculated_paths:')
-            for start_tile_id, start_set in calculated_set.items():
-                logger.debug('({0})'.format(start_tile_id))
-                for end_tile_id, calculated_path in start_set.items():
-                    logger.debug('    to ({0}):   {1}'.format(end_tile_id, calculated_path))
-
-    def _calc_roomba_distance(debug=False):
+        _calc_roomba_distance()
+
+        # Optionally print out calculated distance set to console. Only formatted if actually logged, as it grows with
+        # the square of trash count.
+        if logger.isEnabledFor(logging.INFO if debug else logging.DEBUG):
+            log_level = logger.info if debug else logger.debug
+            log_level('calculated_distances:')
+            for row, start_tile_id in enumerate(distance_table.tile_ids):
+                log_level('({0}):   {1}'.format(
+                    get_display_id(data_manager, start_tile_id),
+                    distance_table.matrix[row],
+                ))
+
+    def _calc_roomba_distance():
         """
         Calculates distances from roomba to each trash tile.
         """
         logger.debug('calc_trash_distances()._calc_roomba_distance()')
 
-        # Tell function to use variables in larger function scope.
-        nonlocal priority_queue
-        nonlocal handled_tiles
-
         trash_tiles = data_manager.graph.data['trash_tiles']
         roomba_x, roomba_y = data_manager.roomba.sprite.tile
-        roomba_tile_id = get_id_from_coord(roomba_x, roomba_y)
-        roomba_tile = get_tile_from_id(data_manager, roomba_tile_id)
-
-        calculated_set = data_manager.ideal_trash_paths
-        calculated_set['roomba'] = {}
-
-        # Find distance from current trash pile to each other trash pile.
-        for end_tile_id in trash_tiles:
-            # Reset data structures for new tile.
-            priority_queue = []
-            handled_tiles = {}
-            final_path = []
-
-            # Ensure tiles are different.
-            if roomba_tile_id != end_tile_id:
-
-                # Parse out coordinates for tile.
-                end_tile_x, end_tile_y = get_tile_coord_from_id(end_tile_id)
-
-                # Initialize queue by calculating first tile distance and setting as first element.
-                curr_id = get_id_from_tile(roomba_tile)
-                curr_path = [curr_id]
-                _calc_neighbor_costs(roomba_tile, end_tile_x, end_tile_y, 1, curr_path)
-                logger.debug('    to ({0}, {1}): {2}'.format(end_tile_x, end_tile_y, priority_queue))
-
-                # Iterate until we make it to our desired ending tile.
-                # Always use priority queue to check the shortest-distance tile.
-                iterate = True
-                while iterate:
-                    # Parse out data for next tile.
-                    curr_tile_data = priority_queue.pop(0)
-                    curr_tile_id = curr_tile_data['id']
-                    logger.debug('Handling {0}: {1}'.format(curr_tile_id, curr_tile_data))
-                    curr_tile_backward_cost = curr_tile_data['backward_cost']
-                    curr_tile_path = curr_tile_data['path']
-                    curr_tile = get_tile_from_id(data_manager, curr_tile_id)
-
-                    # Check if tile is at desired end position.
-                    curr_tile_x, curr_tile_y = curr_tile.sprite.tile
-                    if curr_tile_x == end_tile_x and curr_tile_y == end_tile_y:
-                        # Found path. Stop checking further tiles.
-                        final_path = curr_tile_path
-                        iterate = False
-
-                        # Save found path for future reference.
-                        calculated_set['roomba'][end_tile_id] = final_path
-                    else:
-                        # Not yet at final tile.
-                        # Calculate distance costs of fellow neighbor tiles.
-                        _calc_neighbor_costs(
-                            curr_tile,
-                            end_tile_x,
-                            end_tile_y,
-                            curr_tile_backward_cost,
-                            curr_tile_path,
-                        )
-                        logger.debug('    to ({0}, {1}): {2}'.format(end_tile_x, end_tile_y, priority_queue))
-
-                # Optionally display debug tile sprites.
-                if debug:
-                    from src.entities.object_entities import DebugTile
-
-                    # Loop through all found tiles in final path. Display debug sprites for each.
-                    for tile_id in final_path:
-                        tile_x, tile_y = get_tile_coord_from_id(tile_id)
-                        debug_tile_sprite = data_manager.sprite_factory.from_image(
-                            RESOURCES.get_path('search_overlay.png')
-                        )
-                        debug_entity = DebugTile(
-                            data_manager.world,
-                            debug_tile_sprite,
-                            data_manager,
-                            tile_x,
-                            tile_y,
-                        )
-                        data_manager.debug_entities.append(debug_entity)
+        roomba_tile_id = get_tile_index(data_manager, roomba_x, roomba_y)
 
-        # Save calculated data to data manager.
-        data_manager.ideal_trash_paths = calculated_set
+        # Read distances straight out of trash tile flow fields, where possible.
+        if data_manager.trash_distances.set_roomba_tile(roomba_tile_id):
+            return
 
-    def _calc_neighbor_costs(curr_tile, end_tile_x, end_tile_y, curr_backward_cost, curr_path, debug=False):
-        """
-        Calculate costs from neighbors of current tile, to desired ending tile coordinates.
-        Skips any neighboring tiles that are blocked, such as by a wall.
-        :param curr_tile: Tile entity to calculate from.
-        :param end_tile_x: Desired ending x coordinates.
-        :param end_tile_y: Desired ending y  coordinates.
-        :param curr_backward_cost: Cost incurred so far to reach current tile.
-        :param curr_path: Path taken to reach current tile.
-        :param debug: Bool indicating if debug sprites should display.
-        """
-        logger.debug('calc_trash_distances()._calc_neighbor_costs()')
-
-        from src.entities.object_entities import DebugTile
-
-        # Tell function to use variables in larger function scope.
-        nonlocal priority_queue
-        nonlocal handled_tiles
-
-        # Add current tile to set of "known handled tiles.
-        # Allows us to skip tiles that have already been handled once.
-        # We use a dict to make it faster, so we have O(1) check time, instead of potentially large times
-        # when we have many tiles to check.
-        # We don't actually care about the corresponding value, just the dict key. So we set to an arbitrary "True".
-        handled_tiles[get_id_from_tile(curr_tile)] = True
-
-        # Check if adjacent tiles are accessible.
-        start_tile_x, start_tile_y = curr_tile.sprite.tile
-        if not curr_tile.walls.has_wall_north:
-            # Verify we haven't already checked this tile in a previous loop.
-            neig_tile_x = start_tile_x
-            neig_tile_y = start_tile_y - 1
-            neig_id = get_id_from_coord(neig_tile_x, neig_tile_y)
-            try:
-                handled_tiles[neig_id]
-            except KeyError:
-                # North tile is accessible and not yet handled. Check distance.
-                forward_cost = calc_distance_cost(neig_tile_x, neig_tile_y, end_tile_x, end_tile_y)
-                tile_id = '{0}, {1}'.format(neig_tile_x, neig_tile_y)
-
-                # Add to priority queue.
-                _add_to_priority_queue(tile_id, forward_cost, curr_backward_cost, curr_path)
-
-                # Update our handled_tiles dict to include this tile.
-                handled_tiles[neig_id] = True
-
-                # Optionally display debug tile sprites.
-                if debug:
-                    debug_tile_sprite = data_manager.sprite_factory.from_image(RESOURCES.get_path('search_overlay.png'))
-                    debug_entity = DebugTile(
-                        data_manager.world,
-                        debug_tile_sprite,
-                        data_manager,
-                        neig_tile_x,
-                        neig_tile_y,
-                    )
-                    data_manager.debug_entities.append(debug_entity)
-
-        if not curr_tile.walls.has_wall_east:
-            # Verify we haven't already checked this tile in a previous loop.
-            neig_tile_x = start_tile_x + 1
-            neig_tile_y = start_tile_y
-            neig_id = get_id_from_coord(neig_tile_x, neig_tile_y)
-            try:
-                handled_tiles[neig_id]
-            except KeyError:
-                # East tile is accessible and not yet handled. Check distance.
-                forward_cost = calc_distance_cost(neig_tile_x, neig_tile_y, end_tile_x, end_tile_y)
-                tile_id = '{0}, {1}'.format(neig_tile_x, neig_tile_y)
-
-                # Add to priority queue.
-                _add_to_priority_queue(tile_id, forward_cost, curr_backward_cost, curr_path)
-
-                # Update our handled_tiles dict to include this tile.
-                handled_tiles[neig_id] = True
-
-                # Optionally display debug tile sprites.
-                if debug:
-                    debug_tile_sprite = data_manager.sprite_factory.from_image(RESOURCES.get_path('search_overlay.png'))
-                    debug_entity = DebugTile(
-                        data_manager.world,
-                        debug_tile_sprite,
-                        data_manager,
-                        neig_tile_x,
-                        neig_tile_y,
-                    )
-                    data_manager.debug_entities.append(debug_entity)
-
-        if not curr_tile.walls.has_wall_south:
-            # Verify we haven't already checked this tile in a previous loop.
-            neig_tile_x = start_tile_x
-            neig_tile_y = start_tile_y + 1
-            neig_id = get_id_from_coord(neig_tile_x, neig_tile_y)
-            try:
-                handled_tiles[neig_id]
-            except KeyError:
-                # South tile is accessible and not yet handled. Check distance.
-                forward_cost = calc_distance_cost(neig_tile_x, neig_tile_y, end_tile_x, end_tile_y)
-                tile_id = '{0}, {1}'.format(neig_tile_x, neig_tile_y)
-
-                # Add to priority queue.
-                _add_to_priority_queue(tile_id, forward_cost, curr_backward_cost, curr_path)
-
-                # Update our handled_tiles dict to include this tile.
-                handled_tiles[neig_id] = True
-
-                # Optionally display debug tile sprites.
-                if debug:
-                    debug_tile_sprite = data_manager.sprite_factory.from_image(RESOURCES.get_path('search_overlay.png'))
-                    debug_entity = DebugTile(
-                        data_manager.world,
-                        debug_tile_sprite,
-                        data_manager,
-                        neig_tile_x,
-                        neig_tile_y,
-                    )
-                    data_manager.debug_entities.append(debug_entity)
-
-        if not curr_tile.walls.has_wall_west:
-            # Verify we haven't already checked this tile in a previous loop.
-            neig_tile_x = start_tile_x - 1
-            neig_tile_y = start_tile_y
-            neig_id = get_id_from_coord(neig_tile_x, neig_tile_y)
-            try:
-                handled_tiles[neig_id]
-            except KeyError:
-                # West tile is accessible and not yet handled. Check distance.
-                forward_cost = calc_distance_cost(neig_tile_x, neig_tile_y, end_tile_x, end_tile_y)
-                tile_id = '{0}, {1}'.format(neig_tile_x, neig_tile_y)
-
-                # Add to priority queue.
-                _add_to_priority_queue(tile_id, forward_cost, curr_backward_cost, curr_path)
-
-                # Update our handled_tiles dict to include this tile.
-                handled_tiles[neig_id] = True
-
-                # Optionally display debug tile sprites.
-                if debug:
-                    debug_tile_sprite = data_manager.sprite_factory.from_image(RESOURCES.get_path('search_overlay.png'))
-                    debug_entity = DebugTile(
-                        data_manager.world,
-                        debug_tile_sprite,
-                        data_manager,
-                        neig_tile_x,
-                        neig_tile_y,
-                    )
-                    data_manager.debug_entities.append(debug_entity)
-
-    def _add_to_priority_queue(tile_id, forward_cost, backward_cost, path):
-        """
-        Creates new entry in priority queue data structure.
-        Data is entered in ascending distance order, so smaller distances will show first.
-
-        Distance should be a combination of "tiles travelled so far" plus "distance left to reach tile, assuming no
-        barriers exist between current tile and ending locations.
-        :param tile_id: Id of tile to enter into queue.
-        :param forward_cost: Distance of tile to end-goal.
-        :param backward_cost: Distance travelled so far, to reach current tile.
-        :param path: List of all tiles in current path to reach current location.
-        """
-        logger.debug('calc_trash_distances()._add_to_priority_queue()')
-
-        # Tell function to use variables in larger function scope.
-        nonlocal priority_queue
-        nonlocal handled_tiles
-        # self.pending_list.append({'tile': start_tile, 'cost': start_cost})
-
-        # Update current path set for new location.
-        path = list(path)
-        path.append(tile_id)
-
-        # Calcualte distance values.
-        curr_tile_distance = forward_cost + backward_cost
-        backward_cost += 1
-
-        # Iterate through priority queue until we find proper location.
-        added = False
-        for index in range(len(priority_queue)):
-
-            # Check if value is equal or lesser distance.
-            index_cost = priority_queue[index]['forward_cost'] + priority_queue[index]['backward_cost']
-            if index_cost >= curr_tile_distance:
-                priority_queue.insert(
-                    index,
-                    {'id': tile_id, 'forward_cost': forward_cost, 'backward_cost': backward_cost, 'path': path},
-                )
-                added = True
-                break
-
-        # Check if went through entire queue and failed to add. Means it's greater than all other values in queue.
-        if not added:
-            priority_queue.append(
-                {'id': tile_id, 'forward_cost': forward_cost, 'backward_cost': backward_cost, 'path': path},
-            )
+        # Otherwise find distance from roomba to all trash piles with one search.
+        data_manager.trash_distances.set_roomba_row(
+            roomba_tile_id,
+            calc_tile_distances(data_manager, roomba_tile_id, trash_tiles),
+        )
 
     # Call actual function logic, now that inner functions are defined.
-    if roomba_only and data_manager.ideal_trash_paths is not None:
+    if roomba_only and data_manager.trash_distances is not None:
         # Save computations by only calculating roomba distance to trash tiles.
         _calc_roomba_distance()
     else:
@@ -765,12 +613,104 @@ def calc_trash_distances(data_manager, roomba_only=False):
         _calc_trash_distances()
 
 
-def calc_traveling_salesman(data_manager, calc_new=True, total_move_reset=True, debug=False):
+def update_trash_distances_for_trash(data_manager):
+    """
+    Updates trash distances after trash piles have been placed or cleaned.
+
+    Stored distances are kept for all trash tiles that still exist. Cleaned tiles have their row and column dropped, and
+    each newly placed tile gets its row and column from a single search. Roomba distances are left as-is for existing
+    tiles.
+    Falls back to a full calc_trash_distances() if no distances are stored yet.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    """
+    logger.debug('update_trash_distances_for_trash()')
+
+    distance_table = data_manager.trash_distances
+    if distance_table is None:
+        calc_trash_distances(data_manager)
+        return
+
+    trash_tiles = data_manager.graph.data['trash_tiles']
+    trash_tile_set = set(trash_tiles)
+
+    # Drop any cleaned tiles.
+    for tile_id in list(distance_table.tile_ids):
+        if tile_id not in trash_tile_set:
+            distance_table.remove_tile(tile_id)
+
+    # Search from any newly placed tiles. Roomba tile is included, so its distance to the new tile is found as well.
+    for tile_id in trash_tiles:
+        if tile_id not in distance_table.tile_rows:
+            end_tile_ids = list(distance_table.tile_ids)
+            if distance_table.roomba_id is not None:
+                end_tile_ids.append(distance_table.roomba_id)
+            distance_table.add_tile(tile_id, calc_tile_distances(data_manager, tile_id, end_tile_ids))
+
+
+def update_trash_distances_for_walls(data_manager, tile_id, prev_wall_mask):
+    """
+    Updates trash distances after the walls of a single tile have changed.
+
+    Where possible, the stored distance table is repaired in place, one changed wall at a time. So the cost scales with
+    the number of tiles whose distances actually changed, rather than with the full grid for every trash tile.
+    Otherwise, falls back to a full calc_trash_distances().
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param tile_id: Id of tile that had its walls changed.
+    :param prev_wall_mask: Wall bitmask of tile, from before the change.
+    """
+    logger.debug('update_trash_distances_for_walls()')
+
+    distance_table = data_manager.trash_distances
+    if distance_table is None or not distance_table.is_repairable:
+        calc_trash_distances(data_manager)
+        return
+
+    # Clear all debug entities.
+    clear_debug_entities(data_manager)
+
+    # Repairs assume only one edge changes at a time. So temporarily revert all changed walls, then replay each in turn.
+    wall_grid = data_manager.wall_grid
+    new_wall_mask = wall_grid.get_mask(tile_id)
+    changed_walls = [
+        wall for wall in (WALL_NORTH, WALL_EAST, WALL_SOUTH, WALL_WEST)
+        if (prev_wall_mask ^ new_wall_mask) & wall
+    ]
+    for wall in changed_walls:
+        wall_grid.set_wall(tile_id, wall, bool(prev_wall_mask & wall))
+
+    for wall in changed_walls:
+        wall_grid.set_wall(tile_id, wall, bool(new_wall_mask & wall))
+        neighbor_id = wall_grid.get_neighbor_id(tile_id, wall)
+        if neighbor_id is not None:
+            distance_table.update_edge(tile_id, neighbor_id)
+
+
+def calc_traveling_salesman(data_manager, calc_new=True, total_move_reset=True, multi_start=False, debug=False):
     """
     Calculates the approximately-ideal overall path to visit all trash tiles.
+
+    Path is treated as an "open path", which starts at the roomba and ends at whichever trash tile is visited last.
+    With at most "exact_tour_max_trash" trash tiles, the truly optimal path is found via exact search. Otherwise, the
+    path is seeded with the cheapest of the "tour_construction_methods" heuristics, then improved with the
+    "tour_improvement_method" search (Lin-Kernighan, plain 2-opt and Or-opt, or batched 2-opt and node swaps), until
+    no further improving move is found. See src/planning.py. With at most "branch_and_bound_max_trash" trash tiles,
+    branch and bound then tries to prove the path optimal, or find a better one, within "branch_and_bound_budget_ms".
+    Candidate distance tables instead only ever join each trash tile to its nearest neighbors, and skip both the lower
+    bound and later improvement. With at least "hierarchical_planning_min_trash" trash tiles, the path is instead
+    planned per cluster of nearby trash tiles. See calc_clustered_traveling_salesman().
+
+    Heuristic paths can then be further improved over time, via either a background TourImprover, or per-frame
+    run_tour_annealing() calls if "background_tour_improvement" is off. See apply_tour_improvements(). This is skipped
+    if the path is already proven optimal, by matching the lower bound from calc_traveling_salesman_bound(). Each of
+    these searches stops early once it stops improving, per build_convergence_monitor().
+
+    When only the roomba has moved (calc_new False), the previous path is reused as a warm start, rather than built
+    again. As is the previous lower bound search.
     :param data_manager: Data manager data structure. Consolidates useful program data to one location.
     :param calc_new: Bool indicating if previously calculated path data should be discarded. Such as wall entity update.
     :param total_move_reset: Bool indicating if "total moves counter" should reset.
+    :param multi_start: Bool indicating if heuristic paths should also get a "multi_start_count" chain parallel search.
+        Slower, so only meant for full recalculations, such as after randomizing walls or trash.
     """
     logger.debug('calc_traveling_salesman()')
 
@@ -778,9 +718,9 @@ def calc_traveling_salesman(data_manager, calc_new=True, total_move_reset=True,
     clear_debug_entities(data_manager)
 
     roomba_x, roomba_y = data_manager.roomba.sprite.tile
-    roomba_tile_id = get_id_from_coord(roomba_x, roomba_y)
+    roomba_tile_id = get_tile_index(data_manager, roomba_x, roomba_y)
     trash_tile_set = data_manager.graph.data['trash_tiles']
-    trash_paths = data_manager.ideal_trash_paths
+    trash_distances = data_manager.trash_distances
 
     # Reset path values if calculating from scratch.
     curr_total_dist = 999999
@@ -791,114 +731,99 @@ def calc_traveling_salesman(data_manager, calc_new=True, total_move_reset=True,
     if calc_new:
         data_manager.ideal_overall_path = calculated_path
         data_manager.gui_data['optimal_counter'] = curr_total_dist
+        data_manager.tour_bound_penalties = None
     if total_move_reset:
         data_manager.gui_data['total_move_counter'] = 0
 
     logger.debug('')
     logger.debug(' ==== TRAVELING SALESMAN ===== ')
     logger.debug('')
-    logger.debug('trash_paths: {0}'.format(trash_paths))
-
-    # Initialize path by just going to trash tiles in original ordering.
-    start_tile_id = None
-    end_tile_id = None
-    for tile_id in trash_tile_set:
-        start_tile_id = end_tile_id
-        end_tile_id = tile_id
-
-        # Add first trash tile.
-        if not start_tile_id:
-            calculated_path['ordering'].append(end_tile_id)
-
-        # Add all other trash tiles after first one.
-        if start_tile_id and end_tile_id:
-            calculated_path['ordering'].append(end_tile_id)
-
-    # Run ( "length of trash tile set" * 10 ) iterations.
-    # For each, we randomly grab two sets of connected points, then swap them with each other to see if improvement
-    # occurs. If swap leads to overall distance improvement, we save. Otherwise revert and try next iteration.
-    for index_counter in range(len(trash_tile_set) * 10):
-        # Grab first set of points.
-        conn_1_index_0 = random.randint(0, len(calculated_path['ordering']) - 2)
-        conn_1_index_1 = conn_1_index_0 + 1
-
-        # Grab second set of points.
-        conn_2_index_0 = random.randint(0, len(calculated_path['ordering']) - 2)
-        conn_2_index_1 = conn_2_index_0 + 1
-        temp_counter = 0
-        # Make sure sets of point are actually different.
-        while (
-            temp_counter < 10 and   # If it fails 10 times, then we probably don't have enough indexes to actually swap.
-            (
-                conn_2_index_0 in [conn_1_index_0, conn_1_index_1] or
-                conn_2_index_1 == [conn_1_index_0, conn_1_index_1]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('trash_distances: {0}'.format(trash_distances.matrix))
+
+    node_ids, cost_matrix = build_cost_matrix(trash_distances)
+    is_clustered = (
+        isinstance(cost_matrix, CandidateMatrix) and
+        len(trash_tile_set) >= data_manager.hierarchical_planning_min_trash
+    )
+    data_manager.tour_annealer = None
+    if data_manager.tour_improver is not None:
+        data_manager.tour_improver.cancel()
+    if not is_clustered:
+        data_manager.tour_clusters = None
+    if is_clustered:
+        # Too many trash tiles for even a single path search. Plan each cluster of nearby tiles separately.
+        # Clusters only need to be rebuilt when discarding previous path data.
+        tour = calc_clustered_traveling_salesman(data_manager, node_ids, cost_matrix, reuse_clusters=not calc_new)
+        data_manager.gui_data['optimal_lower_bound'] = None
+    elif isinstance(cost_matrix, CandidateMatrix):
+        # Too many trash tiles for a full cost matrix. Build and improve path using only each tile's nearest neighbors.
+        # No lower bound is found, as it requires every cost.
+        tour = build_candidate_tour(cost_matrix)
+        improve_candidate_tour(cost_matrix, tour)
+        data_manager.gui_data['optimal_lower_bound'] = None
+    elif len(trash_tile_set) <= data_manager.exact_tour_max_trash:
+        # Few enough trash tiles to search every possible path. Path is optimal, so is its own lower bound.
+        tour = calc_exact_tour(cost_matrix)
+        data_manager.gui_data['optimal_lower_bound'] = calc_tour_cost(cost_matrix, tour)
+    else:
+        if data_manager.tour_improvement_method not in IMPROVEMENT_METHODS:
+            raise ValueError('Unknown tour improvement method "{0}".'.format(data_manager.tour_improvement_method))
+
+        tour = None
+        if not calc_new:
+            tour = get_warm_start_tour(data_manager, node_ids)
+        if tour is not None and data_manager.tour_improvement_method == 'lin_kernighan':
+            # Previous path still covers every trash tile, and was already improved. Only its start has changed, so
+            # only search from around there.
+            improve_lin_kernighan(cost_matrix, tour, active_nodes=[0, tour[1]])
+        else:
+            # Initialize path with greedy construction heuristics. Keep whichever path is cheapest.
+            if tour is None:
+                tour = calc_initial_tour(cost_matrix, data_manager.tour_construction_methods)
+
+            # Improve path with local search. Every candidate move is scored by its change in cost alone, so the full
+            # path never needs to be re-walked.
+            IMPROVEMENT_METHODS[data_manager.tour_improvement_method](cost_matrix, tour)
+
+        # With few enough trash tiles, try to prove path optimal via branch and bound. Either way, keep best path found.
+        is_optimal = False
+        if len(trash_tile_set) <= data_manager.branch_and_bound_max_trash:
+            tour, is_optimal = calc_branch_and_bound_tour(
+                cost_matrix,
+                tour,
+                time_budget_ms=data_manager.branch_and_bound_budget_ms,
             )
-        ):
-            conn_2_index_0 = random.randint(0, len(calculated_path['ordering']) - 2)
-            conn_2_index_1 = conn_2_index_0 + 1
-            temp_counter += 1
-
-        # Get respective id's for selected indexes.
-        conn_1_id_0 = calculated_path['ordering'][conn_1_index_0]
-        conn_1_id_1 = calculated_path['ordering'][conn_1_index_1]
-        conn_2_id_0 = calculated_path['ordering'][conn_2_index_0]
-        conn_2_id_1 = calculated_path['ordering'][conn_2_index_1]
-
-        # Verify swapping won't result in trying to travel from a tile to itself.
-        if conn_1_id_0 == conn_2_id_1 or conn_2_id_0 == conn_1_id_1:
-            # Would lead to bad path. Skip current iteration.
-            continue
-
-        # Calculate distance travelled for current selection.
-        start_tile_id = None
-        end_tile_id = None
-        curr_total_dist = 0
-        for index in range(len(calculated_path['ordering'])):
-            start_tile_id = end_tile_id
-            end_tile_id = calculated_path['ordering'][index]
 
-            # Only proceed if both id's are present (aka, skip first index).
-            if start_tile_id and end_tile_id:
-                # Both present. Add length of path to overall length calculation.
-                if start_tile_id == roomba_tile_id:
-                    curr_total_dist += len(trash_paths['roomba'][end_tile_id]) - 1
-                else:
-                    curr_total_dist += len(trash_paths[start_tile_id][end_tile_id]) - 1
-
-        # Update calculated set for distance found to traverse set.
-        calculated_path['total_cost'] = curr_total_dist
-
-        # Swap and recalculate distance.
-        swapped_total_dist = 0
-        swapped_path = list(calculated_path['ordering'])
-        swapped_path[conn_1_index_1] = conn_2_id_1
-        swapped_path[conn_2_index_1] = conn_1_id_1
-        start_tile_id = None
-        end_tile_id = None
-        for index in range(len(swapped_path)):
-            start_tile_id = end_tile_id
-            end_tile_id = swapped_path[index]
+        if is_optimal:
+            # Path is optimal, so is its own lower bound. No further search is needed.
+            data_manager.gui_data['optimal_lower_bound'] = calc_tour_cost(cost_matrix, tour)
+        else:
+            # Optionally search further with several independent annealing chains, split across worker processes.
+            if multi_start and data_manager.multi_start_count > 0:
+                tour = calc_multi_start_tour(
+                    cost_matrix,
+                    tour,
+                    data_manager.multi_start_count,
+                    seed=data_manager.multi_start_seed,
+                    max_workers=data_manager.pathing_workers,
+                )
 
-            # Only proceed if both id's are present (aka, skip first index).
-            if start_tile_id and end_tile_id:
-                # Both present. Add length of path to overall length calculation.
-                if start_tile_id == roomba_tile_id:
-                    swapped_total_dist += len(trash_paths['roomba'][end_tile_id]) - 1
-                else:
-                    swapped_total_dist += len(trash_paths[start_tile_id][end_tile_id]) - 1
+            # Save path for later annealing, unless lower bound shows that no better path exists.
+            tour_cost = calc_tour_cost(cost_matrix, tour)
+            if calc_traveling_salesman_bound(data_manager, node_ids, cost_matrix, tour_cost) < tour_cost:
+                start_tour_improvement(data_manager, node_ids, cost_matrix, tour, roomba_tile_id)
 
-        # Check if swapping sets will decrease overall distance travelled.
-        logger.debug('curr_dist: {0}    swapped_dist: {1}'.format(curr_total_dist, swapped_total_dist))
-        if swapped_total_dist < curr_total_dist:
-            logger.debug('Found more efficient path. Swapping.')
-            calculated_path['ordering'][conn_1_index_1] = conn_2_id_1
-            calculated_path['ordering'][conn_2_index_1] = conn_1_id_1
-            calculated_path['total_cost'] = swapped_total_dist
+    if len(tour) > 1:
+        calculated_path['ordering'] += [node_ids[node] for node in tour[1:]]
+        calculated_path['total_cost'] = calc_tour_cost(cost_matrix, tour)
+        logger.debug('calculated_path: {0}'.format(calculated_path))
 
     # Take optimal calculated distance. Compare against previously found optimal.
-    # Only override if new path is superior.
+    # Only override if new path is superior. A path from another roomba tile can't be compared, so is always replaced.
     if (
         data_manager.ideal_overall_path['ordering'] == [roomba_tile_id] or
+        data_manager.ideal_overall_path['ordering'][0] != roomba_tile_id or
         calculated_path['total_cost'] < data_manager.ideal_overall_path['total_cost']
     ):
         # New calculated path is more more efficient. Update path values.
@@ -907,6 +832,9 @@ def calc_traveling_salesman(data_manager, calc_new=True, total_move_reset=True,
 
     # Ensure GUI always initializes to correct counter value.
     data_manager.gui_data['optimal_counter'] = data_manager.ideal_overall_path['total_cost']
+    if len(tour) <= 1:
+        data_manager.gui_data['optimal_lower_bound'] = None
+    log_optimality_gap(data_manager)
 
     # Optionally display debug tile sprites.
     if debug:
@@ -920,15 +848,16 @@ def calc_traveling_salesman(data_manager, calc_new=True, total_move_reset=True,
             end_tile_id = calculated_path['ordering'][index]
 
             # Only proceed if both id's are present (aka, skip first index).
-            if start_tile_id and end_tile_id:
+            if start_tile_id is not None and end_tile_id is not None:
 
                 # Loop through all tiles in path connecting the given trash entities.
+                # Paths are not stored, so are lazily rebuilt here.
                 if start_tile_id == roomba_tile_id:
-                    full_path = trash_paths['roomba'][end_tile_id]
+                    full_path = trash_distances.get_path('roomba', end_tile_id)
                 else:
-                    full_path = trash_paths[start_tile_id][end_tile_id]
-                for tile_id in full_path:
-                    tile_x, tile_y = get_tile_coord_from_id(tile_id)
+                    full_path = trash_distances.get_path(start_tile_id, end_tile_id)
+                for tile_id in (full_path or []):
+                    tile_x, tile_y = get_tile_coord_from_index(data_manager, tile_id)
                     debug_tile_sprite = data_manager.sprite_factory.from_image(
                         RESOURCES.get_path('search_overlay.png')
                     )
@@ -942,6 +871,438 @@ def calc_traveling_salesman(data_manager, calc_new=True, total_move_reset=True,
                     data_manager.debug_entities.append(debug_entity)
 
 
+def calc_traveling_salesman_bound(data_manager, node_ids, cost_matrix, tour_cost):
+    """
+    Calculates a lower bound on the cost of the truly optimal overall path, and saves it for GUI display.
+
+    Bound is found with the Held-Karp 1-tree bound, for up to "tour_bound_iterations" iterations. See src/planning.py.
+    Once a path matches the bound, it is proven optimal, and any further search for a better path is wasted.
+
+    Search stops early once the bound stops rising. See build_convergence_monitor(). Node penalties are kept between
+    calls, and reused as the starting point for the next bound, until path data is next discarded. So when the roomba
+    merely moves, the bound is usually found again within a few iterations.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param node_ids: Tile id of each cost matrix node.
+    :param cost_matrix: Tour cost matrix.
+    :param tour_cost: Cost of best known path, for the same cost matrix.
+    :return: Lower bound on cost of optimal path.
+    """
+    logger.debug('calc_traveling_salesman_bound()')
+
+    # Start from previous penalties. Roomba node always keeps its penalty, even though roomba may have moved.
+    penalties = [0.0] * len(node_ids)
+    if data_manager.tour_bound_penalties is not None:
+        roomba_penalty, tile_penalties = data_manager.tour_bound_penalties
+        penalties = [roomba_penalty] + [tile_penalties.get(tile_id, 0.0) for tile_id in node_ids[1:]]
+
+    monitor = build_convergence_monitor(data_manager, data_manager.tour_bound_stall_iterations)
+    lower_bound = calc_tour_lower_bound(
+        cost_matrix,
+        tour_cost,
+        data_manager.tour_bound_iterations,
+        penalties=penalties,
+        monitor=monitor,
+    )
+    logger.debug('Lower bound search stopped: {0}'.format(monitor.stop_reason))
+
+    data_manager.tour_bound_penalties = (penalties[0], dict(zip(node_ids[1:], penalties[1:])))
+    data_manager.gui_data['optimal_lower_bound'] = lower_bound
+    return lower_bound
+
+
+def build_convergence_monitor(data_manager, stall_limit):
+    """
+    Creates a monitor, which stops path improvement or lower bound search once it is no longer worth running.
+
+    Each stops once it goes "stall_limit" steps without progress, or makes less than "tour_min_improvement_per_ms"
+    progress per millisecond, or once the gap between path cost and lower bound is within "tour_target_gap". Any of
+    the latter two data manager values can be None, to skip that check.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param stall_limit: Max number of steps in a row without progress.
+    :return: New ConvergenceMonitor instance.
+    """
+    return ConvergenceMonitor(
+        stall_limit=stall_limit,
+        min_rate=data_manager.tour_min_improvement_per_ms,
+        target_gap=data_manager.tour_target_gap,
+    )
+
+
+def get_warm_start_tour(data_manager, node_ids):
+    """
+    Gets the current ideal overall path as a tour over the given cost matrix nodes, restarted from the current roomba
+    tile. Useful as a starting point after the roomba has moved, as the rest of the path is likely still good.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param node_ids: Tile id of each cost matrix node.
+    :return: Tour, as list of node indexes | None if there is no current path, or it no longer covers every trash tile.
+    """
+    ideal_overall_path = data_manager.ideal_overall_path
+    if ideal_overall_path is None:
+        return None
+
+    tile_ids = ideal_overall_path['ordering'][1:]
+    if len(tile_ids) != len(node_ids) - 1 or set(tile_ids) != set(node_ids[1:]):
+        return None
+
+    node_indexes = {tile_id: node for node, tile_id in enumerate(node_ids)}
+    return [0] + [node_indexes[tile_id] for tile_id in tile_ids]
+
+
+def get_optimality_gap(data_manager):
+    """
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :return: Fraction of current ideal overall path cost, that it may be above the truly optimal path | None if no
+        lower bound is known.
+    """
+    lower_bound = data_manager.gui_data.get('optimal_lower_bound')
+    total_cost = data_manager.gui_data['optimal_counter']
+    if lower_bound is None or total_cost <= 0:
+        return None
+
+    return max(0, total_cost - lower_bound) / total_cost
+
+
+def log_optimality_gap(data_manager):
+    """
+    Logs cost of current ideal overall path, against lower bound of truly optimal path.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    """
+    optimality_gap = get_optimality_gap(data_manager)
+    if optimality_gap is not None:
+        logger.info('Path cost: {0}    Lower bound: {1}    Gap: {2:.1%}'.format(
+            data_manager.gui_data['optimal_counter'],
+            data_manager.gui_data['optimal_lower_bound'],
+            optimality_gap,
+        ))
+
+
+def repair_traveling_salesman(data_manager, total_move_reset=True):
+    """
+    Repairs the current ideal overall path after trash piles have been placed or cleaned, rather than recalculating it
+    from scratch. Expects trash distances to already be up to date. Roomba distances are recalculated if roomba has
+    since moved.
+
+    Cleaned tiles are dropped, and path is otherwise kept in its current order. Each new trash tile is then inserted at
+    its cheapest position, followed by local search bounded to the path around that position. See src/planning.py.
+
+    With a candidate matrix, local search is only run over candidate moves, across the whole path. If the path was
+    planned per cluster, then only clusters that gained trash tiles are re-planned instead.
+
+    Falls back to calc_traveling_salesman() if there is no current path to repair, or few enough trash tiles that the
+    exact search is used instead.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param total_move_reset: Bool indicating if "total moves counter" should reset.
+    """
+    logger.debug('repair_traveling_salesman()')
+
+    trash_tile_set = set(data_manager.graph.data['trash_tiles'])
+    ideal_overall_path = data_manager.ideal_overall_path
+    if ideal_overall_path is None or len(trash_tile_set) <= data_manager.exact_tour_max_trash:
+        calc_traveling_salesman(data_manager, total_move_reset=total_move_reset)
+        return
+
+    # Clear all debug entities.
+    clear_debug_entities(data_manager)
+
+    if total_move_reset:
+        data_manager.gui_data['total_move_counter'] = 0
+
+    roomba_x, roomba_y = data_manager.roomba.sprite.tile
+    roomba_tile_id = get_tile_index(data_manager, roomba_x, roomba_y)
+    if data_manager.trash_distances.roomba_id != roomba_tile_id:
+        calc_trash_distances(data_manager, roomba_only=True)
+    node_ids, cost_matrix = build_cost_matrix(data_manager.trash_distances)
+    node_indexes = {tile_id: node for node, tile_id in enumerate(node_ids)}
+
+    # Keep existing path order for all remaining trash tiles. Path always restarts from current roomba location.
+    tour = [0] + [node_indexes[tile_id] for tile_id in ideal_overall_path['ordering'][1:] if tile_id in trash_tile_set]
+    kept_tile_ids = set(ideal_overall_path['ordering'][1:])
+    new_nodes = [node_indexes[tile_id] for tile_id in node_ids[1:] if tile_id not in kept_tile_ids]
+    logger.debug('Repairing path with {0} new trash tiles.'.format(len(new_nodes)))
+
+    data_manager.tour_annealer = None
+    if data_manager.tour_improver is not None:
+        data_manager.tour_improver.cancel()
+    if data_manager.tour_clusters is not None and isinstance(cost_matrix, CandidateMatrix):
+        # Path was planned per cluster. Keep every cluster that no new tiles were added to.
+        tour = calc_clustered_traveling_salesman(data_manager, node_ids, cost_matrix)
+    elif isinstance(cost_matrix, CandidateMatrix):
+        # Only nearest neighbor costs are known. Insert new tiles, then only re-optimize with candidate moves.
+        repair_tour(cost_matrix, tour, new_nodes, window=0)
+        improve_candidate_tour(cost_matrix, tour)
+    else:
+        repair_tour(cost_matrix, tour, new_nodes)
+
+    # Path covers a different set of trash tiles, so always replace the old one.
+    data_manager.ideal_overall_path = {
+        'ordering': [roomba_tile_id] + [node_ids[node] for node in tour[1:]],
+        'total_cost': calc_tour_cost(cost_matrix, tour),
+    }
+    data_manager.gui_data['optimal_counter'] = data_manager.ideal_overall_path['total_cost']
+    data_manager.route_cursor = None
+    logger.debug('repaired_path: {0}'.format(data_manager.ideal_overall_path))
+
+    # Save path for later annealing, unless lower bound shows that no better path exists.
+    tour_cost = data_manager.ideal_overall_path['total_cost']
+    if isinstance(cost_matrix, CandidateMatrix):
+        data_manager.gui_data['optimal_lower_bound'] = None
+    elif calc_traveling_salesman_bound(data_manager, node_ids, cost_matrix, tour_cost) < tour_cost:
+        start_tour_improvement(data_manager, node_ids, cost_matrix, tour, roomba_tile_id)
+    log_optimality_gap(data_manager)
+
+
+def calc_clustered_traveling_salesman(data_manager, node_ids, cost_matrix, reuse_clusters=True):
+    """
+    Plans overall path "cluster first, route second". See calc_hierarchical_tour() in src/planning.py.
+
+    Trash tiles are grouped into clusters of roughly "tour_cluster_size" nearby tiles each. Clusters are visited one
+    after another, and each gets its own separately planned path.
+
+    Existing clusters are reused where possible. Cleaned tiles are dropped from their cluster, and each new tile joins
+    whichever cluster is nearest. Only clusters that gained tiles are then re-planned, while every other cluster keeps
+    its existing path. Clusters are rebuilt from scratch if none exist yet, or any has grown past four times its target
+    size.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param node_ids: Tile id of each cost matrix node.
+    :param cost_matrix: Candidate cost matrix.
+    :param reuse_clusters: Bool indicating if existing clusters should be reused.
+    :return: Tour, as list of node indexes.
+    """
+    logger.debug('calc_clustered_traveling_salesman()')
+
+    node_indexes = {tile_id: node for node, tile_id in enumerate(node_ids)}
+    cluster_size = max(1, data_manager.tour_cluster_size)
+    clusters = None
+    if reuse_clusters and data_manager.tour_clusters is not None:
+        clusters = []
+        clustered_tile_ids = set()
+        for cluster in data_manager.tour_clusters:
+            members = [node_indexes[tile_id] for tile_id in cluster['tour'] if tile_id in node_indexes]
+            clustered_tile_ids.update(cluster['tour'])
+            if members:
+                clusters.append({'medoid': node_indexes.get(cluster['medoid']), 'members': members, 'tour': members})
+
+        new_nodes = [node for node, tile_id in enumerate(node_ids[1:], start=1) if tile_id not in clustered_tile_ids]
+        if clusters:
+            add_cluster_nodes(cost_matrix, clusters, new_nodes)
+        if not clusters or any(len(cluster['members']) > 4 * cluster_size for cluster in clusters):
+            clusters = None
+
+    if clusters is None:
+        logger.info('Grouping trash tiles into clusters.')
+        clusters = calc_tour_clusters(cost_matrix, -(-(len(node_ids) - 1) // cluster_size))
+
+    tour, clusters = calc_hierarchical_tour(cost_matrix, clusters, max_workers=data_manager.pathing_workers)
+    data_manager.tour_clusters = [
+        {'medoid': node_ids[cluster['medoid']], 'tour': [node_ids[node] for node in cluster['tour']]}
+        for cluster in clusters
+    ]
+    return tour
+
+
+def start_tour_improvement(data_manager, node_ids, cost_matrix, tour, roomba_tile_id):
+    """
+    Saves a heuristic overall path for later improvement, via either run_tour_annealing() or a background TourImprover.
+    Annealer itself is only created once annealing actually runs. Either way, it stops once it stops improving. See
+    build_convergence_monitor().
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param node_ids: Tile id of each cost matrix node.
+    :param cost_matrix: Tour cost matrix.
+    :param tour: Tour to improve, as list of node indexes.
+    :param roomba_tile_id: Tile id of roomba, at the time the tour was planned.
+    """
+    data_manager.tour_annealer = {
+        'annealer': None,
+        'node_ids': node_ids,
+        'cost_matrix': cost_matrix,
+        'tour': list(tour),
+        'roomba_tile_id': roomba_tile_id,
+        'environment_version': data_manager.environment_version,
+    }
+
+    # Keep improving path in the background, if a background improver is running.
+    if data_manager.tour_improver is not None:
+        data_manager.tour_improver.submit(
+            data_manager.tour_annealer,
+            cost_matrix,
+            tour,
+            monitor=build_convergence_monitor(data_manager, data_manager.tour_stall_steps_per_node * len(tour)),
+            lower_bound=data_manager.gui_data.get('optimal_lower_bound') or 0,
+        )
+
+
+def run_tour_annealing(data_manager, budget_ms=None):
+    """
+    Resumes annealing of the most recent heuristic overall path, for a limited time.
+    Annealing is paused once time runs out, and picks back up from the same point on the next call.
+
+    Any improved path is written straight to the data manager's ideal overall path.
+    Annealing is discarded as soon as the environment changes or roomba moves, as its path then no longer applies.
+
+    Runs on the calling thread, so is only used when "background_tour_improvement" is off, such as on single-core
+    machines, or when debugging. See apply_tour_improvements() for annealing on a background thread instead.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param budget_ms: Optional time budget, in milliseconds. Defaults to data manager "tour_anneal_budget_ms" value.
+    :return: True if ideal overall path was improved | False otherwise.
+    """
+    if budget_ms is None:
+        budget_ms = data_manager.tour_anneal_budget_ms
+    if budget_ms <= 0:
+        return False
+
+    tour_annealer = get_tour_annealer(data_manager)
+    if tour_annealer is None:
+        return False
+
+    annealer = tour_annealer['annealer']
+    if annealer is None:
+        tour = tour_annealer['tour']
+        annealer = TourAnnealer(
+            tour_annealer['cost_matrix'],
+            tour,
+            monitor=build_convergence_monitor(data_manager, data_manager.tour_stall_steps_per_node * len(tour)),
+            lower_bound=data_manager.gui_data.get('optimal_lower_bound') or 0,
+        )
+        tour_annealer['annealer'] = annealer
+    if annealer.is_finished:
+        logger.info('Path annealing stopped: {0}'.format(annealer.stop_reason))
+        data_manager.tour_annealer = None
+        return False
+
+    improved = False
+
+    def _on_improve(tour, cost):
+        """
+        Saves newly found best path, if it beats the current ideal overall path.
+        """
+        nonlocal improved
+        improved = save_annealed_tour(data_manager, tour_annealer, tour, cost) or improved
+
+    annealer.run(budget_ms, on_improve=_on_improve)
+    return improved
+
+
+def apply_tour_improvements(data_manager):
+    """
+    Takes the best overall path published so far by the background tour improver, if it beats the current one.
+    Only reads the improver's latest published result, so never waits on the improver itself.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :return: True if ideal overall path was improved | False otherwise.
+    """
+    tour_improver = data_manager.tour_improver
+    if tour_improver is None:
+        return False
+
+    # Verify current path still applies. Otherwise its job is cancelled.
+    tour_annealer = get_tour_annealer(data_manager)
+    if tour_annealer is None:
+        return False
+
+    # Result only applies if it came from the current path's job.
+    result = tour_improver.result
+    if result is None or result[0] is not tour_annealer:
+        return False
+    _, tour, cost = result
+
+    return save_annealed_tour(data_manager, tour_annealer, tour, cost)
+
+
+def get_tour_annealer(data_manager):
+    """
+    Gets saved annealing data for the most recent heuristic overall path.
+    If environment has since changed, or roomba has since moved, then data is discarded, and any background job for it
+    is cancelled.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :return: Annealing data dict | None if no path currently applies.
+    """
+    tour_annealer = data_manager.tour_annealer
+    if tour_annealer is None:
+        return None
+
+    roomba_x, roomba_y = data_manager.roomba.sprite.tile
+    roomba_tile_id = get_tile_index(data_manager, roomba_x, roomba_y)
+    if (
+        roomba_tile_id != tour_annealer['roomba_tile_id'] or
+        data_manager.environment_version != tour_annealer['environment_version']
+    ):
+        data_manager.tour_annealer = None
+        if data_manager.tour_improver is not None:
+            data_manager.tour_improver.cancel()
+        return None
+
+    return tour_annealer
+
+
+def save_annealed_tour(data_manager, tour_annealer, tour, cost):
+    """
+    Saves an annealed path as the new ideal overall path, if it beats the current one.
+    Path is swapped in as a whole new dict, so it is never seen partially updated.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :param tour_annealer: Annealing data dict that path was found from.
+    :param tour: Annealed tour, as list of node indexes.
+    :param cost: Total cost of tour.
+    :return: True if path was saved | False otherwise.
+    """
+    if cost >= data_manager.ideal_overall_path['total_cost']:
+        return False
+
+    logger.debug('Annealing found more efficient path. Cost: {0}'.format(cost))
+    node_ids = tour_annealer['node_ids']
+    data_manager.ideal_overall_path = {
+        'ordering': [tour_annealer['roomba_tile_id']] + [node_ids[node] for node in tour[1:]],
+        'total_cost': cost,
+    }
+    data_manager.gui_data['optimal_counter'] = cost
+    log_optimality_gap(data_manager)
+
+    # Route was expanded from the old path, so rebuild it on next use.
+    data_manager.route_cursor = None
+    return True
+
+
+def get_route_cursor(data_manager):
+    """
+    Gets the route cursor for the roomba to follow.
+
+    The current cursor is reused for as long as it holds. Otherwise a new one is built from the ideal overall path,
+    which is first recalculated if it no longer starts at the roomba tile, or no longer covers every trash tile.
+    :param data_manager: Data manager data structure. Consolidates useful program data to one location.
+    :return: Route cursor instance.
+    """
+    roomba_x, roomba_y = data_manager.roomba.sprite.tile
+    roomba_tile_id = get_tile_index(data_manager, roomba_x, roomba_y)
+
+    route_cursor = data_manager.route_cursor
+    if (
+        route_cursor is not None and
+        not route_cursor.is_finished and
+        route_cursor.is_valid(roomba_tile_id, data_manager.environment_version)
+    ):
+        return route_cursor
+
+    logger.debug('get_route_cursor()')
+    logger.info('Planning new roomba route.')
+
+    # Ensure tour matches the current roomba location and trash tiles.
+    calc_trash_distances(data_manager, roomba_only=True)
+    ideal_overall_path = data_manager.ideal_overall_path
+    if (
+        ideal_overall_path is None or
+        ideal_overall_path['ordering'][0] != roomba_tile_id or
+        set(ideal_overall_path['ordering'][1:]) != set(data_manager.graph.data['trash_tiles'])
+    ):
+        calc_traveling_salesman(data_manager, total_move_reset=False)
+
+    route_cursor = RouteCursor(
+        data_manager.wall_grid,
+        data_manager.trash_distances,
+        data_manager.ideal_overall_path['ordering'],
+        data_manager.environment_version,
+    )
+    data_manager.route_cursor = route_cursor
+    return route_cursor
+
+
 def clear_debug_entities(data_manager):
     """
     Removes all debug entities, so that the screen does not become cluttered with redundant/overlapping debug info.
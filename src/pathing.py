@@ -0,0 +1,1446 @@
+"""
+Tile pathfinding logic.
+
+Kept separate from general program logic, and free of any SDL2 references, so that searches only ever depend on the
+plain data passed into them.
+"""
+
+# System Imports.
+import heapq, itertools, os
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# User Imports.
+from src.logging import init_logging
+
+
+# Initialize logger.
+logger = init_logging(__name__)
+
+
+# Module Variables.
+# Distance value for tiles that cannot be reached at all, such as when fully enclosed by walls.
+UNREACHABLE = 999999
+
+# Same as above, but as stored within distance fields. Fields use unsigned 16-bit values, so this is the max value.
+FIELD_UNREACHABLE = 0xFFFF
+
+# Valid search methods, for building distance fields.
+PATHING_MODES = ('a_star', 'multi_target', 'flood_fill')
+
+# Process pool for running batches of work in parallel, such as searches or tour planning. Lazily created on first use,
+# then kept for reuse.
+_process_pool = None
+_process_pool_workers = None
+_process_pool_warm_ups = None
+
+# Smallest batch of searches worth splitting across processes, as estimated work of (search count * grid tile count).
+# Roughly 100 milliseconds of flood fill. Smaller batches save less than process communication costs.
+MIN_PARALLEL_WORK = 200000
+
+# Bit flags for each tile wall, as stored by the wall grid.
+WALL_NORTH = 1
+WALL_EAST = 2
+WALL_SOUTH = 4
+WALL_WEST = 8
+
+# Wall bitmask for each of the 0-14 tile "wall_state" values. Order matches original state numbering.
+STATE_TO_MASK = (
+    0,                                  # 0: No walls.
+    WALL_NORTH,                         # 1: North only.
+    WALL_EAST,                          # 2: East only.
+    WALL_SOUTH,                         # 3: South only.
+    WALL_WEST,                          # 4: West only.
+    WALL_NORTH | WALL_EAST,             # 5: North and east.
+    WALL_NORTH | WALL_SOUTH,            # 6: North and south.
+    WALL_NORTH | WALL_WEST,             # 7: North and west.
+    WALL_EAST | WALL_SOUTH,             # 8: East and south.
+    WALL_EAST | WALL_WEST,              # 9: East and west.
+    WALL_SOUTH | WALL_WEST,             # 10: South and west.
+    WALL_EAST | WALL_SOUTH | WALL_WEST,     # 11: All except north.
+    WALL_NORTH | WALL_SOUTH | WALL_WEST,    # 12: All except east.
+    WALL_NORTH | WALL_EAST | WALL_WEST,     # 13: All except south.
+    WALL_NORTH | WALL_EAST | WALL_SOUTH,    # 14: All except west.
+)
+
+# Reverse lookup of above. A fully walled tile has no corresponding state, so maps to None.
+MASK_TO_STATE = tuple(STATE_TO_MASK.index(mask) if mask in STATE_TO_MASK else None for mask in range(16))
+
+
+# region Search Engines
+
+def calc_a_star_path(start_id, end_id, get_neighbors, get_coords):
+    """
+    Calculates the shortest path between two tiles, using the A* algorithm.
+
+    Frontier is held in a binary heap of (estimated_total_cost, forward_cost, counter, tile_id) tuples.
+    The counter breaks any remaining ties in insertion order, so that tile ids themselves are never compared.
+    Rather than storing a full path per frontier entry, each tile only records which tile it was reached from. The final
+    path is then rebuilt once, upon reaching the end tile.
+    :param start_id: Id of tile to start from.
+    :param end_id: Id of tile to end at.
+    :param get_neighbors: Function that takes a tile id and returns ids of all directly accessible neighbor tiles.
+    :param get_coords: Function that takes a tile id and returns the (x, y) coordinates of the tile.
+    :return: List of tile ids making up the path, including both start and end tiles | None if end is unreachable.
+    """
+    logger.debug('calc_a_star_path()')
+
+    end_x, end_y = get_coords(end_id)
+
+    def _calc_forward_cost(tile_id):
+        """
+        Minimum possible distance to end tile, assuming no walls or barriers exist between them.
+        """
+        tile_x, tile_y = get_coords(tile_id)
+        return abs(tile_x - end_x) + abs(tile_y - end_y)
+
+    counter = itertools.count()
+    start_forward_cost = _calc_forward_cost(start_id)
+    priority_queue = [(start_forward_cost, start_forward_cost, next(counter), start_id)]
+    backward_costs = {start_id: 0}
+    parents = {start_id: None}
+    handled_tiles = set()
+
+    # Always use priority queue to check the shortest-distance tile.
+    while priority_queue:
+        total_cost, forward_cost, _, curr_id = heapq.heappop(priority_queue)
+
+        # Check if tile is at desired end position.
+        if curr_id == end_id:
+            return _build_path(parents, end_id)
+
+        # Skip stale entries, for tiles that were already handled via a cheaper route.
+        if curr_id in handled_tiles:
+            continue
+        handled_tiles.add(curr_id)
+
+        # Calculate costs of all accessible neighbor tiles.
+        neighbor_backward_cost = backward_costs[curr_id] + 1
+        for neighbor_id in get_neighbors(curr_id):
+            if neighbor_backward_cost < backward_costs.get(neighbor_id, neighbor_backward_cost + 1):
+                backward_costs[neighbor_id] = neighbor_backward_cost
+                parents[neighbor_id] = curr_id
+                neighbor_forward_cost = _calc_forward_cost(neighbor_id)
+                heapq.heappush(
+                    priority_queue,
+                    (
+                        neighbor_backward_cost + neighbor_forward_cost,
+                        neighbor_forward_cost,
+                        next(counter),
+                        neighbor_id,
+                    ),
+                )
+
+    # Exhausted all accessible tiles without finding end tile.
+    return None
+
+
+def calc_multi_target_search(start_id, end_ids, get_neighbors):
+    """
+    Calculates the shortest distance from one tile to each of a set of tiles, using a single breadth-first expansion.
+
+    All tile-to-tile moves cost the same, so tiles are settled in order of distance from start tile. Thus expansion can
+    stop as soon as the last desired end tile is reached, and every distance found along the way is already a shortest
+    one.
+    :param start_id: Id of tile to start from.
+    :param end_ids: Iterable of tile ids to find distances to.
+    :param get_neighbors: Function that takes a tile id and returns ids of all directly accessible neighbor tiles.
+    :return: Tuple of (distances, parents).
+        Distances is a dict of {end_tile_id: distance}. Unreachable tiles are omitted.
+        Parents is a dict of {tile_id: id of tile it was reached from}, for every tile visited by the search.
+    """
+    logger.debug('calc_multi_target_search()')
+
+    pending_ids = set(end_ids)
+    pending_ids.discard(start_id)
+    distances = {}
+    backward_costs = {start_id: 0}
+    parents = {start_id: None}
+    tile_queue = deque([start_id])
+
+    # Expand outwards from start tile, one tile at a time, until all end tiles are found.
+    while tile_queue and pending_ids:
+        curr_id = tile_queue.popleft()
+        neighbor_backward_cost = backward_costs[curr_id] + 1
+        for neighbor_id in get_neighbors(curr_id):
+            if neighbor_id not in parents:
+                parents[neighbor_id] = curr_id
+                backward_costs[neighbor_id] = neighbor_backward_cost
+                tile_queue.append(neighbor_id)
+
+                # Check if tile is one of our desired end positions.
+                if neighbor_id in pending_ids:
+                    pending_ids.remove(neighbor_id)
+                    distances[neighbor_id] = neighbor_backward_cost
+
+    return distances, parents
+
+
+def _build_path(parents, end_id):
+    """
+    Rebuilds full path, by walking backwards from end tile through recorded parent tiles.
+    :param parents: Dict of {tile_id: id of tile it was reached from}. Start tile has a parent of None.
+    :param end_id: Id of tile to end at.
+    :return: List of tile ids making up the path, starting at start tile.
+    """
+    path = []
+    curr_id = end_id
+    while curr_id is not None:
+        path.append(curr_id)
+        curr_id = parents[curr_id]
+    path.reverse()
+
+    return path
+
+# endregion Search Engines
+
+
+# region Wall Grid
+
+class WallGrid:
+    """
+    Compact store of all tile walls in the environment.
+
+    Each tile is a single byte of wall bit flags, with tile (x, y) held at index (y * width + x). This matches the
+    tile's id. Walls are shared between adjacent tiles, so setting a wall on one tile also sets the facing wall of its
+    neighbor. Thus the grid is always consistent, and is the single source of truth for walls. Tile entities only hold
+    views of it, for rendering and user interaction.
+    """
+    # Per-direction offset data, of (dx, dy, opposite wall flag).
+    _neighbor_data = {
+        WALL_NORTH: (0, -1, WALL_SOUTH),
+        WALL_EAST: (1, 0, WALL_WEST),
+        WALL_SOUTH: (0, 1, WALL_NORTH),
+        WALL_WEST: (-1, 0, WALL_EAST),
+    }
+
+    def __init__(self, width, height):
+        """
+        :param width: Number of tiles in each grid row.
+        :param height: Number of tiles in each grid column.
+        """
+        logger.debug('WallGrid.__init__()')
+
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+
+    def get_mask(self, tile_id):
+        """
+        :param tile_id: Id of tile.
+        :return: Wall bitmask of tile.
+        """
+        return self.cells[tile_id]
+
+    def get_state(self, tile_id):
+        """
+        :param tile_id: Id of tile.
+        :return: Wall state value (0-14) of tile | None if tile is fully walled.
+        """
+        return MASK_TO_STATE[self.cells[tile_id]]
+
+    def has_wall(self, tile_id, wall):
+        """
+        :param tile_id: Id of tile.
+        :param wall: Wall bit flag to check.
+        :return: True if tile has given wall | False otherwise.
+        """
+        return bool(self.cells[tile_id] & wall)
+
+    def get_neighbor_id(self, tile_id, wall):
+        """
+        :param tile_id: Id of tile.
+        :param wall: Wall bit flag, indicating direction of neighbor.
+        :return: Id of neighbor tile on other side of wall | None if wall is on grid edge.
+        """
+        offset_x, offset_y, _ = self._neighbor_data[wall]
+        tile_y, tile_x = divmod(tile_id, self.width)
+        tile_x += offset_x
+        tile_y += offset_y
+        if 0 <= tile_x < self.width and 0 <= tile_y < self.height:
+            return tile_y * self.width + tile_x
+        return None
+
+    def get_open_neighbor_ids(self, tile_id):
+        """
+        Gets ids of all tiles directly accessible from provided tile. Tiles on grid edges always have edge walls, so
+        neighbors never wrap around.
+        :param tile_id: Id of tile to get neighbors of.
+        :return: List of neighboring tile ids.
+        """
+        wall_mask = self.cells[tile_id]
+        neighbor_ids = []
+        if not wall_mask & WALL_NORTH:
+            neighbor_ids.append(tile_id - self.width)
+        if not wall_mask & WALL_EAST:
+            neighbor_ids.append(tile_id + 1)
+        if not wall_mask & WALL_SOUTH:
+            neighbor_ids.append(tile_id + self.width)
+        if not wall_mask & WALL_WEST:
+            neighbor_ids.append(tile_id - 1)
+        return neighbor_ids
+
+    def set_wall(self, tile_id, wall, value):
+        """
+        Sets or clears a single wall, on both tiles that share it.
+        :param tile_id: Id of tile.
+        :param wall: Wall bit flag to update.
+        :param value: Bool indicating if wall should exist.
+        :return: List of ids for all tiles that had their walls change.
+        """
+        if bool(self.cells[tile_id] & wall) == value:
+            return []
+
+        changed_ids = [tile_id]
+        neighbor_id = self.get_neighbor_id(tile_id, wall)
+        opposite_wall = self._neighbor_data[wall][2]
+        if value:
+            self.cells[tile_id] |= wall
+            if neighbor_id is not None:
+                self.cells[neighbor_id] |= opposite_wall
+                changed_ids.append(neighbor_id)
+        else:
+            self.cells[tile_id] &= ~wall
+            if neighbor_id is not None:
+                self.cells[neighbor_id] &= ~opposite_wall
+                changed_ids.append(neighbor_id)
+
+        return changed_ids
+
+    def set_state(self, tile_id, wall_state):
+        """
+        Sets all walls of tile to match given wall state value.
+        :param tile_id: Id of tile.
+        :param wall_state: Wall state value (0-14).
+        :return: List of ids for all tiles that had their walls change.
+        """
+        mask = STATE_TO_MASK[wall_state]
+        changed_ids = []
+        for wall in (WALL_NORTH, WALL_EAST, WALL_SOUTH, WALL_WEST):
+            for changed_id in self.set_wall(tile_id, wall, bool(mask & wall)):
+                if changed_id not in changed_ids:
+                    changed_ids.append(changed_id)
+
+        return changed_ids
+
+    def get_open_mask_bytes(self, wall):
+        """
+        Gets string of binary digits, indicating which tiles do not have the given wall. Highest tile id comes first, so
+        the result can be directly parsed into an integer bitboard.
+        :param wall: Wall bit flag to check.
+        :return: Bytes of b'0' and b'1' characters, one per tile.
+        """
+        table = bytes(ord('0') if mask & wall else ord('1') for mask in range(256))
+        return self.cells.translate(table)[::-1]
+
+# endregion Wall Grid
+
+
+# region Flood Fill Kernel
+
+class FloodFillKernel:
+    """
+    Distance kernel that expands breadth-first search frontiers a full layer at a time.
+
+    Tiles are packed into Python integer "bitboards", where tile (x, y) is held by bit (y * width + x). This matches the
+    tile's id, so ids can be used directly as bit indexes.
+    Grid passability is then stored as four directional masks. For example, a tile's bit is set in the north mask if the
+    tile has no north wall, and thus can be exited northwards.
+
+    Expanding a frontier one step in a given direction is then a single AND against that direction's mask, followed by a
+    shift of one row (north/south) or one column (east/west). So every layer of a search costs a handful of whole-grid
+    integer operations, rather than a Python-level visit of every tile in the layer.
+    """
+    def __init__(self, width, height, wall_grid=None):
+        """
+        :param width: Number of tiles in each grid row.
+        :param height: Number of tiles in each grid column.
+        :param wall_grid: Wall grid to read tile walls from. If not provided, then grid is treated as having no walls.
+        """
+        logger.debug('FloodFillKernel.__init__()')
+
+        self.width = width
+        self.height = height
+        self.tile_count = width * height
+        self.full_mask = (1 << self.tile_count) - 1
+
+        # Calculate masks of all moves that stay within grid bounds, regardless of walls.
+        first_col_mask = 0
+        for tile_y in range(height):
+            first_col_mask |= 1 << (tile_y * width)
+        last_col_mask = first_col_mask << (width - 1)
+        first_row_mask = (1 << width) - 1
+        last_row_mask = first_row_mask << ((height - 1) * width)
+        self.bounds_north = self.full_mask & ~first_row_mask
+        self.bounds_east = self.full_mask & ~last_col_mask
+        self.bounds_south = self.full_mask & ~last_row_mask
+        self.bounds_west = self.full_mask & ~first_col_mask
+
+        if wall_grid is None:
+            # No walls. Every in-bounds move is open.
+            self.open_north = self.bounds_north
+            self.open_east = self.bounds_east
+            self.open_south = self.bounds_south
+            self.open_west = self.bounds_west
+        else:
+            # Translate the grid buffer directly into strings of binary digits, to avoid any per-tile Python logic.
+            self.open_north = int(wall_grid.get_open_mask_bytes(WALL_NORTH), 2) & self.bounds_north
+            self.open_east = int(wall_grid.get_open_mask_bytes(WALL_EAST), 2) & self.bounds_east
+            self.open_south = int(wall_grid.get_open_mask_bytes(WALL_SOUTH), 2) & self.bounds_south
+            self.open_west = int(wall_grid.get_open_mask_bytes(WALL_WEST), 2) & self.bounds_west
+
+    def get_index(self, tile_x, tile_y):
+        """
+        :param tile_x: Tile x coordinate.
+        :param tile_y: Tile y coordinate.
+        :return: Bit index of tile.
+        """
+        return tile_y * self.width + tile_x
+
+    def get_coords(self, tile_index):
+        """
+        :param tile_index: Bit index of tile.
+        :return: Tuple of (x_coord, y_coord) for tile.
+        """
+        tile_y, tile_x = divmod(tile_index, self.width)
+        return tile_x, tile_y
+
+    def get_mask(self, tile_indexes):
+        """
+        :param tile_indexes: Iterable of tile bit indexes.
+        :return: Bitboard with only the provided tiles set.
+        """
+        mask = 0
+        for tile_index in tile_indexes:
+            mask |= 1 << tile_index
+        return mask
+
+    @staticmethod
+    def iter_indexes(mask):
+        """
+        Yields the bit index of every tile set in bitboard, in ascending order.
+        :param mask: Bitboard to read tiles from.
+        """
+        while mask:
+            low_bit = mask & -mask
+            yield low_bit.bit_length() - 1
+            mask ^= low_bit
+
+    def expand(self, frontier):
+        """
+        Moves every tile of frontier one step in all four directions.
+        :param frontier: Bitboard of tiles to expand from.
+        :return: Bitboard of all tiles one step away from frontier. May include tiles from the frontier itself.
+        """
+        return (
+            ((frontier & self.open_north) >> self.width) |
+            ((frontier & self.open_east) << 1) |
+            ((frontier & self.open_south) << self.width) |
+            ((frontier & self.open_west) >> 1)
+        )
+
+    def calc_layers(self, start_index, target_mask=0, max_distance=None, target_count=None):
+        """
+        Runs a breadth-first flood fill from start tile.
+        :param start_index: Bit index of tile to start from.
+        :param target_mask: Optional bitboard of tiles. Fill stops early once every one of these has been reached.
+        :param max_distance: Optional maximum distance to fill out to.
+        :param target_count: Optional number of target tiles. Fill stops early once at least this many are reached.
+            The full layer of the last one is always kept, so ties at the same distance are never split.
+        :return: List of bitboards, where index N holds all tiles at exactly distance N from start tile.
+        """
+        frontier = 1 << start_index
+        visited = frontier
+        layers = [frontier]
+        target_mask &= ~visited
+        found_count = 0
+
+        while frontier and (max_distance is None or len(layers) <= max_distance):
+            # Stop once all targets are found, if any were provided.
+            if target_mask and not (target_mask & ~visited):
+                break
+            if target_count is not None and found_count >= target_count:
+                break
+
+            frontier = self.expand(frontier) & ~visited
+            if frontier:
+                visited |= frontier
+                layers.append(frontier)
+                if target_count is not None:
+                    # Python 3.9 has no int.bit_count().
+                    found_count += bin(frontier & target_mask).count('1')
+
+        return layers
+
+    def calc_reachable(self, start_index):
+        """
+        :param start_index: Bit index of tile to start from.
+        :return: Bitboard of all tiles reachable from start tile.
+        """
+        frontier = 1 << start_index
+        visited = frontier
+        while frontier:
+            frontier = self.expand(frontier) & ~visited
+            visited |= frontier
+        return visited
+
+
+# endregion Flood Fill Kernel
+
+
+# region Distance Tables
+
+class DistanceField:
+    """
+    Shortest distance from a single source tile to every tile in the grid.
+
+    Distances are held in a flat unsigned 16-bit array, using the same tile ids as the wall grid. Full paths are never
+    stored. Instead, the next hop from any tile is whichever open neighbor sits exactly one step closer to the source,
+    so paths can be lazily rebuilt when actually needed.
+
+    A "complete" field holds the distance of every tile, and can then be repaired in place when a single wall changes,
+    rather than being searched again from scratch. Fields from searches that stopped early only hold the tiles visited,
+    and cannot be repaired.
+    """
+    def __init__(self, wall_grid, source_id, is_complete=True, distances=None):
+        """
+        :param wall_grid: Wall grid that field distances are based on.
+        :param source_id: Id of tile that distances are measured from.
+        :param is_complete: Bool indicating if field will hold the distance of every tile.
+        :param distances: Optional existing distance array to use, such as one calculated by another process.
+        """
+        self.wall_grid = wall_grid
+        self.source_id = source_id
+        self.is_complete = is_complete
+        if distances is None:
+            distances = array('H', [FIELD_UNREACHABLE]) * len(wall_grid.cells)
+            distances[source_id] = 0
+        self.distances = distances
+
+    @classmethod
+    def from_layers(cls, wall_grid, layers, is_complete=True):
+        """
+        Creates field from flood fill kernel layers.
+        :param wall_grid: Wall grid that kernel was built from.
+        :param layers: Layers, as returned from FloodFillKernel.calc_layers().
+        :param is_complete: Bool indicating if layers cover every reachable tile.
+        :return: Distance field instance.
+        """
+        field = cls(wall_grid, layers[0].bit_length() - 1, is_complete=is_complete)
+        distances = field.distances
+        for distance, layer in enumerate(layers):
+            for tile_id in FloodFillKernel.iter_indexes(layer):
+                distances[tile_id] = distance
+        return field
+
+    @classmethod
+    def from_parents(cls, wall_grid, parents):
+        """
+        Creates field from a dict of parent tiles, such as those recorded during a breadth-first search. Every chain of
+        parents must follow a shortest path. Resulting field only holds the tiles present in parents, so is incomplete.
+        :param wall_grid: Wall grid that search was run on.
+        :param parents: Dict of {tile_id: id of tile it was reached from}. Source tile has a parent of None.
+        :return: Distance field instance.
+        """
+        source_id = next(tile_id for tile_id, parent_id in parents.items() if parent_id is None)
+        field = cls(wall_grid, source_id, is_complete=False)
+        distances = field.distances
+        for tile_id in parents:
+            # Walk up until a tile with known distance is found, then fill back down.
+            chain = []
+            while distances[tile_id] == FIELD_UNREACHABLE:
+                chain.append(tile_id)
+                tile_id = parents[tile_id]
+            distance = distances[tile_id]
+            for chain_id in reversed(chain):
+                distance += 1
+                distances[chain_id] = distance
+        return field
+
+    def get_distance(self, tile_id):
+        """
+        :param tile_id: Id of tile.
+        :return: Shortest distance from source to tile | UNREACHABLE if tile is unreachable, or was never reached.
+        """
+        distance = self.distances[tile_id]
+        return UNREACHABLE if distance == FIELD_UNREACHABLE else distance
+
+    def get_next_hop(self, tile_id):
+        """
+        :param tile_id: Id of tile to step from.
+        :return: Id of next tile towards source | None if tile is the source, or was never reached.
+        """
+        distance = self.distances[tile_id]
+        if distance == 0 or distance == FIELD_UNREACHABLE:
+            return None
+        for neighbor_id in self.wall_grid.get_open_neighbor_ids(tile_id):
+            if self.distances[neighbor_id] == distance - 1:
+                return neighbor_id
+        return None
+
+    def calc_path_to_source(self, tile_id):
+        """
+        Rebuilds full path from provided tile back to source, by following each next hop in turn.
+        :param tile_id: Id of tile to start from.
+        :return: List of tile ids making up the path, ending at source tile.
+        """
+        path = [tile_id]
+        next_id = self.get_next_hop(tile_id)
+        while next_id is not None:
+            path.append(next_id)
+            next_id = self.get_next_hop(next_id)
+        return path
+
+    def repair_edge(self, tile_id, neighbor_id):
+        """
+        Updates field in place, after the wall between two adjacent tiles has been opened or closed.
+        Only tiles whose distance may have changed are visited.
+
+        Field must be complete, and must have been correct for the wall grid as it was before this one change.
+        :param tile_id: Id of tile on one side of changed wall.
+        :param neighbor_id: Id of tile on other side of changed wall.
+        :return: List of ids for all tiles that had their distance updated.
+        """
+        if neighbor_id in self.wall_grid.get_open_neighbor_ids(tile_id):
+            return self._repair_opened_edge(tile_id, neighbor_id)
+        else:
+            return self._repair_closed_edge(tile_id, neighbor_id)
+
+    def _repair_opened_edge(self, tile_id, neighbor_id):
+        """
+        Incremental repair. Opening a wall can only ever shorten distances, starting from whichever side of the wall is
+        farther from source. Shortened distances then spread outwards, breadth-first, for as long as they improve on
+        existing ones.
+        """
+        distances = self.distances
+        near_id, far_id = tile_id, neighbor_id
+        if distances[near_id] > distances[far_id]:
+            near_id, far_id = far_id, near_id
+        if distances[near_id] == FIELD_UNREACHABLE or distances[near_id] + 1 >= distances[far_id]:
+            # New edge does not provide any shorter paths.
+            return []
+
+        distances[far_id] = distances[near_id] + 1
+        changed_ids = [far_id]
+        tile_queue = deque(changed_ids)
+        while tile_queue:
+            curr_id = tile_queue.popleft()
+            neighbor_distance = distances[curr_id] + 1
+            for next_id in self.wall_grid.get_open_neighbor_ids(curr_id):
+                if neighbor_distance < distances[next_id]:
+                    distances[next_id] = neighbor_distance
+                    changed_ids.append(next_id)
+                    tile_queue.append(next_id)
+
+        return changed_ids
+
+    def _repair_closed_edge(self, tile_id, neighbor_id):
+        """
+        Decremental repair. Closing a wall can only ever lengthen distances, and only for tiles whose every shortest
+        path ran through the closed edge.
+
+        First, all such tiles are collected, in order of distance. A tile is affected if it has no remaining neighbor
+        one step closer to source, that is not itself affected.
+        Then affected tiles are re-seeded from their unaffected neighbors, and re-settled with a search limited to only
+        the affected set.
+        """
+        distances = self.distances
+        near_id, far_id = tile_id, neighbor_id
+        if distances[near_id] > distances[far_id]:
+            near_id, far_id = far_id, near_id
+        if distances[near_id] == FIELD_UNREACHABLE or distances[near_id] + 1 != distances[far_id]:
+            # Closed edge was not part of any shortest path.
+            return []
+
+        # Collect affected tiles. Queue order ensures every closer tile is already classified before it is checked.
+        get_open_neighbor_ids = self.wall_grid.get_open_neighbor_ids
+        affected_ids = set()
+        tile_queue = deque([far_id])
+        while tile_queue:
+            curr_id = tile_queue.popleft()
+            if curr_id in affected_ids:
+                continue
+            parent_distance = distances[curr_id] - 1
+            has_parent = False
+            for next_id in get_open_neighbor_ids(curr_id):
+                if distances[next_id] == parent_distance and next_id not in affected_ids:
+                    has_parent = True
+                    break
+            if has_parent:
+                continue
+
+            affected_ids.add(curr_id)
+            child_distance = distances[curr_id] + 1
+            for next_id in get_open_neighbor_ids(curr_id):
+                if distances[next_id] == child_distance:
+                    tile_queue.append(next_id)
+
+        # Re-seed affected tiles from their best unaffected neighbor.
+        priority_queue = []
+        for curr_id in affected_ids:
+            best_distance = FIELD_UNREACHABLE
+            for next_id in get_open_neighbor_ids(curr_id):
+                if next_id not in affected_ids and distances[next_id] + 1 < best_distance:
+                    best_distance = distances[next_id] + 1
+            distances[curr_id] = best_distance
+            if best_distance != FIELD_UNREACHABLE:
+                heapq.heappush(priority_queue, (best_distance, curr_id))
+
+        # Settle affected tiles. Seeds can be at differing distances, so a heap is used rather than a plain queue.
+        while priority_queue:
+            curr_distance, curr_id = heapq.heappop(priority_queue)
+            if curr_distance != distances[curr_id]:
+                continue
+            for next_id in get_open_neighbor_ids(curr_id):
+                if next_id in affected_ids and curr_distance + 1 < distances[next_id]:
+                    distances[next_id] = curr_distance + 1
+                    heapq.heappush(priority_queue, (curr_distance + 1, next_id))
+
+        return list(affected_ids)
+
+
+class DistanceTable:
+    """
+    Shortest distances between every pair of trash tiles, plus from the roomba to every trash tile.
+
+    Distances are held in an integer matrix, with one row and column per trash tile. Full paths are never stored.
+    Instead, each row also holds the distance field of the search that filled it, so that paths can be lazily rebuilt
+    when actually needed.
+
+    When every trash tile field is complete, those fields also act as "flow fields" for the roomba. Roomba distance and
+    next step towards any trash tile are then plain lookups into the trash tile's field, and the roomba never needs a
+    search of its own.
+    """
+    def __init__(self, tile_ids):
+        """
+        :param tile_ids: List of trash tile ids. Determines matrix row/column ordering.
+        """
+        self.tile_ids = list(tile_ids)
+        self.tile_rows = {tile_id: row for row, tile_id in enumerate(self.tile_ids)}
+        self.matrix = [[UNREACHABLE] * len(self.tile_ids) for _ in self.tile_ids]
+        self.fields = [None] * len(self.tile_ids)
+        for row in range(len(self.tile_ids)):
+            self.matrix[row][row] = 0
+
+        # Roomba has its own separate row, as it updates far more often than trash tiles do.
+        self.roomba_id = None
+        self.roomba_distances = [UNREACHABLE] * len(self.tile_ids)
+        self.roomba_field = None
+
+    @property
+    def has_flow_fields(self):
+        """
+        :return: True if every trash tile row holds a complete distance field.
+        """
+        return all(field is not None and field.is_complete for field in self.fields)
+
+    @property
+    def is_repairable(self):
+        """
+        :return: True if every row holds a complete distance field, so that table can be repaired on wall changes.
+        """
+        if self.roomba_field is not None and not self.roomba_field.is_complete:
+            return False
+        return self.has_flow_fields
+
+    def set_row(self, tile_id, field):
+        """
+        Saves results of a search from the provided trash tile.
+        :param tile_id: Id of trash tile that search started from.
+        :param field: Distance field of the search. Any trash tile not reached by field is left as-is.
+        """
+        row = self.tile_rows[tile_id]
+        self.fields[row] = field
+        for col, end_tile_id in enumerate(self.tile_ids):
+            distance = field.get_distance(end_tile_id)
+            if distance != UNREACHABLE:
+                self.matrix[row][col] = distance
+                self.matrix[col][row] = distance
+
+    def set_roomba_row(self, roomba_tile_id, field):
+        """
+        Saves results of a search from the roomba tile.
+        :param roomba_tile_id: Id of roomba tile.
+        :param field: Distance field of the search.
+        """
+        self.roomba_id = roomba_tile_id
+        self.roomba_field = field
+        self.roomba_distances = [field.get_distance(tile_id) for tile_id in self.tile_ids]
+
+    def set_roomba_tile(self, roomba_tile_id):
+        """
+        Updates roomba distances by reading them out of the trash tile flow fields. No search is required.
+        :param roomba_tile_id: Id of roomba tile.
+        :return: True if distances were updated | False if some trash tile field is incomplete, so a search is required.
+        """
+        if not self.has_flow_fields:
+            return False
+
+        self.roomba_id = roomba_tile_id
+        self.roomba_field = None
+        self.roomba_distances = [field.get_distance(roomba_tile_id) for field in self.fields]
+        return True
+
+    def add_tile(self, tile_id, field):
+        """
+        Adds a new trash tile to the end of the table, filling its row and column from a single search.
+        :param tile_id: Id of trash tile to add.
+        :param field: Distance field of a search from the new tile. Must reach all existing tiles, plus the roomba tile.
+        """
+        distances = [field.get_distance(end_tile_id) for end_tile_id in self.tile_ids]
+        for row, distance in enumerate(distances):
+            self.matrix[row].append(distance)
+        distances.append(0)
+        self.matrix.append(distances)
+
+        self.tile_rows[tile_id] = len(self.tile_ids)
+        self.tile_ids.append(tile_id)
+        self.fields.append(field)
+        self.roomba_distances.append(UNREACHABLE if self.roomba_id is None else field.get_distance(self.roomba_id))
+
+    def remove_tile(self, tile_id):
+        """
+        Removes a trash tile from the table.
+        Last tile is moved into the freed row and column, so that no other rows or columns need to shift.
+        :param tile_id: Id of trash tile to remove.
+        """
+        row = self.tile_rows.pop(tile_id)
+        last_row = len(self.tile_ids) - 1
+        if row != last_row:
+            last_tile_id = self.tile_ids[last_row]
+            self.tile_ids[row] = last_tile_id
+            self.tile_rows[last_tile_id] = row
+            self.fields[row] = self.fields[last_row]
+            self.roomba_distances[row] = self.roomba_distances[last_row]
+            self.matrix[row] = self.matrix[last_row]
+            for matrix_row in self.matrix:
+                matrix_row[row] = matrix_row[last_row]
+
+        self.tile_ids.pop()
+        self.fields.pop()
+        self.roomba_distances.pop()
+        self.matrix.pop()
+        for matrix_row in self.matrix:
+            matrix_row.pop()
+
+    def update_edge(self, tile_id, neighbor_id):
+        """
+        Repairs table in place, after the wall between two adjacent tiles has been opened or closed.
+        Only rows whose fields actually changed are re-read into the matrix.
+        :param tile_id: Id of tile on one side of changed wall.
+        :param neighbor_id: Id of tile on other side of changed wall.
+        """
+        if not self.is_repairable:
+            raise RuntimeError('Distance table holds incomplete distance fields, so cannot be repaired.')
+
+        for row, field in enumerate(self.fields):
+            if field.repair_edge(tile_id, neighbor_id):
+                for col, end_tile_id in enumerate(self.tile_ids):
+                    distance = field.get_distance(end_tile_id)
+                    self.matrix[row][col] = distance
+                    self.matrix[col][row] = distance
+
+        if self.roomba_field is None:
+            self.set_roomba_tile(self.roomba_id)
+        elif self.roomba_field.repair_edge(tile_id, neighbor_id):
+            self.roomba_distances = [self.roomba_field.get_distance(end_tile_id) for end_tile_id in self.tile_ids]
+
+    def get_distance(self, start_tile_id, end_tile_id):
+        """
+        :param start_tile_id: Id of trash tile to start from, or "roomba" to start from roomba tile.
+        :param end_tile_id: Id of trash tile to end at.
+        :return: Shortest distance between tiles | UNREACHABLE if no path exists.
+        """
+        if start_tile_id == 'roomba':
+            return self.roomba_distances[self.tile_rows[end_tile_id]]
+        return self.matrix[self.tile_rows[start_tile_id]][self.tile_rows[end_tile_id]]
+
+    def get_next_step(self, start_tile_id, end_tile_id):
+        """
+        Gets the next tile to move to, from start tile towards end tile.
+        With complete fields, this is a single step down the end tile's field, so no path needs to be rebuilt.
+        :param start_tile_id: Id of tile to start from, or "roomba" to start from roomba tile.
+        :param end_tile_id: Id of trash tile to end at.
+        :return: Id of next tile along shortest path | None if no path exists, or start is end.
+        """
+        end_field = self.fields[self.tile_rows[end_tile_id]]
+        if end_field is not None and end_field.is_complete:
+            return end_field.get_next_hop(self.roomba_id if start_tile_id == 'roomba' else start_tile_id)
+
+        path = self.get_path(start_tile_id, end_tile_id)
+        if path is None or len(path) < 2:
+            return None
+        return path[1]
+
+    def get_path(self, start_tile_id, end_tile_id):
+        """
+        Lazily rebuilds the shortest path between two tiles.
+        :param start_tile_id: Id of trash tile to start from, or "roomba" to start from roomba tile.
+        :param end_tile_id: Id of trash tile to end at.
+        :return: List of tile ids making up the path, including both start and end tiles | None if no path exists.
+        """
+        if self.get_distance(start_tile_id, end_tile_id) == UNREACHABLE:
+            return None
+
+        if start_tile_id == 'roomba':
+            start_tile_id = self.roomba_id
+            start_field = self.roomba_field
+        else:
+            start_field = self.fields[self.tile_rows[start_tile_id]]
+        if start_tile_id == end_tile_id:
+            return [start_tile_id]
+
+        # Searches may stop once all of their end tiles are found, so only one of the two fields is guaranteed to hold
+        # the full path. Prefer stepping directly from start tile towards end tile.
+        end_field = self.fields[self.tile_rows[end_tile_id]]
+        if end_field is not None and end_field.get_next_hop(start_tile_id) is not None:
+            return end_field.calc_path_to_source(start_tile_id)
+
+        path = start_field.calc_path_to_source(end_tile_id)
+        path.reverse()
+        return path
+
+
+class CandidateDistanceTable(DistanceTable):
+    """
+    Sparse version of DistanceTable, for large trash counts.
+
+    Good tours almost only ever join trash tiles to their near neighbors, so most of a full table is never used, and
+    yet filling it is the slowest part of planning. Instead, each trash tile only searches out as far as its nearest
+    few other trash tiles, which become its "candidates". Total cost then scales roughly linearly with trash count.
+
+    Distances are held in a sparse matrix, as one {col: distance} dict per row. Any other distance is found lazily on
+    first request, via a full search from one of the two tiles. That search fills the tile's entire row at once, so
+    each tile needs at most one. Likewise, paths between tiles that were never within range of each other's searches
+    are only given a full distance field once actually requested.
+
+    Tables cannot be repaired in place on wall changes, and are simply rebuilt instead.
+    """
+    def __init__(self, wall_grid, tile_ids, neighbor_count):
+        """
+        :param wall_grid: Wall grid to search on.
+        :param tile_ids: List of trash tile ids. Determines matrix row/column ordering.
+        :param neighbor_count: Number of nearest trash tiles to find from each trash tile.
+        """
+        self.wall_grid = wall_grid
+        self.kernel = FloodFillKernel(wall_grid.width, wall_grid.height, wall_grid=wall_grid)
+        self.neighbor_count = neighbor_count
+        self.tile_ids = list(tile_ids)
+        self.tile_rows = {tile_id: row for row, tile_id in enumerate(self.tile_ids)}
+        self.tile_mask = self.kernel.get_mask(self.tile_ids)
+        self.matrix = [{row: 0} for row in range(len(self.tile_ids))]
+        self.candidates = [[] for _ in self.tile_ids]
+        self.fields = [None] * len(self.tile_ids)
+
+        # Roomba has its own separate row, as it updates far more often than trash tiles do.
+        self.roomba_id = None
+        self.roomba_distances = [UNREACHABLE] * len(self.tile_ids)
+        self.roomba_field = None
+
+    @property
+    def is_repairable(self):
+        """
+        :return: Always False, as rows only hold their nearest few tiles.
+        """
+        return False
+
+    def calc_candidates(self):
+        """
+        Searches from every trash tile, out to only its nearest "neighbor_count" other trash tiles.
+        """
+        logger.debug('CandidateDistanceTable.calc_candidates()')
+
+        for row, tile_id in enumerate(self.tile_ids):
+            layers = self.kernel.calc_layers(tile_id, target_mask=self.tile_mask, target_count=self.neighbor_count)
+            self.fields[row] = DistanceField.from_layers(self.wall_grid, layers, is_complete=False)
+
+            # Record each trash tile found, nearest first.
+            candidates = self.candidates[row]
+            for distance, layer in enumerate(layers[1:], start=1):
+                for end_tile_id in FloodFillKernel.iter_indexes(layer & self.tile_mask):
+                    col = self.tile_rows[end_tile_id]
+                    candidates.append(col)
+                    self.matrix[row][col] = distance
+                    self.matrix[col][row] = distance
+
+    def fill_row(self, tile_id):
+        """
+        Runs a full search from trash tile, to find its distance to every other trash tile.
+        Only trash tiles are read out of the search. See get_path() for building the full field.
+        :param tile_id: Id of trash tile to search from.
+        :return: List of distances to each trash tile, in table order.
+        """
+        logger.debug('CandidateDistanceTable.fill_row()')
+
+        distances = [UNREACHABLE] * len(self.tile_ids)
+        for distance, layer in enumerate(self.kernel.calc_layers(tile_id)):
+            for end_tile_id in FloodFillKernel.iter_indexes(layer & self.tile_mask):
+                distances[self.tile_rows[end_tile_id]] = distance
+
+        row = self.tile_rows[tile_id]
+        row_distances = self.matrix[row]
+        for col, distance in enumerate(distances):
+            row_distances[col] = distance
+            self.matrix[col][row] = distance
+        return distances
+
+    def fill_block(self, tile_ids, end_tile_ids=None, end_count=None):
+        """
+        Finds the distances from each of the given trash tiles, to each of a second group of trash tiles.
+
+        Each search only runs until it has reached every tile of the second group. So for groups of nearby tiles, this
+        costs far less than a full search from each.
+        :param tile_ids: Ids of trash tiles to search from.
+        :param end_tile_ids: Ids of trash tiles to search to. Defaults to the same tiles as searched from.
+        :param end_count: Optional number of end tiles. Each search instead stops once it has reached at least this
+            many, so only the nearest end tiles are found.
+        :return: List of newly found {col: distance} dicts, one per searched tile.
+        """
+        logger.debug('CandidateDistanceTable.fill_block()')
+
+        if end_tile_ids is None:
+            end_tile_ids = tile_ids
+        end_mask = self.kernel.get_mask(end_tile_ids)
+        end_cols = [self.tile_rows[end_tile_id] for end_tile_id in end_tile_ids]
+        found_distances = []
+        for tile_id in tile_ids:
+            row = self.tile_rows[tile_id]
+            row_distances = self.matrix[row]
+            new_distances = {}
+            found_distances.append(new_distances)
+            if end_count is None and all(col in row_distances for col in end_cols):
+                continue
+
+            layers = self.kernel.calc_layers(tile_id, target_mask=end_mask, target_count=end_count)
+            for distance, layer in enumerate(layers):
+                for end_tile_id in FloodFillKernel.iter_indexes(layer & end_mask):
+                    col = self.tile_rows[end_tile_id]
+                    if col not in row_distances:
+                        new_distances[col] = distance
+
+            # Search only ends early once all tiles are reached. Any tile still missing has no path at all.
+            if end_count is None:
+                for col in end_cols:
+                    if col not in row_distances and col not in new_distances:
+                        new_distances[col] = UNREACHABLE
+
+            for col, distance in new_distances.items():
+                row_distances[col] = distance
+                self.matrix[col][row] = distance
+
+        return found_distances
+
+    def find_nearest(self, start_tile_ids):
+        """
+        Finds which of the given trash tiles is nearest to each trash tile, via a single combined search.
+
+        Every start tile searches outwards one layer at a time, in lockstep, and each tile is only ever claimed by the
+        first search to reach it. So each search only covers the area nearer to its own start tile than to any other.
+        Ties go to whichever start tile was given first.
+        :param start_tile_ids: Ids of trash tiles to search from.
+        :return: List of (start index, distance) tuples, one per trash tile in table order. Tiles with no path to any
+            start tile get (0, UNREACHABLE).
+        """
+        logger.debug('CandidateDistanceTable.find_nearest()')
+
+        nearest = [(0, UNREACHABLE)] * len(self.tile_ids)
+        frontiers = [1 << start_tile_id for start_tile_id in start_tile_ids]
+        visited = 0
+        distance = 0
+        while any(frontiers):
+            for start_index, frontier in enumerate(frontiers):
+                if distance > 0:
+                    frontier = self.kernel.expand(frontier) & ~visited
+                else:
+                    frontier &= ~visited
+                visited |= frontier
+                frontiers[start_index] = frontier
+                for tile_id in FloodFillKernel.iter_indexes(frontier & self.tile_mask):
+                    nearest[self.tile_rows[tile_id]] = (start_index, distance)
+            distance += 1
+
+        return nearest
+
+    def add_tile(self, tile_id, field):
+        """
+        Adds a new trash tile to the end of the table, filling its row and column from a single search.
+        Existing tiles keep their current candidates.
+        :param tile_id: Id of trash tile to add.
+        :param field: Distance field of a search from the new tile. Must reach all existing tiles, plus the roomba tile.
+        """
+        row = len(self.tile_ids)
+        distances = [field.get_distance(end_tile_id) for end_tile_id in self.tile_ids]
+        for col, distance in enumerate(distances):
+            self.matrix[col][row] = distance
+        row_distances = dict(enumerate(distances))
+        row_distances[row] = 0
+        self.matrix.append(row_distances)
+        self.candidates.append(heapq.nsmallest(self.neighbor_count, range(row), key=distances.__getitem__))
+
+        self.tile_rows[tile_id] = row
+        self.tile_ids.append(tile_id)
+        self.tile_mask |= 1 << tile_id
+        self.fields.append(field)
+        self.roomba_distances.append(UNREACHABLE if self.roomba_id is None else field.get_distance(self.roomba_id))
+
+    def remove_tile(self, tile_id):
+        """
+        Removes a trash tile from the table. Only rows that know the tile's distance are touched.
+        Last tile is moved into the freed row and column, so that no other rows or columns need to shift.
+        :param tile_id: Id of trash tile to remove.
+        """
+        row = self.tile_rows.pop(tile_id)
+        self.tile_mask &= ~(1 << tile_id)
+        for col in self.matrix[row]:
+            if col != row:
+                del self.matrix[col][row]
+                if row in self.candidates[col]:
+                    self.candidates[col].remove(row)
+
+        last_row = len(self.tile_ids) - 1
+        if row != last_row:
+            last_tile_id = self.tile_ids[last_row]
+            self.tile_ids[row] = last_tile_id
+            self.tile_rows[last_tile_id] = row
+            self.fields[row] = self.fields[last_row]
+            self.roomba_distances[row] = self.roomba_distances[last_row]
+            self.candidates[row] = self.candidates[last_row]
+
+            # Re-key last tile's column, within every row that knows its distance.
+            last_distances = self.matrix[last_row]
+            for col in last_distances:
+                if col != last_row:
+                    col_distances = self.matrix[col]
+                    col_distances[row] = col_distances.pop(last_row)
+                    self.candidates[col] = [
+                        row if other_col == last_row else other_col
+                        for other_col in self.candidates[col]
+                    ]
+            last_distances[row] = last_distances.pop(last_row)
+            self.matrix[row] = last_distances
+
+        self.tile_ids.pop()
+        self.fields.pop()
+        self.roomba_distances.pop()
+        self.candidates.pop()
+        self.matrix.pop()
+
+    def update_edge(self, tile_id, neighbor_id):
+        """
+        Not supported. See is_repairable.
+        """
+        raise RuntimeError('Candidate distance table cannot be repaired. Rebuild it instead.')
+
+    def get_distance(self, start_tile_id, end_tile_id):
+        """
+        :param start_tile_id: Id of trash tile to start from, or "roomba" to start from roomba tile.
+        :param end_tile_id: Id of trash tile to end at.
+        :return: Shortest distance between tiles | UNREACHABLE if no path exists.
+        """
+        if start_tile_id == 'roomba':
+            return self.roomba_distances[self.tile_rows[end_tile_id]]
+
+        end_col = self.tile_rows[end_tile_id]
+        distance = self.matrix[self.tile_rows[start_tile_id]].get(end_col)
+        if distance is None:
+            distance = self.fill_row(start_tile_id)[end_col]
+        return distance
+
+    def get_path(self, start_tile_id, end_tile_id):
+        """
+        Lazily rebuilds the shortest path between two tiles.
+        If neither tile's field reaches the other, start tile first gets a full field.
+        :param start_tile_id: Id of trash tile to start from, or "roomba" to start from roomba tile.
+        :param end_tile_id: Id of trash tile to end at.
+        :return: List of tile ids making up the path, including both start and end tiles | None if no path exists.
+        """
+        if start_tile_id != 'roomba' and self.get_distance(start_tile_id, end_tile_id) != UNREACHABLE:
+            start_row = self.tile_rows[start_tile_id]
+            start_field = self.fields[start_row]
+            end_field = self.fields[self.tile_rows[end_tile_id]]
+            if (
+                start_field.distances[end_tile_id] == FIELD_UNREACHABLE and
+                end_field.distances[start_tile_id] == FIELD_UNREACHABLE
+            ):
+                layers = self.kernel.calc_layers(start_tile_id)
+                self.fields[start_row] = DistanceField.from_layers(self.wall_grid, layers)
+
+        return super().get_path(start_tile_id, end_tile_id)
+
+# endregion Distance Tables
+
+
+# region Route Cursor
+
+class RouteCursor:
+    """
+    Streams roomba moves along a planned tour of trash tiles, so that the roomba does not need to replan on every move.
+
+    The full tour is expanded into a queue of tiles up front, while every trash tile still has distances stored. Moves
+    are then handed out one at a time, at the cost of a single queue lookup.
+
+    Cursor stays valid until either the environment version changes (such as from wall edits or trash being placed), or
+    the roomba ends up on some tile other than the one the route expected.
+    """
+    def __init__(self, wall_grid, distance_table, ordering, environment_version):
+        """
+        :param wall_grid: Wall grid that tour was planned on.
+        :param distance_table: Distance table that tour was planned from. Roomba distances must be from tour start tile.
+        :param ordering: Tour ordering. First id is the roomba tile, followed by each trash tile in visiting order.
+        :param environment_version: Environment version at time of planning.
+        """
+        self.width = wall_grid.width
+        self.environment_version = environment_version
+        self.curr_tile_id = ordering[0]
+        self.tile_queue = deque()
+
+        prev_tile_id = 'roomba'
+        for tile_id in ordering[1:]:
+            path = distance_table.get_path(prev_tile_id, tile_id)
+            if path is None:
+                # Rest of tour is unreachable. Route ends here, so that it is replanned once reached.
+                logger.warning('Route cursor found unreachable tile in tour. Truncating route.')
+                break
+            self.tile_queue.extend(path[1:])
+            prev_tile_id = tile_id
+
+    @property
+    def is_finished(self):
+        """
+        :return: True if every move in route has been taken.
+        """
+        return not self.tile_queue
+
+    def is_valid(self, tile_id, environment_version):
+        """
+        :param tile_id: Id of tile roomba is currently on.
+        :param environment_version: Current environment version.
+        :return: True if route still holds, and roomba is where the route expects it to be.
+        """
+        return self.environment_version == environment_version and self.curr_tile_id == tile_id
+
+    def get_next_direction(self):
+        """
+        :return: Direction of next move, as one of "north", "east", "south", or "west" | None if route is finished.
+        """
+        if not self.tile_queue:
+            return None
+
+        offset = self.tile_queue[0] - self.curr_tile_id
+        if offset == -self.width:
+            return 'north'
+        elif offset == 1:
+            return 'east'
+        elif offset == self.width:
+            return 'south'
+        elif offset == -1:
+            return 'west'
+        raise RuntimeError('Route cursor holds non-adjacent tiles. Logic error occurred.')
+
+    def advance(self, tile_id):
+        """
+        Records that the roomba has moved onto the provided tile.
+        :param tile_id: Id of tile roomba moved onto.
+        :return: True if move followed the route | False otherwise, after which cursor is no longer valid.
+        """
+        if self.tile_queue and self.tile_queue[0] == tile_id:
+            self.tile_queue.popleft()
+            self.curr_tile_id = tile_id
+            return True
+
+        self.curr_tile_id = None
+        return False
+
+# endregion Route Cursor
+
+
+# region Batch Searches
+
+def calc_distance_field(wall_grid, start_tile_id, end_tile_ids, pathing_mode='flood_fill', kernel=None):
+    """
+    Calculates distances from one tile to each of a set of tiles.
+    :param wall_grid: Wall grid to search on.
+    :param start_tile_id: Id of tile to search from.
+    :param end_tile_ids: Iterable of tile ids to find distances to.
+    :param pathing_mode: Search method to use. One of PATHING_MODES.
+    :param kernel: Optional flood fill kernel to reuse between searches. Built on demand if pathing mode requires it.
+    :return: Distance field of search.
+    """
+    if pathing_mode not in PATHING_MODES:
+        raise ValueError('Unknown pathing mode "{0}".'.format(pathing_mode))
+
+    if pathing_mode == 'flood_fill':
+        # Fill out from start tile, until all reachable tiles are found.
+        if kernel is None:
+            kernel = FloodFillKernel(wall_grid.width, wall_grid.height, wall_grid=wall_grid)
+        return DistanceField.from_layers(wall_grid, kernel.calc_layers(start_tile_id))
+
+    if pathing_mode == 'multi_target':
+        # Expand out from start tile, until all end tiles are reached.
+        parents = calc_multi_target_search(start_tile_id, end_tile_ids, wall_grid.get_open_neighbor_ids)[1]
+
+    else:
+        # Search for each end tile separately. Merge found paths into a single set of parents.
+        def _get_coords(tile_id):
+            """
+            Coordinate lookup, as provided to the A* search engine.
+            """
+            tile_y, tile_x = divmod(tile_id, wall_grid.width)
+            return tile_x, tile_y
+
+        parents = {start_tile_id: None}
+        for end_tile_id in end_tile_ids:
+            if end_tile_id != start_tile_id:
+                final_path = calc_a_star_path(start_tile_id, end_tile_id, wall_grid.get_open_neighbor_ids, _get_coords)
+                if final_path is not None:
+                    for prev_tile_id, curr_tile_id in zip(final_path, final_path[1:]):
+                        parents.setdefault(curr_tile_id, prev_tile_id)
+
+    return DistanceField.from_parents(wall_grid, parents)
+
+
+def calc_distance_fields(
+    wall_grid, searches, pathing_mode='flood_fill', max_workers=None, min_parallel_work=MIN_PARALLEL_WORK,
+):
+    """
+    Calculates a batch of distance fields.
+
+    Large batches are split across a pool of worker processes. Workers only ever receive a copy of the wall grid, which
+    is a plain bytearray, so nothing tied to SDL2 or the data manager needs to be sent. Small batches run in-process, so
+    that process communication never costs more than it saves.
+
+    Starting worker processes costs more than most batches save. So the first large batch also runs in-process, and
+    only starts the pool in the background, for later batches to use once ready.
+    :param wall_grid: Wall grid to search on.
+    :param searches: List of (start_tile_id, end_tile_ids) tuples, one per search.
+    :param pathing_mode: Search method to use. One of PATHING_MODES.
+    :param max_workers: Max number of worker processes. Defaults to number of CPUs.
+    :param min_parallel_work: Smallest batch that is split across processes, as (search count * grid tile count).
+    :return: List of distance fields, in same order as searches.
+    """
+    logger.debug('calc_distance_fields()')
+
+    worker_count = max_workers or os.cpu_count() or 1
+    is_parallel = worker_count > 1 and len(searches) * wall_grid.width * wall_grid.height >= min_parallel_work
+    if is_parallel and not is_process_pool_ready(worker_count):
+        warm_process_pool(worker_count)
+        is_parallel = False
+
+    if is_parallel:
+        # Split searches into one contiguous chunk per worker.
+        chunk_size = -(-len(searches) // worker_count)
+        chunks = [searches[index:(index + chunk_size)] for index in range(0, len(searches), chunk_size)]
+        try:
+            process_pool = get_process_pool(worker_count)
+            results = []
+            for chunk_results in process_pool.map(
+                _calc_distance_fields_worker,
+                [wall_grid] * len(chunks),
+                [pathing_mode] * len(chunks),
+                chunks,
+            ):
+                results += chunk_results
+
+        except (BrokenProcessPool, OSError) as err:
+            logger.warning('Process pool failed ({0}). Calculating distances in-process instead.'.format(err))
+            shutdown_process_pool()
+
+        else:
+            # Rebuild fields against local wall grid.
+            return [
+                DistanceField(wall_grid, start_tile_id, is_complete=is_complete, distances=distances)
+                for (start_tile_id, _), (distances, is_complete) in zip(searches, results)
+            ]
+
+    kernel = None
+    if pathing_mode == 'flood_fill':
+        kernel = FloodFillKernel(wall_grid.width, wall_grid.height, wall_grid=wall_grid)
+    return [
+        calc_distance_field(wall_grid, start_tile_id, end_tile_ids, pathing_mode=pathing_mode, kernel=kernel)
+        for start_tile_id, end_tile_ids in searches
+    ]
+
+
+def _calc_distance_fields_worker(wall_grid, pathing_mode, searches):
+    """
+    Process pool entry point. Runs a chunk of searches against a single shared kernel.
+    Only raw distance arrays are returned, to avoid sending a copy of the wall grid back with every field.
+    :return: List of (distances, is_complete) tuples, in same order as searches.
+    """
+    kernel = None
+    if pathing_mode == 'flood_fill':
+        kernel = FloodFillKernel(wall_grid.width, wall_grid.height, wall_grid=wall_grid)
+
+    results = []
+    for start_tile_id, end_tile_ids in searches:
+        field = calc_distance_field(wall_grid, start_tile_id, end_tile_ids, pathing_mode=pathing_mode, kernel=kernel)
+        results.append((field.distances, field.is_complete))
+    return results
+
+
+def get_process_pool(worker_count):
+    """
+    :param worker_count: Number of worker processes required.
+    :return: Shared process pool, recreated if worker count has changed. Also used by tour planning.
+    """
+    global _process_pool, _process_pool_workers
+
+    if _process_pool is None or _process_pool_workers != worker_count:
+        shutdown_process_pool()
+        _process_pool = ProcessPoolExecutor(max_workers=worker_count)
+        _process_pool_workers = worker_count
+    return _process_pool
+
+
+def warm_process_pool(worker_count):
+    """
+    Starts shared process pool in the background, if not already started. Each worker is sent an empty task, so that
+    every worker process is started and ready ahead of any real work. Never waits on the workers themselves.
+    :param worker_count: Number of worker processes required.
+    """
+    global _process_pool_warm_ups
+
+    if _process_pool_warm_ups is None or _process_pool_workers != worker_count:
+        logger.debug('warm_process_pool()')
+
+        try:
+            process_pool = get_process_pool(worker_count)
+            _process_pool_warm_ups = [process_pool.submit(_warm_up_worker) for _ in range(worker_count)]
+        except (BrokenProcessPool, OSError) as err:
+            logger.warning('Process pool failed to start ({0}).'.format(err))
+            shutdown_process_pool()
+
+
+def is_process_pool_ready(worker_count):
+    """
+    :param worker_count: Number of worker processes required.
+    :return: True if shared process pool has the given worker count, and has finished starting all its workers.
+    """
+    return (
+        _process_pool_warm_ups is not None and
+        _process_pool_workers == worker_count and
+        all(future.done() for future in _process_pool_warm_ups)
+    )
+
+
+def _warm_up_worker():
+    """
+    Process pool entry point. Does nothing. Only used to make the pool start a worker process.
+    """
+
+
+def shutdown_process_pool():
+    """
+    Shuts down shared process pool, if one exists.
+    """
+    global _process_pool, _process_pool_workers, _process_pool_warm_ups
+
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+    _process_pool = None
+    _process_pool_workers = None
+    _process_pool_warm_ups = None
+
+# endregion Batch Searches
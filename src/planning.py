@@ -0,0 +1,2409 @@
+"""
+Trash tour planning logic.
+
+Kept separate from general program logic, and free of any SDL2 references. Tours are planned over a plain integer cost
+matrix, where node 0 is always the roomba and every other node is a trash tile.
+
+Tours are "open paths". They start at the roomba, visit every trash tile once, then end at whichever trash tile is last.
+The roomba never needs to return to where it started.
+"""
+
+# System Imports.
+import heapq, math, numpy, os, random, threading, time
+from array import array
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from operator import add
+
+# User Imports.
+from src.logging import init_logging
+from src.pathing import CandidateDistanceTable, get_process_pool, shutdown_process_pool, UNREACHABLE
+
+
+# Initialize logger.
+logger = init_logging(__name__)
+
+
+# Module Variables.
+# Placeholder cost for exact search states that have not been reached. Larger than any real tour cost.
+_EXACT_UNREACHED = 1 << 62
+
+# Max number of subgradient iterations for the lower bound. Step size is halved after the given number of iterations
+# in a row fail to raise the bound.
+LOWER_BOUND_ITERATIONS = 50
+LOWER_BOUND_STALL_LIMIT = 5
+
+# Length of time that optimizer improvement rate is averaged over, when checking for convergence, in milliseconds.
+CONVERGENCE_WINDOW_MS = 1000
+
+# Max number of partial tours that branch and bound will search, before settling for the best tour found so far.
+BRANCH_AND_BOUND_MAX_NODES = 200000
+
+# Max number of consecutive tour nodes that Or-opt will relocate at once.
+OR_OPT_MAX_SEGMENT = 3
+
+# Number of nearest nodes to each node, that batched search moves may join it to.
+BATCHED_NEIGHBOR_COUNT = 10
+
+# Lin-Kernighan chain limits. Each chain step may join a node to one of its given number of nearest nodes, for up to the
+# given number of steps. The first few steps each try the given number of options. Deeper steps only try the best one.
+LIN_KERNIGHAN_NEIGHBOR_COUNT = 12
+LIN_KERNIGHAN_MAX_DEPTH = 50
+LIN_KERNIGHAN_BREADTH = (5, 3)
+
+# Annealing schedule. Temperature starts where an average worsening move is accepted at the given rate, then cools by
+# the given overall factor across (steps per node * node count) steps, at which point the annealer is "frozen".
+ANNEAL_START_ACCEPTANCE = 0.1
+ANNEAL_COOLING_FACTOR = 0.001
+ANNEAL_STEPS_PER_NODE = 2000
+
+# Fraction of annealing schedule to run before any convergence monitor is consulted. While still hot, annealing wanders
+# well above its starting tour cost, so it only starts finding better tours partway through cooling.
+ANNEAL_MONITOR_START = 0.5
+
+# Number of nearest nodes to each node, that annealing moves may join it to.
+ANNEAL_NEIGHBOR_COUNT = 8
+
+# Time that background improvement works between checks for cancellation, in milliseconds.
+IMPROVER_BURST_MS = 20
+
+# Number of tour positions to either side of an inserted node, that tour repair may re-optimize.
+REPAIR_WINDOW = 8
+
+# Number of annealing steps per node, for each chain of a multi-start search.
+MULTI_START_STEPS_PER_NODE = 250
+
+# Max number of k-medoids iterations, when grouping nodes into clusters.
+CLUSTER_ITERATIONS = 2
+
+# Extra cost on every edge into a cluster sub-tour's end node. Larger than any real tour cost, so that the end node only
+# ever has a single edge, and is thus always visited last.
+_CLUSTER_END_COST = 1 << 40
+
+
+# region Cost Matrix
+
+def build_cost_matrix(distance_table):
+    """
+    Builds tour cost matrix from a distance table.
+
+    Node 0 is the roomba, and node N is the trash tile at row (N - 1) of the table. Tours never travel back to the
+    roomba, so all costs into node 0 are left at 0.
+    :param distance_table: Distance table to build from. Roomba distances must be up to date.
+    :return: Tuple of (list of tile ids for each node, with node 0 as "roomba", cost matrix as list of int lists).
+        Candidate distance tables give a candidate matrix instead.
+    """
+    logger.debug('build_cost_matrix()')
+
+    node_ids = ['roomba'] + list(distance_table.tile_ids)
+    if isinstance(distance_table, CandidateDistanceTable):
+        return node_ids, CandidateMatrix.from_distance_table(distance_table)
+
+    matrix = [[0] + list(distance_table.roomba_distances)]
+    for row in distance_table.matrix:
+        matrix.append([0] + row)
+
+    return node_ids, matrix
+
+
+class CandidateMatrix:
+    """
+    Sparse tour cost matrix, for large trash counts. See CandidateDistanceTable.
+
+    Only holds the costs from each node to its nearest few "candidate" nodes, plus from the roomba to every node. Any
+    other cost is found lazily on first lookup, by filling the node's entire row at once. Costs between groups of
+    nearby nodes can also be filled together, via fill_block().
+
+    Costs are looked up as matrix[node][other_node], same as with a dense matrix. So any tour logic still works as-is,
+    but logic that looks at every pair of nodes will end up filling every row. Candidate-aware logic instead only ever
+    reads costs that are already known. See build_candidate_tour() and improve_candidate_tour().
+    """
+    def __init__(self, rows, candidates, distance_table):
+        """
+        :param rows: List of {node: cost} dicts, one per node. Costs between trash tile nodes must be symmetric.
+        :param candidates: List of candidate node lists, one per node, nearest first.
+        :param distance_table: Candidate distance table that any further costs are found from. Trash tile node N
+            matches table row (N - 1).
+        """
+        self.rows = [_CandidateRow(self, node, row) for node, row in enumerate(rows)]
+        self.candidates = candidates
+        self.distance_table = distance_table
+
+        # Roomba row always holds every cost. Any other row may already be complete from earlier lookups.
+        self.filled_nodes = {node for node, row in enumerate(self.rows) if node == 0 or len(row) == len(self.rows)}
+
+    @classmethod
+    def from_distance_table(cls, distance_table):
+        """
+        :param distance_table: Candidate distance table to build from. Roomba distances must be up to date.
+        :return: Candidate matrix instance. Filling any costs also fills the same costs of the distance table.
+        """
+        roomba_row = dict(enumerate(distance_table.roomba_distances, start=1))
+        roomba_row[0] = 0
+        rows = [roomba_row]
+        for row_distances in distance_table.matrix:
+            row = {col + 1: distance for col, distance in row_distances.items()}
+            row[0] = 0
+            rows.append(row)
+
+        candidates = [heapq.nsmallest(distance_table.neighbor_count, range(1, len(rows)), key=roomba_row.__getitem__)]
+        for row_candidates in distance_table.candidates:
+            candidates.append([col + 1 for col in row_candidates])
+
+        return cls(rows, candidates, distance_table)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, node):
+        return self.rows[node]
+
+    def fill_row(self, node):
+        """
+        Finds every cost from node, if not already known.
+        :param node: Node to fill row of.
+        :return: Filled row.
+        """
+        row = self.rows[node]
+        if node not in self.filled_nodes:
+            logger.debug('CandidateMatrix.fill_row()')
+
+            self.filled_nodes.add(node)
+            distances = self.distance_table.fill_row(self.distance_table.tile_ids[node - 1])
+            for other_node, cost in enumerate(distances, start=1):
+                row[other_node] = cost
+                self.rows[other_node][node] = cost
+
+        return row
+
+    def fill_block(self, nodes, end_nodes=None, end_count=None):
+        """
+        Finds every cost from the given trash tile nodes, to a second group of trash tile nodes, if not already known.
+        :param nodes: List of nodes to fill costs from. Must not include node 0.
+        :param end_nodes: List of nodes to fill costs to. Must not include node 0. Defaults to the same nodes as above.
+        :param end_count: Optional number of end nodes. Only costs to the nearest of this many end nodes are then found
+            from each node.
+        """
+        tile_ids = self.distance_table.tile_ids
+        found_distances = self.distance_table.fill_block(
+            [tile_ids[node - 1] for node in nodes],
+            None if end_nodes is None else [tile_ids[node - 1] for node in end_nodes],
+            end_count=end_count,
+        )
+        for node, new_distances in zip(nodes, found_distances):
+            row = self.rows[node]
+            for col, cost in new_distances.items():
+                row[col + 1] = cost
+                self.rows[col + 1][node] = cost
+
+    def get_cost(self, node, other_node):
+        """
+        Gets cost between two nodes. Any unknown cost is found via a search from node, that only runs until it reaches
+        the other node. So this is cheap as long as the two nodes are near each other.
+        :param node: Node to start from.
+        :param other_node: Node to end at.
+        :return: Cost from node to other node.
+        """
+        row = self.rows[node]
+        cost = row.get(other_node)
+        if cost is None:
+            self.fill_block([node], [other_node])
+            cost = row[other_node]
+        return cost
+
+    def find_nearest(self, nodes):
+        """
+        :param nodes: List of trash tile nodes.
+        :return: List holding the index of whichever given node is nearest to each node. Node 0 is left as None.
+        """
+        tile_ids = self.distance_table.tile_ids
+        nearest = self.distance_table.find_nearest([tile_ids[node - 1] for node in nodes])
+        return [None] + [node_index for node_index, _ in nearest]
+
+
+class _CandidateRow(dict):
+    """
+    Single row of a candidate matrix. Looking up an unknown cost fills the entire row.
+    """
+    def __init__(self, matrix, node, costs):
+        super().__init__(costs)
+        self.matrix = matrix
+        self.node = node
+
+    def __missing__(self, other_node):
+        self.matrix.fill_row(self.node)
+        if other_node not in self:
+            raise KeyError(other_node)
+        return dict.__getitem__(self, other_node)
+
+
+def calc_tour_cost(matrix, tour):
+    """
+    :param matrix: Tour cost matrix.
+    :param tour: List of node indexes, in visiting order. Starts at node 0.
+    :return: Total cost of travelling tour.
+    """
+    return sum(matrix[start_node][end_node] for start_node, end_node in zip(tour, tour[1:]))
+
+# endregion Cost Matrix
+
+
+# region Convergence
+
+class ConvergenceMonitor:
+    """
+    Decides when an iterative optimizer should stop, by watching its own rate of improvement, rather than running for
+    a fixed number of iterations.
+
+    Progress is measured as the gap between the best known tour cost and the best known lower bound, which optimizers
+    close from either side. Optimizer reports progress after each batch of steps, and is told to stop once any of the
+    following hold:
+        * "optimal" - Gap is closed. Tour is proven optimal.
+        * "target_gap" - Gap is at most the given fraction of tour cost.
+        * "stalled" - Gap has not shrunk within the given number of steps.
+        * "slow" - Gap has shrunk by less than the given cost per millisecond, over the last window of time.
+    Each check is optional, other than the first.
+    """
+    def __init__(self, stall_limit=None, min_rate=None, target_gap=None, window_ms=CONVERGENCE_WINDOW_MS):
+        """
+        :param stall_limit: Optional max number of steps in a row without improvement.
+        :param min_rate: Optional min improvement in cost per millisecond, averaged over the window.
+        :param target_gap: Optional gap to stop at, as a fraction of tour cost.
+        :param window_ms: Length of time that improvement rate is averaged over, in milliseconds.
+        """
+        self.stall_limit = stall_limit
+        self.min_rate = min_rate
+        self.target_gap = target_gap
+        self.window_ms = window_ms
+        self.stop_reason = None
+        self._best_gap = math.inf
+        self._stall_count = 0
+        self._history = deque()
+
+    def update(self, cost, lower_bound, step_count, elapsed_ms):
+        """
+        Records latest optimizer progress.
+        :param cost: Cost of best known tour.
+        :param lower_bound: Best known lower bound on optimal tour cost.
+        :param step_count: Number of optimizer steps since last update.
+        :param elapsed_ms: Total time optimizer has run for so far, in milliseconds.
+        :return: Reason to stop | None to keep going.
+        """
+        gap = cost - lower_bound
+        if gap < self._best_gap:
+            self._best_gap = gap
+            self._stall_count = 0
+        else:
+            self._stall_count += step_count
+
+        # Keep just enough history to cover the window.
+        history = self._history
+        history.append((elapsed_ms, gap))
+        while len(history) > 2 and history[1][0] <= elapsed_ms - self.window_ms:
+            history.popleft()
+
+        if math.ceil(gap - 1e-6) <= 0:
+            self.stop_reason = 'optimal'
+        elif self.target_gap is not None and gap <= self.target_gap * cost:
+            self.stop_reason = 'target_gap'
+        elif self.stall_limit is not None and self._stall_count >= self.stall_limit:
+            self.stop_reason = 'stalled'
+        elif (
+            self.min_rate is not None and
+            history[0][0] <= elapsed_ms - self.window_ms and
+            history[0][1] - gap < self.min_rate * (elapsed_ms - history[0][0])
+        ):
+            self.stop_reason = 'slow'
+        return self.stop_reason
+
+# endregion Convergence
+
+
+# region Exact Search
+
+def calc_exact_tour(matrix):
+    """
+    Finds the optimal tour, via Held-Karp dynamic programming over every subset of trash tiles.
+
+    For each subset, holds the cheapest cost of starting at the roomba, visiting exactly that subset, and ending at
+    each trash tile within it. Costs are held in a single flat array of (2^K * K) values. No parent pointers are kept.
+    Instead, the tour is rebuilt afterwards by finding which earlier state each final cost came from.
+
+    Runtime and memory both grow with 2^K, so this is only suitable for small trash counts.
+    :param matrix: Tour cost matrix.
+    :return: Optimal tour, as list of node indexes in visiting order. Starts at node 0.
+    """
+    logger.debug('calc_exact_tour()')
+
+    trash_count = len(matrix) - 1
+    if trash_count < 1:
+        return [0]
+
+    # Trash node (j + 1) is represented by bit j of subset masks. Column lists hold costs into each trash node.
+    full_mask = (1 << trash_count) - 1
+    columns = [[matrix[row][col] for row in range(1, trash_count + 1)] for col in range(1, trash_count + 1)]
+    costs = array('q', [_EXACT_UNREACHED]) * ((full_mask + 1) * trash_count)
+    for end_index in range(trash_count):
+        costs[(1 << end_index) * trash_count + end_index] = matrix[0][end_index + 1]
+
+    # Subsets are always processed after all of their own subsets, as those have lower mask values.
+    for mask in range(3, full_mask + 1):
+        if not mask & (mask - 1):
+            # Single tile subsets were set above.
+            continue
+
+        mask_offset = mask * trash_count
+        remaining_mask = mask
+        while remaining_mask:
+            end_bit = remaining_mask & -remaining_mask
+            remaining_mask ^= end_bit
+            end_index = end_bit.bit_length() - 1
+
+            # Cheapest way to reach end tile, from each possible final tile of the subset without it.
+            # Tiles outside that subset hold the unreached value, so are never picked.
+            prev_offset = (mask ^ end_bit) * trash_count
+            costs[mask_offset + end_index] = min(map(
+                add,
+                costs[prev_offset:prev_offset + trash_count],
+                columns[end_index],
+            ))
+
+    # Rebuild tour backwards, from cheapest final tile.
+    full_offset = full_mask * trash_count
+    final_costs = costs[full_offset:full_offset + trash_count]
+    end_index = final_costs.index(min(final_costs))
+    mask = full_mask
+    reversed_tour = []
+    while True:
+        reversed_tour.append(end_index + 1)
+        end_cost = costs[mask * trash_count + end_index]
+        mask ^= 1 << end_index
+        if not mask:
+            break
+
+        prev_offset = mask * trash_count
+        column = columns[end_index]
+        end_index = next(
+            prev_index for prev_index in range(trash_count)
+            if costs[prev_offset + prev_index] + column[prev_index] == end_cost
+        )
+
+    reversed_tour.append(0)
+    reversed_tour.reverse()
+    return reversed_tour
+
+# endregion Exact Search
+
+
+# region Lower Bound
+
+def calc_tour_lower_bound(
+    matrix, upper_bound=None, iteration_count=LOWER_BOUND_ITERATIONS, penalties=None, monitor=None,
+):
+    """
+    Finds a lower bound on the cost of the optimal tour, via the Held-Karp 1-tree bound.
+
+    An open path from the roomba becomes a closed loop, by adding a "dummy" node that joins the path end back to the
+    roomba at no cost. Every such loop is a "1-tree": a spanning tree over all real nodes, plus the dummy node's two
+    edges, one of which is fixed to the roomba. So the cheapest 1-tree never costs more than the optimal tour.
+
+    Each node then gets a penalty, added to the cost of all its edges, which does not change which tour is optimal.
+    Penalties are raised on nodes with too many tree edges and lowered on leaf nodes (subgradient optimization), which
+    pushes the cheapest 1-tree closer to being a tour itself, and so raises the bound.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param upper_bound: Optional cost of a known tour. Guides step size, and stops early once the bound proves the tour
+        optimal. Defaults to cost of a nearest neighbor tour.
+    :param iteration_count: Max number of subgradient iterations. Zero gives the plain spanning tree bound.
+    :param penalties: Optional node penalties to start from, such as from an earlier bound for a similar matrix. If
+        provided, list is updated in place to the penalties that gave the returned bound.
+    :param monitor: Optional ConvergenceMonitor, to stop early once bound stops rising. Its stop reason is always set,
+        including "converged" if the bound cannot rise any further, or "iteration_limit".
+    :return: Lower bound. Optimal tour costs at least this much.
+    """
+    logger.debug('calc_tour_lower_bound()')
+
+    node_count = len(matrix)
+    if node_count < 3:
+        return calc_tour_cost(matrix, list(range(node_count)))
+
+    if upper_bound is None:
+        upper_bound = calc_tour_cost(matrix, build_nearest_neighbor_tour(matrix))
+
+    best_bound, best_penalties = _calc_bound_penalties(
+        _build_edge_rows(matrix), upper_bound, iteration_count, penalties, monitor,
+    )
+    if penalties is not None:
+        penalties[:] = best_penalties
+    return best_bound
+
+
+def _build_edge_rows(matrix):
+    """
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :return: Symmetric edge costs, as list of rows. Column into roomba node is always 0, so roomba edges come from its
+        row instead.
+    """
+    edge_rows = [list(row) for row in matrix]
+    for node in range(1, len(matrix)):
+        edge_rows[node][0] = matrix[0][node]
+    return edge_rows
+
+
+def _calc_bound_penalties(edge_rows, upper_bound, iteration_count, penalties=None, monitor=None):
+    """
+    Raises 1-tree bound via subgradient optimization. See calc_tour_lower_bound().
+    :param edge_rows: Symmetric edge costs, as list of rows.
+    :param upper_bound: Cost of a known tour.
+    :param iteration_count: Max number of subgradient iterations.
+    :param penalties: Optional node penalties to start from.
+    :param monitor: Optional ConvergenceMonitor, to stop early once bound stops rising.
+    :return: Tuple of (lower bound, node penalties that gave it).
+    """
+    node_count = len(edge_rows)
+    penalties = [0.0] * node_count if penalties is None else list(penalties)
+    best_penalties = penalties
+    best_bound = 0.0
+    step_scale = 2.0
+    stall_count = 0
+    start_time = time.perf_counter()
+    for iteration in range(iteration_count + 1):
+        tree_cost, degrees = _calc_one_tree(edge_rows, penalties)
+        bound = tree_cost - 2 * sum(penalties)
+        if bound > best_bound:
+            best_bound = bound
+            best_penalties = penalties
+            stall_count = 0
+        else:
+            stall_count += 1
+            if stall_count >= LOWER_BOUND_STALL_LIMIT:
+                step_scale /= 2
+                stall_count = 0
+
+        # Stop once tree is itself a tour, or the known tour is proven optimal. Costs are whole numbers.
+        subgradient = [degree - 2 for degree in degrees]
+        norm = sum(value * value for value in subgradient)
+        if monitor is not None:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            if monitor.update(upper_bound, best_bound, 1, elapsed_ms) is not None:
+                break
+            if norm == 0:
+                monitor.stop_reason = 'converged'
+            elif iteration == iteration_count:
+                monitor.stop_reason = 'iteration_limit'
+        if norm == 0 or math.ceil(best_bound - 1e-6) >= upper_bound or iteration == iteration_count:
+            break
+
+        step = step_scale * max(upper_bound - bound, 1) / norm
+        penalties = [penalty + step * value for penalty, value in zip(penalties, subgradient)]
+
+    return max(0, math.ceil(best_bound - 1e-6)), best_penalties
+
+
+def _calc_one_tree(edge_rows, penalties):
+    """
+    Finds the cheapest 1-tree, under the given node penalties. See calc_tour_lower_bound().
+    :param edge_rows: Symmetric edge costs, as list of rows.
+    :param penalties: Penalty of each node.
+    :return: Tuple of (penalized 1-tree cost, number of 1-tree edges at each node).
+    """
+    node_count = len(edge_rows)
+    degrees = [0] * node_count
+
+    # Spanning tree over real nodes, via Prim's algorithm.
+    roomba_row = edge_rows[0]
+    roomba_penalty = penalties[0]
+    keys = [roomba_row[node] + roomba_penalty + penalties[node] for node in range(node_count)]
+    parents = [0] * node_count
+    remaining = list(range(1, node_count))
+    tree_cost = 0
+    while remaining:
+        node = min(remaining, key=keys.__getitem__)
+        remaining.remove(node)
+        tree_cost += keys[node]
+        degrees[node] += 1
+        degrees[parents[node]] += 1
+
+        node_row = edge_rows[node]
+        node_penalty = penalties[node]
+        for other_node in remaining:
+            cost = node_row[other_node] + node_penalty + penalties[other_node]
+            if cost < keys[other_node]:
+                keys[other_node] = cost
+                parents[other_node] = node
+
+    # Dummy node always joins the roomba, plus whichever trash tile is cheapest to end on.
+    end_node = min(range(1, node_count), key=penalties.__getitem__)
+    tree_cost += roomba_penalty + penalties[end_node]
+    degrees[0] += 1
+    degrees[end_node] += 1
+
+    return tree_cost, degrees
+
+# endregion Lower Bound
+
+
+# region Branch and Bound
+
+def calc_branch_and_bound_tour(matrix, tour, max_nodes=BRANCH_AND_BOUND_MAX_NODES, time_budget_ms=None):
+    """
+    Searches for the optimal tour, via depth-first branch and bound, starting from a known tour.
+
+    Partial tours are grown one node at a time from the roomba, nearest nodes first. Any partial tour that provably
+    cannot beat the best tour found so far is dropped, along with every tour that would extend it. Each remaining
+    partial tour is bounded by its cost so far, plus the 1-tree bound over all nodes not yet visited. See
+    calc_tour_lower_bound(). Node penalties are only optimized once, up front, then reused for every bound.
+
+    Search stops early after the given number of partial tours, or the given time. The best tour found so far is then
+    returned instead, which is never worse than the starting tour.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param tour: Starting tour, such as from local search. Starts at node 0.
+    :param max_nodes: Max number of partial tours to search.
+    :param time_budget_ms: Optional max time to search, in milliseconds.
+    :return: Tuple of (best tour found, bool indicating if it was proven optimal).
+    """
+    logger.debug('calc_branch_and_bound_tour()')
+
+    search = _BranchAndBoundSearch(matrix, tour, max_nodes, time_budget_ms)
+    is_optimal = search.run()
+    logger.debug('    Searched {0} partial tours. Optimal: {1}'.format(search.node_count, is_optimal))
+    return search.best_tour, is_optimal
+
+
+class _BranchAndBoundSearch:
+    """
+    Search state for calc_branch_and_bound_tour().
+    """
+    def __init__(self, matrix, tour, max_nodes, time_budget_ms):
+        """
+        :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+        :param tour: Starting tour. Starts at node 0.
+        :param max_nodes: Max number of partial tours to search.
+        :param time_budget_ms: Optional max time to search, in milliseconds.
+        """
+        self.edge_rows = _build_edge_rows(matrix)
+        self.best_tour = list(tour)
+        self.best_cost = calc_tour_cost(matrix, tour)
+        self.max_nodes = max_nodes
+        self.end_time = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000
+        self.node_count = 0
+        self.is_stopped = False
+
+        # Nodes to branch into from each node, nearest first.
+        self.branch_nodes = [
+            sorted(range(1, len(matrix)), key=lambda other_node: (row[other_node], other_node))
+            for row in self.edge_rows
+        ]
+        self.penalties = [0.0] * len(matrix)
+        self.tour = [0]
+        self.remaining_nodes = set(range(1, len(matrix)))
+
+    def run(self):
+        """
+        :return: True if best tour was proven optimal | False if search stopped early.
+        """
+        if len(self.edge_rows) < 3:
+            # At most one trash tile, so only one possible tour.
+            return True
+
+        root_bound, self.penalties = _calc_bound_penalties(self.edge_rows, self.best_cost, LOWER_BOUND_ITERATIONS)
+        if root_bound >= self.best_cost:
+            return True
+
+        self._search_step(0)
+        return not self.is_stopped
+
+    def _search_step(self, cost):
+        """
+        Tries every way to extend the current partial tour by one node, then recurses into each that may still beat the
+        best tour.
+        :param cost: Cost of current partial tour.
+        """
+        tour = self.tour
+        last_node = tour[-1]
+        last_row = self.edge_rows[last_node]
+        remaining_nodes = self.remaining_nodes
+        if len(remaining_nodes) == 1:
+            next_node = next(iter(remaining_nodes))
+            if cost + last_row[next_node] < self.best_cost:
+                self.best_tour = tour + [next_node]
+                self.best_cost = cost + last_row[next_node]
+            return
+
+        for next_node in self.branch_nodes[last_node]:
+            if next_node not in remaining_nodes:
+                continue
+            next_cost = cost + last_row[next_node]
+            if next_cost >= self.best_cost:
+                # Nodes are nearest first, so every later option costs at least as much.
+                break
+
+            self.node_count += 1
+            if self.node_count >= self.max_nodes or (
+                self.end_time is not None and not self.node_count % 256 and time.perf_counter() >= self.end_time
+            ):
+                self.is_stopped = True
+            if self.is_stopped:
+                return
+
+            remaining_nodes.remove(next_node)
+            if next_cost + self._calc_bound(next_node) < self.best_cost:
+                tour.append(next_node)
+                self._search_step(next_cost)
+                tour.pop()
+            remaining_nodes.add(next_node)
+
+    def _calc_bound(self, start_node):
+        """
+        Finds 1-tree bound on cost of the cheapest path that starts at the given node, then visits every remaining node.
+        Dummy node joins the path end back to the start node at no cost.
+        :param start_node: Node that path starts from.
+        :return: Lower bound on path cost, rounded up to a whole number.
+        """
+        edge_rows = self.edge_rows
+        penalties = self.penalties
+
+        # Spanning tree over start node plus all remaining nodes, via Prim's algorithm.
+        start_row = edge_rows[start_node]
+        start_penalty = penalties[start_node]
+        nodes = list(self.remaining_nodes)
+        keys = [start_row[node] + start_penalty + penalties[node] for node in nodes]
+        tree_cost = 0
+        while nodes:
+            index = keys.index(min(keys))
+            tree_cost += keys[index]
+            node = nodes[index]
+            nodes[index] = nodes[-1]
+            keys[index] = keys[-1]
+            nodes.pop()
+            keys.pop()
+
+            node_row = edge_rows[node]
+            node_penalty = penalties[node]
+            for other_index, other_node in enumerate(nodes):
+                cost = node_row[other_node] + node_penalty + penalties[other_node]
+                if cost < keys[other_index]:
+                    keys[other_index] = cost
+
+        # Dummy node joins start node, plus whichever remaining node is cheapest to end on.
+        remaining_penalties = [penalties[node] for node in self.remaining_nodes]
+        bound = tree_cost + start_penalty + min(remaining_penalties) - 2 * (start_penalty + sum(remaining_penalties))
+        return math.ceil(bound - 1e-6)
+
+# endregion Branch and Bound
+
+
+# region Construction
+
+def calc_initial_tour(matrix, construction_methods=None):
+    """
+    Builds a tour with each of the given construction methods, then keeps whichever is cheapest.
+    :param matrix: Tour cost matrix.
+    :param construction_methods: Optional list of method names, from CONSTRUCTION_METHODS. Defaults to all of them.
+    :return: Cheapest constructed tour, as list of node indexes in visiting order. Starts at node 0.
+    """
+    logger.debug('calc_initial_tour()')
+
+    if construction_methods is None:
+        construction_methods = list(CONSTRUCTION_METHODS)
+
+    best_tour = None
+    best_cost = None
+    for method in construction_methods:
+        if method not in CONSTRUCTION_METHODS:
+            raise ValueError('Unknown tour construction method "{0}".'.format(method))
+
+        tour = CONSTRUCTION_METHODS[method](matrix)
+        cost = calc_tour_cost(matrix, tour)
+        logger.debug('    {0}: {1}'.format(method, cost))
+        if best_cost is None or cost < best_cost:
+            best_tour = tour
+            best_cost = cost
+
+    return best_tour
+
+
+def build_nearest_neighbor_tour(matrix):
+    """
+    Builds tour by always travelling to whichever unvisited trash tile is nearest, starting from the roomba.
+    :param matrix: Tour cost matrix.
+    :return: Tour, as list of node indexes in visiting order. Starts at node 0.
+    """
+    tour = [0]
+    unvisited_nodes = set(range(1, len(matrix)))
+    while unvisited_nodes:
+        curr_row = matrix[tour[-1]]
+        next_node = min(unvisited_nodes, key=lambda node: (curr_row[node], node))
+        unvisited_nodes.remove(next_node)
+        tour.append(next_node)
+
+    return tour
+
+
+def build_cheapest_insertion_tour(matrix):
+    """
+    Builds tour by repeatedly inserting whichever unvisited trash tile adds the least cost, at the place in the tour
+    where it adds that cost.
+
+    Each unvisited tile remembers its cheapest insertion edge. Inserting a tile only removes one edge and adds two, so
+    tiles only need a full rescan when the edge they were waiting on is the one removed.
+    :param matrix: Tour cost matrix.
+    :return: Tour, as list of node indexes in visiting order. Starts at node 0.
+    """
+    tour = [0]
+
+    # Cheapest insertion for each unvisited node, as (added cost, node before, node after). Node after is None when
+    # inserting at end of tour.
+    insertions = {node: (matrix[0][node], 0, None) for node in range(1, len(matrix))}
+    while insertions:
+        node = min(insertions, key=lambda insert_node: (insertions[insert_node][0], insert_node))
+        _, prev_node, next_node = insertions.pop(node)
+        tour.insert(tour.index(prev_node) + 1, node)
+
+        # Edge of (prev_node, next_node) was replaced by edges of (prev_node, node) and (node, next_node).
+        node_row = matrix[node]
+        prev_row = matrix[prev_node]
+        for other_node, (other_cost, other_prev, other_next) in insertions.items():
+            if other_prev == prev_node and other_next == next_node:
+                insertions[other_node] = _find_cheapest_insertion(matrix, tour, other_node)
+                continue
+
+            prev_cost = prev_row[other_node] + matrix[other_node][node] - prev_row[node]
+            if prev_cost < other_cost:
+                other_cost, other_prev, other_next = prev_cost, prev_node, node
+            if next_node is None:
+                next_cost = node_row[other_node]
+            else:
+                next_cost = node_row[other_node] + matrix[other_node][next_node] - node_row[next_node]
+            if next_cost < other_cost:
+                other_cost, other_prev, other_next = next_cost, node, next_node
+            insertions[other_node] = (other_cost, other_prev, other_next)
+
+    return tour
+
+
+def _find_cheapest_insertion(matrix, tour, node):
+    """
+    :param matrix: Tour cost matrix.
+    :param tour: Partial tour.
+    :param node: Node to insert.
+    :return: Cheapest insertion for node, as (added cost, node before, node after or None if inserting at end).
+    """
+    node_row = matrix[node]
+    best_insertion = (matrix[tour[-1]][node], tour[-1], None)
+    for prev_node, next_node in zip(tour, tour[1:]):
+        cost = matrix[prev_node][node] + node_row[next_node] - matrix[prev_node][next_node]
+        if cost < best_insertion[0]:
+            best_insertion = (cost, prev_node, next_node)
+
+    return best_insertion
+
+
+def build_greedy_edge_tour(matrix):
+    """
+    Builds tour by repeatedly taking the cheapest remaining edge that keeps the result a set of simple paths.
+
+    No tile may have more than two edges, and no edge may close a loop. The roomba may only have one edge, so that it
+    always ends up at the start of the final path.
+    :param matrix: Tour cost matrix.
+    :return: Tour, as list of node indexes in visiting order. Starts at node 0.
+    """
+    node_count = len(matrix)
+    edges = sorted(
+        (matrix[start_node][end_node], start_node, end_node)
+        for start_node in range(node_count)
+        for end_node in range(start_node + 1, node_count)
+    )
+    neighbors = _link_greedy_edges(node_count, edges)
+
+    # Walk the single resulting path, starting from the roomba.
+    tour = [0]
+    prev_node = None
+    while len(tour) < node_count:
+        next_node = next(node for node in neighbors[tour[-1]] if node != prev_node)
+        prev_node = tour[-1]
+        tour.append(next_node)
+
+    return tour
+
+
+def _link_greedy_edges(node_count, edges):
+    """
+    Takes edges cheapest first, skipping any that would give a node more than two edges, or close a loop.
+    The roomba may only have one edge.
+    :param node_count: Number of nodes.
+    :param edges: List of (cost, start node, end node) tuples, sorted cheapest first.
+    :return: List of linked nodes, for each node. Links form a set of simple paths.
+    """
+    # Track joined path fragments with a union-find forest.
+    fragment_roots = list(range(node_count))
+
+    def _get_root(node):
+        while fragment_roots[node] != node:
+            fragment_roots[node] = fragment_roots[fragment_roots[node]]
+            node = fragment_roots[node]
+        return node
+
+    max_degrees = [1] + [2] * (node_count - 1)
+    neighbors = [[] for _ in range(node_count)]
+    edge_count = 0
+    for _, start_node, end_node in edges:
+        if edge_count == node_count - 1:
+            break
+        if len(neighbors[start_node]) >= max_degrees[start_node] or len(neighbors[end_node]) >= max_degrees[end_node]:
+            continue
+        start_root = _get_root(start_node)
+        end_root = _get_root(end_node)
+        if start_root == end_root:
+            continue
+
+        fragment_roots[start_root] = end_root
+        neighbors[start_node].append(end_node)
+        neighbors[end_node].append(start_node)
+        edge_count += 1
+
+    return neighbors
+
+
+# Valid tour construction methods, by name.
+CONSTRUCTION_METHODS = {
+    'nearest_neighbor': build_nearest_neighbor_tour,
+    'cheapest_insertion': build_cheapest_insertion_tour,
+    'greedy_edge': build_greedy_edge_tour,
+}
+
+# endregion Construction
+
+
+# region Local Search
+
+def improve_tour(matrix, tour):
+    """
+    Improves tour in place, by alternating 2-opt and Or-opt moves until neither can find any further improvement.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param tour: List of node indexes, in visiting order. Starts at node 0, which is never moved.
+    :return: Total change in tour cost. Always zero or negative.
+    """
+    logger.debug('improve_tour()')
+
+    total_delta = improve_two_opt(matrix, tour)
+    while True:
+        or_opt_delta = improve_or_opt(matrix, tour)
+        if or_opt_delta == 0:
+            break
+        total_delta += or_opt_delta
+
+        two_opt_delta = improve_two_opt(matrix, tour)
+        if two_opt_delta == 0:
+            break
+        total_delta += two_opt_delta
+
+    return total_delta
+
+
+def improve_two_opt(matrix, tour, index_range=None):
+    """
+    Improves tour in place with 2-opt moves, until no improving move remains.
+
+    Each move reverses one segment of the tour. Only the two edges at either end of the segment change, so every move is
+    scored in constant time. A segment that runs to the end of the open tour only has one edge change.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param tour: List of node indexes, in visiting order. Starts at node 0, which is never moved.
+    :param index_range: Optional (first, last) tour indexes. If provided, only segments within this range are reversed.
+    :return: Total change in tour cost. Always zero or negative.
+    """
+    node_count = len(tour)
+    min_index, max_index = _clamp_index_range(node_count, index_range)
+    total_delta = 0
+    improved = True
+    while improved:
+        improved = False
+        for first_index in range(min_index, max_index):
+            prev_row = matrix[tour[first_index - 1]]
+            first_node = tour[first_index]
+            first_row = matrix[first_node]
+            removed_cost = prev_row[first_node]
+
+            for last_index in range(first_index + 1, max_index + 1):
+                last_node = tour[last_index]
+                if last_index + 1 < node_count:
+                    next_node = tour[last_index + 1]
+                    delta = (
+                        prev_row[last_node] + first_row[next_node] -
+                        removed_cost - matrix[last_node][next_node]
+                    )
+                else:
+                    delta = prev_row[last_node] - removed_cost
+
+                if delta < 0:
+                    # Reverse segment. Later segment ends are unaffected, so scanning continues from new first node.
+                    tour[first_index:last_index + 1] = tour[last_index:first_index - 1:-1]
+                    total_delta += delta
+                    improved = True
+
+                    first_node = tour[first_index]
+                    first_row = matrix[first_node]
+                    removed_cost = prev_row[first_node]
+
+    return total_delta
+
+
+def improve_or_opt(matrix, tour, max_segment_length=OR_OPT_MAX_SEGMENT, index_range=None):
+    """
+    Improves tour in place with Or-opt moves, until no improving move remains.
+
+    Each move takes a run of consecutive nodes, and reinserts it elsewhere in the tour, either as-is or reversed. At
+    most three edges are removed and three added, so every move is scored in constant time.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param tour: List of node indexes, in visiting order. Starts at node 0, which is never moved.
+    :param max_segment_length: Max number of consecutive nodes to relocate at once.
+    :param index_range: Optional (first, last) tour indexes. If provided, segments are only taken from and reinserted
+        within this range.
+    :return: Total change in tour cost. Always zero or negative.
+    """
+    node_count = len(tour)
+    min_index, max_index = _clamp_index_range(node_count, index_range)
+    total_delta = 0
+    improved = True
+    while improved:
+        improved = False
+        for segment_length in range(1, max_segment_length + 1):
+            for first_index in range(min_index, max_index - segment_length + 2):
+                after_index = first_index + segment_length
+                first_node = tour[first_index]
+                last_node = tour[after_index - 1]
+                prev_node = tour[first_index - 1]
+
+                # Find how much is saved by cutting segment out, and joining its neighbors back together.
+                if after_index < node_count:
+                    next_node = tour[after_index]
+                    removed_cost = (
+                        matrix[prev_node][first_node] + matrix[last_node][next_node] - matrix[prev_node][next_node]
+                    )
+                else:
+                    removed_cost = matrix[prev_node][first_node]
+                if removed_cost <= 0:
+                    continue
+
+                # Find cheapest place to insert segment, between some other node and the node after it.
+                first_row = matrix[first_node]
+                last_row = matrix[last_node]
+                best_delta = 0
+                best_index = None
+                best_is_reversed = False
+                for insert_index in range(min_index - 1, max_index + 1):
+                    if first_index - 1 <= insert_index < after_index:
+                        continue
+
+                    insert_row = matrix[tour[insert_index]]
+                    if insert_index + 1 < node_count:
+                        insert_next_node = tour[insert_index + 1]
+                        split_cost = insert_row[insert_next_node]
+                        added_cost = insert_row[first_node] + last_row[insert_next_node] - split_cost
+                        reversed_cost = insert_row[last_node] + first_row[insert_next_node] - split_cost
+                    else:
+                        added_cost = insert_row[first_node]
+                        reversed_cost = insert_row[last_node]
+
+                    if added_cost - removed_cost < best_delta:
+                        best_delta = added_cost - removed_cost
+                        best_index = insert_index
+                        best_is_reversed = False
+                    if reversed_cost - removed_cost < best_delta:
+                        best_delta = reversed_cost - removed_cost
+                        best_index = insert_index
+                        best_is_reversed = True
+
+                if best_index is None:
+                    continue
+
+                # Move segment.
+                segment = tour[first_index:after_index]
+                if best_is_reversed:
+                    segment.reverse()
+                del tour[first_index:after_index]
+                if best_index > first_index:
+                    best_index -= segment_length
+                tour[best_index + 1:best_index + 1] = segment
+                total_delta += best_delta
+                improved = True
+
+    return total_delta
+
+
+def _clamp_index_range(node_count, index_range):
+    """
+    :param node_count: Number of nodes in tour.
+    :param index_range: Optional (first, last) tour indexes. May run past either end of tour.
+    :return: Tuple of (first, last) movable tour indexes, clamped to tour.
+    """
+    if index_range is None:
+        return 1, node_count - 1
+    return max(1, index_range[0]), min(node_count - 1, index_range[1])
+
+# endregion Local Search
+
+
+# region Batched Search
+
+def improve_batched_tour(matrix, tour, neighbor_count=BATCHED_NEIGHBOR_COUNT):
+    """
+    Improves tour in place with 2-opt and node swap moves, until no improving move remains.
+
+    Rather than scoring one move at a time, every move that would join a node to one of its nearest nodes is scored at
+    once, via array lookups into the cost matrix. Each round, improving moves are then taken best first, skipping any
+    that overlap a part of the tour already changed this round. Moves that don't overlap never change each other's
+    cost, so many moves are taken per round, with no rescoring needed.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param tour: List of node indexes, in visiting order. Starts at node 0, which is never moved.
+    :param neighbor_count: Number of nearest nodes to each node, that a move may join it to.
+    :return: Total change in tour cost. Always zero or negative.
+    """
+    logger.debug('improve_batched_tour()')
+
+    node_count = len(tour)
+    if node_count < 3:
+        return 0
+
+    # Add an "end" node, which costs nothing to reach from any node. Tour then always has a node after every index.
+    costs = numpy.zeros((node_count + 1, node_count + 1), dtype=numpy.int64)
+    costs[:node_count, :node_count] = matrix
+    path = numpy.array(tour + [node_count], dtype=numpy.int64)
+    positions = numpy.empty(node_count + 1, dtype=numpy.int64)
+    positions[path] = numpy.arange(node_count + 1)
+
+    # Find nearest nodes. Costs into the roomba are always zero, so costs out of it are used instead.
+    neighbor_count = min(neighbor_count, node_count - 1)
+    near_costs = costs[:node_count, :node_count].copy()
+    near_costs[:, 0] = near_costs[0]
+    numpy.fill_diagonal(near_costs, UNREACHABLE + 1)
+    neighbors = numpy.argpartition(near_costs, neighbor_count - 1, axis=1)[:, :neighbor_count]
+    nodes = numpy.repeat(numpy.arange(node_count), neighbor_count)
+    neighbors = neighbors.ravel()
+
+    total_delta = 0
+    while True:
+        moves = _find_batched_moves(costs, path, positions, nodes, neighbors)
+        if moves is None:
+            break
+        total_delta += _apply_batched_moves(path, positions, *moves)
+
+    tour[:] = path[:-1].tolist()
+    return total_delta
+
+
+def _find_batched_moves(costs, path, positions, nodes, neighbors):
+    """
+    Scores every 2-opt and node swap move that joins a node to one of its neighbors.
+
+    2-opt reverses the segment between a node and its neighbor, so that the two end up adjacent. Node swaps instead
+    exchange the neighbor with the node just before or after the given node. Swaps of adjacent nodes are left out, as
+    they match a 2-opt move.
+    :param costs: Cost matrix array, including end node.
+    :param path: Tour array, ending at end node.
+    :param positions: Index of each node within tour array.
+    :param nodes: Node of each move.
+    :param neighbors: Neighbor of each move.
+    :return: Tuple of (first indexes, last indexes, is swap flags, deltas) arrays for all improving moves, best first
+        | None if no move improves tour.
+    """
+    end_index = len(path) - 1
+    node_indexes = positions[nodes]
+    neighbor_indexes = positions[neighbors]
+
+    # 2-opt. Reverse run from just after the earlier node, up to the later node.
+    first_indexes = numpy.minimum(node_indexes, neighbor_indexes) + 1
+    last_indexes = numpy.maximum(node_indexes, neighbor_indexes)
+    is_valid = first_indexes < last_indexes
+    first_indexes = first_indexes[is_valid]
+    last_indexes = last_indexes[is_valid]
+    prev_nodes = path[first_indexes - 1]
+    first_nodes = path[first_indexes]
+    last_nodes = path[last_indexes]
+    next_nodes = path[last_indexes + 1]
+    two_opt_deltas = (
+        costs[prev_nodes, last_nodes] + costs[first_nodes, next_nodes] -
+        costs[prev_nodes, first_nodes] - costs[last_nodes, next_nodes]
+    )
+
+    # Node swap. Neighbor takes place of node before or after node, and vice versa.
+    swap_indexes = numpy.concatenate((node_indexes - 1, node_indexes + 1))
+    other_indexes = numpy.concatenate((neighbor_indexes, neighbor_indexes))
+    first_swap_indexes = numpy.minimum(swap_indexes, other_indexes)
+    last_swap_indexes = numpy.maximum(swap_indexes, other_indexes)
+    is_valid = (first_swap_indexes > 0) & (last_swap_indexes < end_index) & (last_swap_indexes - first_swap_indexes > 1)
+    first_swap_indexes = first_swap_indexes[is_valid]
+    last_swap_indexes = last_swap_indexes[is_valid]
+    first_nodes = path[first_swap_indexes]
+    last_nodes = path[last_swap_indexes]
+    first_prev_nodes = path[first_swap_indexes - 1]
+    first_next_nodes = path[first_swap_indexes + 1]
+    last_prev_nodes = path[last_swap_indexes - 1]
+    last_next_nodes = path[last_swap_indexes + 1]
+    swap_deltas = (
+        costs[first_prev_nodes, last_nodes] + costs[last_nodes, first_next_nodes] +
+        costs[last_prev_nodes, first_nodes] + costs[first_nodes, last_next_nodes] -
+        costs[first_prev_nodes, first_nodes] - costs[first_nodes, first_next_nodes] -
+        costs[last_prev_nodes, last_nodes] - costs[last_nodes, last_next_nodes]
+    )
+
+    # Keep improving moves only, best first. Ties are broken by tour position, so results are repeatable.
+    first_indexes = numpy.concatenate((first_indexes, first_swap_indexes))
+    last_indexes = numpy.concatenate((last_indexes, last_swap_indexes))
+    is_swaps = numpy.concatenate((
+        numpy.zeros(len(two_opt_deltas), dtype=bool),
+        numpy.ones(len(swap_deltas), dtype=bool),
+    ))
+    deltas = numpy.concatenate((two_opt_deltas, swap_deltas))
+    is_improving = deltas < 0
+    if not is_improving.any():
+        return None
+
+    first_indexes = first_indexes[is_improving]
+    last_indexes = last_indexes[is_improving]
+    is_swaps = is_swaps[is_improving]
+    deltas = deltas[is_improving]
+    order = numpy.lexsort((last_indexes, first_indexes, deltas))
+    return first_indexes[order], last_indexes[order], is_swaps[order], deltas[order]
+
+
+def _apply_batched_moves(path, positions, first_indexes, last_indexes, is_swaps, deltas):
+    """
+    Applies moves in given order, skipping any that overlap an earlier applied move.
+
+    A move changes tour between its first and last indexes, and reads the nodes to either side. So two moves are only
+    applied together if at least one untouched node lies between them.
+    :param path: Tour array, ending at end node.
+    :param positions: Index of each node within tour array.
+    :return: Total change in tour cost.
+    """
+    total_delta = 0
+    taken_first_indexes = []
+    taken_last_indexes = []
+    for first_index, last_index, is_swap, delta in zip(
+        first_indexes.tolist(), last_indexes.tolist(), is_swaps.tolist(), deltas.tolist(),
+    ):
+        slot = bisect_left(taken_first_indexes, first_index)
+        if slot > 0 and taken_last_indexes[slot - 1] + 1 >= first_index:
+            continue
+        if slot < len(taken_first_indexes) and taken_first_indexes[slot] <= last_index + 1:
+            continue
+        taken_first_indexes.insert(slot, first_index)
+        taken_last_indexes.insert(slot, last_index)
+
+        if is_swap:
+            path[[first_index, last_index]] = path[[last_index, first_index]]
+            positions[path[[first_index, last_index]]] = (first_index, last_index)
+        else:
+            path[first_index:last_index + 1] = path[last_index:first_index - 1:-1].copy()
+            positions[path[first_index:last_index + 1]] = numpy.arange(first_index, last_index + 1)
+        total_delta += delta
+
+    return total_delta
+
+# endregion Batched Search
+
+
+# region Lin-Kernighan
+
+def improve_lin_kernighan(
+    matrix, tour, neighbor_count=LIN_KERNIGHAN_NEIGHBOR_COUNT, max_depth=LIN_KERNIGHAN_MAX_DEPTH, active_nodes=None,
+):
+    """
+    Improves tour in place with Lin-Kernighan style variable-depth search, until no improving move remains.
+
+    Each move is a chain of segment reversals. At every step, one more edge is swapped for a cheaper edge to one of the
+    nearest nodes, as long as the chain as a whole still saves cost. So a move may pass through worse tours on the way,
+    which lets it reach improvements that no single 2-opt or Or-opt move can. The best point along the chain is kept.
+
+    Nodes are revisited via "don't-look bits". Only nodes next to an edge that changed are searched from again, so later
+    passes skip all the parts of the tour that are already settled.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param tour: List of node indexes, in visiting order. Starts at node 0, which is never moved.
+    :param neighbor_count: Number of nearest nodes to each node, that a chain step may join it to.
+    :param max_depth: Max number of reversals in a single chain.
+    :param active_nodes: Optional nodes to start searching from, such as those around the only changed part of an
+        already improved tour. Defaults to all nodes.
+    :return: Total change in tour cost. Always zero or negative.
+    """
+    logger.debug('improve_lin_kernighan()')
+
+    if len(tour) < 3:
+        return 0
+
+    search = _LinKernighanSearch(matrix, tour, neighbor_count, max_depth)
+    total_delta = search.run(active_nodes)
+    tour[:] = search.tour[:-1]
+    return total_delta
+
+
+class _LinKernighanSearch:
+    """
+    Search state for improve_lin_kernighan().
+
+    The open tour is closed into a cycle with an extra "end" node, which costs nothing to reach from any node. Node 0
+    and the end node are kept fixed at either end of the tour list, so every chain step is a single list reversal
+    between them.
+    """
+    def __init__(self, matrix, tour, neighbor_count, max_depth):
+        """
+        :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+        :param tour: Starting tour. Starts at node 0.
+        :param neighbor_count: Number of nearest nodes to each node, that a chain step may join it to.
+        :param max_depth: Max number of reversals in a single chain.
+        """
+        node_count = len(matrix)
+        end_node = node_count
+
+        # Make costs symmetric. Node 0 is only ever first in tour, so costs back into it can be the same as out of it.
+        self.costs = [list(row) + [0] for row in matrix]
+        for node in range(1, node_count):
+            self.costs[node][0] = matrix[0][node]
+        self.costs.append([0] * (node_count + 1))
+
+        self.tour = list(tour) + [end_node]
+        self.positions = [0] * (node_count + 1)
+        for index, node in enumerate(self.tour):
+            self.positions[node] = index
+        self.neighbor_count = neighbor_count
+        self.neighbor_nodes = [None] * (node_count + 1)
+        self.max_depth = max_depth
+        self.added_edges = set()
+        self.changed_nodes = []
+
+    def run(self, active_nodes=None):
+        """
+        Searches from every active node, until no node has an improving chain left.
+        :param active_nodes: Optional nodes to start searching from. Defaults to all nodes.
+        :return: Total change in tour cost. Always zero or negative.
+        """
+        total_delta = 0
+        active_nodes = deque(self.tour[:-1] if active_nodes is None else active_nodes)
+        is_active = [False] * len(self.tour)
+        for node in active_nodes:
+            is_active[node] = True
+        while active_nodes:
+            first_node = active_nodes.popleft()
+            is_active[first_node] = False
+
+            for direction in (1, -1):
+                gain = self._search(first_node, direction)
+                if gain > 0:
+                    break
+
+            if gain > 0:
+                # Every node that gained or lost an edge may now have a new improving chain.
+                total_delta -= gain
+                for node in [first_node] + self.changed_nodes:
+                    if not is_active[node]:
+                        is_active[node] = True
+                        active_nodes.append(node)
+            self.added_edges.clear()
+            self.changed_nodes.clear()
+
+        return total_delta
+
+    def _search(self, first_node, direction):
+        """
+        :param first_node: Node to start chain from.
+        :param direction: 1 to break the edge after first node, or -1 to break the edge before it.
+        :return: Gain of the best improving chain found, which is left applied to tour | 0 if none was found.
+        """
+        first_index = self.positions[first_node]
+        second_index = first_index + direction
+        if not 0 <= second_index < len(self.tour):
+            return 0
+
+        second_node = self.tour[second_index]
+        return self._search_step(first_node, second_node, direction, self.costs[first_node][second_node], 0, 1)
+
+    def _search_step(self, first_node, second_node, direction, gain, min_gain, depth):
+        """
+        Extends chain by one reversal, then recursively tries to extend it further.
+
+        Second node is the current neighbor of first node, and the edge between them is considered already broken. A
+        third node is joined to second node, and the fourth node beside third node is cut from it, which becomes the new
+        second node. The first few steps try several third nodes each. Deeper steps only try the most promising one.
+        :param first_node: Node that chain started from.
+        :param second_node: Node currently beside first node.
+        :param direction: 1 if second node is after first node in tour, or -1 if before it.
+        :param gain: Total cost of all edges broken so far, minus total cost of all edges added so far.
+        :param min_gain: Best gain already found by an earlier step of this chain. Deeper steps must beat it.
+        :param depth: Number of this step in chain.
+        :return: Gain of a chain that beats min_gain, which is left applied to tour | 0 if none was found, and tour is
+            left as it was before this step.
+        """
+        costs = self.costs
+        tour = self.tour
+        first_index = self.positions[first_node]
+        last_index = len(tour) - 1
+        second_row = costs[second_node]
+
+        # Find all third nodes that keep chain gain positive, ranked by gain after also breaking the edge beside them.
+        candidates = []
+        for third_node in self._get_neighbor_nodes(second_node):
+            step_gain = gain - second_row[third_node]
+            if step_gain <= 0:
+                break
+
+            # Third node must be past second node, or else on the other side of first node. Node 0 and the end node
+            # can never be moved, so the latter only works if third node is neither.
+            third_index = self.positions[third_node]
+            side = (third_index - first_index) * direction
+            if side < 2 and (side > -1 or third_index == 0 or third_index == last_index):
+                continue
+            fourth_node = tour[third_index - direction]
+            if (min(third_node, fourth_node), max(third_node, fourth_node)) in self.added_edges:
+                continue
+            candidates.append((step_gain + costs[third_node][fourth_node], third_node, third_index, fourth_node))
+        if not candidates:
+            return 0
+
+        # On the first step, also always try whichever third node would close the chain for the most gain right away, so
+        # that no improving 2-opt move is ever skipped.
+        breadth = LIN_KERNIGHAN_BREADTH[depth - 1] if depth <= len(LIN_KERNIGHAN_BREADTH) else 1
+        closing_candidate = None
+        if depth == 1:
+            closing_candidate = max(candidates, key=lambda candidate: candidate[0] - costs[first_node][candidate[3]])
+        candidates.sort(reverse=True)
+        candidates = candidates[:breadth]
+        if closing_candidate is not None and closing_candidate not in candidates:
+            candidates.append(closing_candidate)
+
+        for next_gain, third_node, third_index, fourth_node in candidates:
+            # Reverse run so that fourth node ends up beside first node. If third node is past second node, this is the
+            # run from second node to fourth node. Otherwise it is the run from first node to third node, which also
+            # moves first node, and flips which side of it the chain continues on.
+            next_direction = direction
+            if (third_index - first_index) * direction >= 2:
+                reversal = sorted((first_index + direction, third_index - direction))
+            else:
+                reversal = sorted((first_index, third_index))
+                next_direction = -direction
+            self._reverse(*reversal)
+            self.changed_nodes += (second_node, third_node, fourth_node)
+            added_edge = (min(second_node, third_node), max(second_node, third_node))
+            self.added_edges.add(added_edge)
+
+            # Closing chain here joins first node back to fourth node. Keep going deeper, in case that beats it.
+            closed_gain = next_gain - costs[first_node][fourth_node]
+            if depth < self.max_depth:
+                deeper_gain = self._search_step(
+                    first_node, fourth_node, next_direction, next_gain, max(min_gain, closed_gain), depth + 1,
+                )
+                if deeper_gain > 0:
+                    return deeper_gain
+            if closed_gain > min_gain:
+                return closed_gain
+
+            # Chain did not pay off. Undo step.
+            self.added_edges.discard(added_edge)
+            del self.changed_nodes[-3:]
+            self._reverse(*reversal)
+
+        return 0
+
+    def _get_neighbor_nodes(self, node):
+        """
+        Finds nearest nodes on first use only. Searches from only a few nodes never need most of them.
+        :param node: Node to get neighbors of.
+        :return: List of nearest other nodes, nearest first.
+        """
+        neighbor_nodes = self.neighbor_nodes[node]
+        if neighbor_nodes is None:
+            neighbor_nodes = heapq.nsmallest(
+                self.neighbor_count,
+                (other_node for other_node in range(len(self.costs)) if other_node != node),
+                key=self.costs[node].__getitem__,
+            )
+            self.neighbor_nodes[node] = neighbor_nodes
+        return neighbor_nodes
+
+    def _reverse(self, first_index, last_index):
+        """
+        Reverses run of tour between the two indexes, inclusive.
+        :param first_index: Tour index of first node in run.
+        :param last_index: Tour index of last node in run.
+        """
+        tour = self.tour
+        positions = self.positions
+        tour[first_index:last_index + 1] = tour[last_index:first_index - 1:-1]
+        for index in range(first_index, last_index + 1):
+            positions[tour[index]] = index
+
+
+# Valid tour improvement methods, by name.
+IMPROVEMENT_METHODS = {
+    'local_search': improve_tour,
+    'lin_kernighan': improve_lin_kernighan,
+    'batched': improve_batched_tour,
+}
+
+# endregion Lin-Kernighan
+
+
+# region Candidate Search
+
+def build_candidate_tour(matrix):
+    """
+    Builds tour for a candidate matrix. Same as build_greedy_edge_tour(), but only candidate edges are ever taken.
+
+    This usually leaves several separate path fragments. Starting from the roomba's fragment, each fragment is then
+    joined to the nearest end of any remaining fragment. Where no candidate is a fragment end, a search is run from the
+    current end node, out to the nearest fragment end.
+    :param matrix: Candidate cost matrix.
+    :return: Tour, as list of node indexes in visiting order. Starts at node 0.
+    """
+    logger.debug('build_candidate_tour()')
+
+    node_count = len(matrix)
+    edges = sorted({
+        (matrix[node][other_node], min(node, other_node), max(node, other_node))
+        for node in range(node_count)
+        for other_node in matrix.candidates[node]
+    })
+    neighbors = _link_greedy_edges(node_count, edges)
+
+    tour = []
+    is_visited = [False] * node_count
+    next_node = 0
+    while True:
+        # Walk fragment, from one end to the other.
+        prev_node = None
+        node = next_node
+        while node is not None:
+            tour.append(node)
+            is_visited[node] = True
+            next_node = next((other_node for other_node in neighbors[node] if other_node != prev_node), None)
+            prev_node = node
+            node = next_node
+        if len(tour) == node_count:
+            break
+
+        # Find nearest end of a remaining fragment. Fragment ends have at most one link.
+        end_node = tour[-1]
+        next_node = next(
+            (
+                other_node for other_node in matrix.candidates[end_node]
+                if not is_visited[other_node] and len(neighbors[other_node]) < 2
+            ),
+            None,
+        )
+        if next_node is None:
+            fragment_ends = [
+                other_node for other_node in range(1, node_count)
+                if not is_visited[other_node] and len(neighbors[other_node]) < 2
+            ]
+            if end_node != 0:
+                matrix.fill_block([end_node], fragment_ends, end_count=1)
+            row = matrix[end_node]
+            next_node = min(fragment_ends, key=lambda other_node: row.get(other_node, UNREACHABLE))
+
+    return tour
+
+
+def improve_candidate_tour(matrix, tour):
+    """
+    Improves tour in place for a candidate matrix, by alternating 2-opt and Or-opt moves until neither can find any
+    further improvement. See improve_tour().
+
+    Only moves that join a node to one of its candidates are tried. So each pass scales with (node count * candidate
+    count) rather than node count squared. Any other cost that a move needs is always between nodes near each other,
+    so any that are unknown are found via a short search. See CandidateMatrix.get_cost(). No rows are ever filled.
+    :param matrix: Candidate cost matrix.
+    :param tour: List of node indexes, in visiting order. Starts at node 0, which is never moved.
+    :return: Total change in tour cost. Always zero or negative.
+    """
+    logger.debug('improve_candidate_tour()')
+
+    positions = [0] * len(matrix)
+    for index, node in enumerate(tour):
+        positions[node] = index
+
+    total_delta = _improve_candidate_two_opt(matrix, tour, positions)
+    while True:
+        or_opt_delta = _improve_candidate_or_opt(matrix, tour, positions)
+        if or_opt_delta == 0:
+            break
+        total_delta += or_opt_delta
+
+        two_opt_delta = _improve_candidate_two_opt(matrix, tour, positions)
+        if two_opt_delta == 0:
+            break
+        total_delta += two_opt_delta
+
+    return total_delta
+
+
+def _improve_candidate_two_opt(matrix, tour, positions):
+    """
+    Candidate matrix version of improve_two_opt().
+
+    Each node tries to join one of its candidates, in place of either of its current edges. Candidates are nearest
+    first, so trying stops at the first one that is no nearer than both current edges.
+    :return: Total change in tour cost. Always zero or negative.
+    """
+    rows = matrix.rows
+    node_count = len(tour)
+    total_delta = 0
+    improved = True
+    while improved:
+        improved = False
+        for node in range(node_count):
+            index = positions[node]
+            node_row = rows[node]
+            next_cost = node_row[tour[index + 1]] if index + 1 < node_count else -1
+            prev_cost = rows[tour[index - 1]][node] if index > 0 else -1
+
+            for other_node in matrix.candidates[node]:
+                join_cost = node_row[other_node]
+                if join_cost >= next_cost and join_cost >= prev_cost:
+                    break
+
+                # Find segments whose reversal would join node and candidate.
+                other_index = positions[other_node]
+                segments = []
+                if join_cost < next_cost:
+                    segments.append((index + 1, other_index) if other_index > index else (other_index + 1, index))
+                if join_cost < prev_cost:
+                    if other_index > index:
+                        segments.append((index, other_index - 1))
+                    elif other_index > 0:
+                        segments.append((other_index, index - 1))
+
+                move = None
+                for first_index, last_index in segments:
+                    if first_index < last_index:
+                        delta = _calc_candidate_two_opt_delta(matrix, tour, first_index, last_index)
+                        if delta < 0:
+                            move = (first_index, last_index, None, False)
+                            break
+                if move is not None:
+                    _apply_tour_move(tour, positions, move)
+                    total_delta += delta
+                    improved = True
+                    break
+
+    return total_delta
+
+
+def _calc_candidate_two_opt_delta(matrix, tour, first_index, last_index):
+    """
+    :param matrix: Candidate cost matrix.
+    :param tour: List of node indexes, in visiting order.
+    :param first_index: Index of first node of segment to reverse.
+    :param last_index: Index of last node of segment to reverse.
+    :return: Change in tour cost from reversing segment.
+    """
+    prev_node = tour[first_index - 1]
+    first_node = tour[first_index]
+    last_node = tour[last_index]
+    delta = matrix.get_cost(prev_node, last_node) - matrix[prev_node][first_node]
+
+    if last_index + 1 < len(tour):
+        next_node = tour[last_index + 1]
+        delta += matrix.get_cost(first_node, next_node) - matrix[last_node][next_node]
+
+    return delta
+
+
+def _improve_candidate_or_opt(matrix, tour, positions, max_segment_length=OR_OPT_MAX_SEGMENT):
+    """
+    Candidate matrix version of improve_or_opt().
+
+    Each segment may only be reinserted directly next to a candidate of either of its end nodes.
+    :return: Total change in tour cost. Always zero or negative.
+    """
+    rows = matrix.rows
+    node_count = len(tour)
+    total_delta = 0
+    improved = True
+    while improved:
+        improved = False
+        for segment_length in range(1, max_segment_length + 1):
+            for first_index in range(1, node_count - segment_length + 1):
+                after_index = first_index + segment_length
+                first_node = tour[first_index]
+                last_node = tour[after_index - 1]
+                prev_node = tour[first_index - 1]
+
+                # Find how much is saved by cutting segment out, and joining its neighbors back together.
+                removed_cost = rows[prev_node][first_node]
+                if after_index < node_count:
+                    next_node = tour[after_index]
+                    removed_cost += rows[last_node][next_node] - matrix.get_cost(prev_node, next_node)
+                if removed_cost <= 0:
+                    continue
+
+                # Find cheapest place to insert segment, with either end node next to one of its candidates.
+                best_delta = 0
+                best_move = None
+                for end_node, other_end_node in ((first_node, last_node), (last_node, first_node)):
+                    end_row = rows[end_node]
+                    for other_node in matrix.candidates[end_node]:
+                        join_cost = end_row[other_node]
+                        if join_cost >= removed_cost:
+                            break
+                        other_index = positions[other_node]
+
+                        # Insert directly after candidate. End node leads segment.
+                        if not first_index - 1 <= other_index < after_index:
+                            delta = join_cost - removed_cost
+                            if other_index + 1 < node_count:
+                                insert_next_node = tour[other_index + 1]
+                                split_cost = matrix.get_cost(other_end_node, insert_next_node)
+                                delta += split_cost - rows[other_node][insert_next_node]
+                            if delta < best_delta:
+                                best_delta = delta
+                                best_move = (first_index, after_index - 1, other_index, end_node != first_node)
+
+                        # Insert directly before candidate. End node trails segment.
+                        if other_index > 0 and not first_index - 1 <= other_index - 1 < after_index:
+                            insert_prev_node = tour[other_index - 1]
+                            split_cost = matrix.get_cost(insert_prev_node, other_end_node)
+                            delta = split_cost + join_cost - rows[insert_prev_node][other_node] - removed_cost
+                            if delta < best_delta:
+                                best_delta = delta
+                                best_move = (first_index, after_index - 1, other_index - 1, end_node != last_node)
+
+                if best_move is None:
+                    continue
+
+                _apply_tour_move(tour, positions, best_move)
+                total_delta += best_delta
+                improved = True
+
+    return total_delta
+
+# endregion Candidate Search
+
+
+# region Repair
+
+def repair_tour(matrix, tour, new_nodes, window=REPAIR_WINDOW):
+    """
+    Adds nodes to an existing tour in place, rather than building a new tour from scratch.
+
+    Each node is inserted at its cheapest position. Tour is then re-optimized with 2-opt and Or-opt, but only within
+    "window" positions to either side of the insertion point. So the rest of an already-good tour is left as-is, and
+    repair cost does not grow with tour size.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param tour: List of node indexes, in visiting order. Starts at node 0, which is never moved.
+    :param new_nodes: Node indexes to add. Must not already be in tour.
+    :param window: Number of tour positions to either side of each insertion, that may be re-optimized. Zero only
+        inserts.
+    :return: Total change in tour cost.
+    """
+    logger.debug('repair_tour()')
+
+    total_delta = 0
+    for node in new_nodes:
+        insert_cost, prev_node, _next_node = _find_cheapest_insertion(matrix, tour, node)
+        insert_index = tour.index(prev_node) + 1
+        tour.insert(insert_index, node)
+        total_delta += insert_cost
+
+        # Re-optimize around insertion point, until neither move type finds any further improvement.
+        index_range = (insert_index - window, insert_index + window)
+        while True:
+            delta = improve_two_opt(matrix, tour, index_range) + improve_or_opt(matrix, tour, index_range=index_range)
+            if delta == 0:
+                break
+            total_delta += delta
+
+    return total_delta
+
+# endregion Repair
+
+
+# region Annealing
+
+class TourAnnealer:
+    """
+    Anytime tour optimizer, via simulated annealing.
+
+    Each step proposes a random 2-opt reversal or Or-opt relocation, scored by its constant-time change in cost.
+    Improving moves are always taken. Worsening moves are taken with a chance of exp(-delta / temperature), where the
+    temperature slowly cools over time. This lets the search climb back out of the local optima that plain local search
+    stops at.
+
+    Runs in bursts of a given time budget. All search state is kept between bursts, so optimization can be paused and
+    resumed freely, such as once per frame. The best tour found so far is always kept.
+
+    Annealing is finished once frozen. Given a ConvergenceMonitor, it also finishes as soon as the monitor sees that it
+    has stopped improving, once past the first ANNEAL_MONITOR_START of its schedule. Either way, the reason is kept in
+    "stop_reason".
+    """
+    def __init__(self, matrix, tour, seed=None, cooling_steps=None, monitor=None, lower_bound=0):
+        """
+        :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+        :param tour: Starting tour. Starts at node 0, which is never moved.
+        :param seed: Optional random seed, for repeatable runs.
+        :param cooling_steps: Optional number of steps until annealer is frozen. Defaults to ANNEAL_STEPS_PER_NODE for
+            each node.
+        :param monitor: Optional ConvergenceMonitor, to finish early once annealing stops improving.
+        :param lower_bound: Best known lower bound on optimal tour cost, for monitor to measure gap against.
+        """
+        logger.debug('TourAnnealer.__init__()')
+
+        self.matrix = matrix
+        self.tour = list(tour)
+        self.cost = calc_tour_cost(matrix, self.tour)
+        self.best_tour = list(self.tour)
+        self.best_cost = self.cost
+        self.random = random.Random(seed)
+        self.step_count = 0
+        self.monitor = monitor
+        self.lower_bound = lower_bound
+        self.stop_reason = None
+        self.elapsed_ms = 0
+
+        # Track position of each node in tour, plus the nearest other nodes to each node.
+        self.positions = [0] * len(matrix)
+        for index, node in enumerate(self.tour):
+            self.positions[node] = index
+        self.neighbor_nodes = [
+            sorted(
+                (other_node for other_node in range(len(matrix)) if other_node != node),
+                key=lambda other_node: (min(matrix[node][other_node], matrix[other_node][node]), other_node),
+            )[:ANNEAL_NEIGHBOR_COUNT] or [node]
+            for node in range(len(matrix))
+        ]
+
+        # Set temperature schedule, based on the size of moves typically available from starting tour.
+        start_temperature = self._calc_start_temperature()
+        if cooling_steps is None:
+            cooling_steps = ANNEAL_STEPS_PER_NODE * len(self.tour)
+        cooling_steps = max(1, cooling_steps)
+        self.temperature = start_temperature
+        self.min_temperature = start_temperature * ANNEAL_COOLING_FACTOR
+        self.cooling_rate = ANNEAL_COOLING_FACTOR ** (1 / cooling_steps)
+        self.monitor_start_step = cooling_steps * ANNEAL_MONITOR_START
+
+    @property
+    def is_frozen(self):
+        """
+        :return: True if temperature has fully cooled, or tour is too small to have any moves. Further runs do nothing.
+        """
+        return len(self.tour) < 3 or self.temperature <= self.min_temperature
+
+    @property
+    def is_finished(self):
+        """
+        :return: True if annealer is frozen, or has stopped improving. Further runs do nothing.
+        """
+        if self.stop_reason is None and self.is_frozen:
+            self.stop_reason = 'frozen'
+        return self.stop_reason is not None
+
+    def _calc_start_temperature(self, sample_count=100):
+        """
+        :param sample_count: Number of random moves to sample.
+        :return: Temperature at which a move of average worsening cost is taken at the ANNEAL_START_ACCEPTANCE rate.
+        """
+        if len(self.tour) < 3:
+            return 0
+
+        worsening_deltas = []
+        for _ in range(sample_count):
+            proposal = self._propose_move()
+            if proposal is not None and proposal[0] > 0:
+                worsening_deltas.append(proposal[0])
+        if not worsening_deltas:
+            return 1
+
+        return (sum(worsening_deltas) / len(worsening_deltas)) / -math.log(ANNEAL_START_ACCEPTANCE)
+
+    def run(self, budget_ms=None, on_improve=None):
+        """
+        Runs annealing until either the time budget is spent, or the annealer is finished.
+        :param budget_ms: Time budget, in milliseconds. If None, runs until finished. Results then only depend on seed,
+            unless the monitor checks improvement rate.
+        :param on_improve: Optional function to call with (best tour, best cost), each time a new best tour is found.
+        :return: True if a new best tour was found during run | False otherwise.
+        """
+        start_time = time.perf_counter()
+        end_time = math.inf if budget_ms is None else start_time + budget_ms / 1000
+        improved = False
+        random_value = self.random.random
+        while not self.is_finished:
+            # Only check the clock every so often, as it costs about as much as a step.
+            for _ in range(64):
+                proposal = self._propose_move()
+                if proposal is None:
+                    continue
+                delta, move = proposal
+                if delta <= 0 or random_value() < math.exp(-delta / self.temperature):
+                    self._apply_move(move)
+                    self.cost += delta
+                    if self.cost < self.best_cost:
+                        self.best_cost = self.cost
+                        self.best_tour = list(self.tour)
+                        improved = True
+                        if on_improve is not None:
+                            on_improve(self.best_tour, self.best_cost)
+                self.temperature *= self.cooling_rate
+            self.step_count += 64
+
+            curr_time = time.perf_counter()
+            if self.monitor is not None and self.step_count >= self.monitor_start_step:
+                elapsed_ms = self.elapsed_ms + (curr_time - start_time) * 1000
+                self.stop_reason = self.monitor.update(self.best_cost, self.lower_bound, 64, elapsed_ms)
+            if curr_time >= end_time:
+                break
+
+        self.elapsed_ms += (time.perf_counter() - start_time) * 1000
+        return improved
+
+    def _propose_move(self):
+        """
+        Picks a random 2-opt or Or-opt move, and finds its change in tour cost. Tour itself is left as-is.
+
+        Moves are built around a random node and one of its nearest neighbors, such that the move adds an edge between
+        the two. Moves between far-apart nodes are almost never worth taking, so are never proposed.
+        :return: Tuple of (change in cost, move data to pass to _apply_move()) | None if picked move is not valid.
+        """
+        tour = self.tour
+        matrix = self.matrix
+        node_count = len(tour)
+        randint = self.random.randint
+
+        # Pick node, plus a random near neighbor of it.
+        node_index = randint(0, node_count - 1)
+        node = tour[node_index]
+        neighbor_nodes = self.neighbor_nodes[node]
+        neighbor_index = self.positions[neighbor_nodes[randint(0, len(neighbor_nodes) - 1)]]
+
+        if randint(0, 1):
+            # 2-opt. Reverse segment so that node and neighbor end up adjacent.
+            if neighbor_index > node_index + 1:
+                first_index, last_index = node_index + 1, neighbor_index
+            elif neighbor_index < node_index - 1:
+                first_index, last_index = neighbor_index + 1, node_index
+            else:
+                return None
+
+            prev_row = matrix[tour[first_index - 1]]
+            first_node = tour[first_index]
+            last_node = tour[last_index]
+            delta = prev_row[last_node] - prev_row[first_node]
+            if last_index + 1 < node_count:
+                next_node = tour[last_index + 1]
+                delta += matrix[first_node][next_node] - matrix[last_node][next_node]
+            return delta, (first_index, last_index, None, False)
+
+        # Or-opt. Move segment starting at neighbor, to sit directly after node. Roomba node can never be moved.
+        segment_length = randint(1, OR_OPT_MAX_SEGMENT)
+        first_index = neighbor_index
+        after_index = first_index + segment_length
+        insert_index = node_index
+        if first_index < 1 or after_index > node_count or first_index - 1 <= insert_index < after_index:
+            return None
+        is_reversed = bool(randint(0, 1))
+
+        first_node = tour[first_index]
+        last_node = tour[after_index - 1]
+        prev_node = tour[first_index - 1]
+        delta = -matrix[prev_node][first_node]
+        if after_index < node_count:
+            next_node = tour[after_index]
+            delta += matrix[prev_node][next_node] - matrix[last_node][next_node]
+
+        if is_reversed:
+            first_node, last_node = last_node, first_node
+        delta += matrix[node][first_node]
+        if insert_index + 1 < node_count:
+            insert_next_node = tour[insert_index + 1]
+            delta += matrix[last_node][insert_next_node] - matrix[node][insert_next_node]
+
+        return delta, (first_index, after_index - 1, insert_index, is_reversed)
+
+    def _apply_move(self, move):
+        """
+        Applies a move, as proposed by _propose_move().
+        :param move: Move data.
+        """
+        _apply_tour_move(self.tour, self.positions, move)
+
+
+def _apply_tour_move(tour, positions, move):
+    """
+    Applies a 2-opt or Or-opt move to tour in place.
+    :param tour: List of node indexes, in visiting order.
+    :param positions: Index of each node within tour. Updated for only the nodes that moved.
+    :param move: Tuple of (first index, last index, index to insert after or None, is reversed). A move with no insert
+        index reverses the segment in place. Otherwise segment is relocated to sit after the insert index, as it was
+        before the segment was cut out.
+    """
+    first_index, last_index, insert_index, is_reversed = move
+    if insert_index is None:
+        tour[first_index:last_index + 1] = tour[last_index:first_index - 1:-1]
+        changed_start, changed_end = first_index, last_index
+
+    else:
+        segment = tour[first_index:last_index + 1]
+        if is_reversed:
+            segment.reverse()
+        del tour[first_index:last_index + 1]
+        if insert_index > first_index:
+            insert_index -= len(segment)
+            changed_start, changed_end = first_index, insert_index + len(segment)
+        else:
+            changed_start, changed_end = insert_index + 1, last_index
+        tour[insert_index + 1:insert_index + 1] = segment
+
+    for index in range(changed_start, changed_end + 1):
+        positions[tour[index]] = index
+
+# endregion Annealing
+
+
+# region Background Improvement
+
+class TourImprover:
+    """
+    Background thread that keeps annealing the most recently submitted tour, while the main program loop runs.
+
+    Each submitted job holds its own immutable snapshot of the cost matrix, so the worker never reads any live program
+    data. Submitting a new job cancels the current one, which the worker notices within one burst of work.
+
+    Improvements are published as a single (job token, tour, cost) tuple, replaced in one assignment. So readers never
+    need a lock, and never see a partially written result.
+    """
+    def __init__(self, burst_ms=IMPROVER_BURST_MS):
+        """
+        :param burst_ms: Time worker spends annealing between checks for cancellation, in milliseconds.
+        """
+        logger.debug('TourImprover.__init__()')
+
+        self.burst_ms = burst_ms
+        self.result = None
+        self._job = None
+        self._is_stopped = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='TourImprover', daemon=True)
+
+    def start(self):
+        """
+        Starts worker thread.
+        """
+        logger.debug('TourImprover.start()')
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops worker thread, and waits for it to exit.
+        """
+        logger.debug('TourImprover.stop()')
+        with self._condition:
+            self._is_stopped = True
+            self._job = None
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def submit(self, job_token, matrix, tour, monitor=None, lower_bound=0):
+        """
+        Starts improving a new tour, cancelling any current job.
+        :param job_token: Object identifying the job. Published results hold the same object.
+        :param matrix: Tour cost matrix. A private snapshot is taken, so caller may freely change it afterwards.
+        :param tour: Starting tour. Starts at node 0, which is never moved.
+        :param monitor: Optional new ConvergenceMonitor, to finish job early once annealing stops improving. Only ever
+            used by the worker afterwards.
+        :param lower_bound: Best known lower bound on optimal tour cost, for monitor to measure gap against.
+        """
+        logger.debug('TourImprover.submit()')
+        job = (job_token, tuple(tuple(row) for row in matrix), tuple(tour), monitor, lower_bound)
+        with self._condition:
+            self._job = job
+            self.result = None
+            self._condition.notify()
+
+    def cancel(self):
+        """
+        Cancels current job, if any.
+        """
+        with self._condition:
+            self._job = None
+            self.result = None
+
+    def _run(self):
+        """
+        Worker thread logic. Waits for jobs, then anneals each one until it is finished or cancelled.
+        """
+        while True:
+            with self._condition:
+                while self._job is None and not self._is_stopped:
+                    self._condition.wait()
+                if self._is_stopped:
+                    return
+                job = self._job
+
+            job_token, matrix, tour, monitor, lower_bound = job
+            annealer = TourAnnealer(matrix, tour, monitor=monitor, lower_bound=lower_bound)
+
+            def _on_improve(best_tour, best_cost):
+                if self._job is job:
+                    self.result = (job_token, tuple(best_tour), best_cost)
+
+            while self._job is job and not annealer.is_finished:
+                annealer.run(self.burst_ms, on_improve=_on_improve)
+            if annealer.stop_reason is not None:
+                logger.info('Background path improvement stopped: {0}'.format(annealer.stop_reason))
+
+            # Job is finished. Wait for next one, unless already replaced.
+            with self._condition:
+                if self._job is job:
+                    self._job = None
+
+# endregion Background Improvement
+
+
+# region Multi-Start
+
+def calc_multi_start_tour(matrix, tour, start_count, seed=0, max_workers=None):
+    """
+    Runs several independent annealing chains from the same starting tour, then keeps the best tour of them all.
+
+    Chain N always uses a random seed of (seed + N), and each chain runs a fixed number of steps, rather than for a
+    fixed time. So results are fully reproducible, no matter how chains end up split across processes.
+
+    Chains are split across a pool of worker processes, where possible. Workers only ever receive the plain cost matrix.
+    :param matrix: Tour cost matrix. Costs between trash tile nodes must be symmetric.
+    :param tour: Starting tour. Starts at node 0, which is never moved.
+    :param start_count: Number of chains to run.
+    :param seed: Random seed of first chain.
+    :param max_workers: Max number of worker processes. Defaults to number of CPUs.
+    :return: Best tour found, as list of node indexes. Starting tour is returned if no chain improves on it.
+    """
+    logger.debug('calc_multi_start_tour()')
+
+    chain_seeds = [seed + chain_index for chain_index in range(start_count)]
+    worker_count = min(max_workers or os.cpu_count() or 1, start_count)
+    results = None
+    if worker_count > 1 and len(tour) > 2:
+        # Split chains into one contiguous chunk per worker.
+        chunk_size = -(-start_count // worker_count)
+        chunks = [chain_seeds[index:(index + chunk_size)] for index in range(0, start_count, chunk_size)]
+        try:
+            process_pool = get_process_pool(worker_count)
+            results = []
+            for chunk_results in process_pool.map(
+                _calc_multi_start_worker,
+                [matrix] * len(chunks),
+                [tour] * len(chunks),
+                chunks,
+            ):
+                results += chunk_results
+        except (BrokenProcessPool, OSError) as err:
+            logger.warning('Process pool failed ({0}). Running tour search in-process instead.'.format(err))
+            shutdown_process_pool()
+            results = None
+
+    if results is None:
+        results = _calc_multi_start_worker(matrix, tour, chain_seeds)
+
+    # Keep best tour. Ties go to the earliest chain, so that worker timing never affects the result.
+    best_tour = list(tour)
+    best_cost = calc_tour_cost(matrix, best_tour)
+    for chain_tour, chain_cost in results:
+        logger.debug('    chain cost: {0}'.format(chain_cost))
+        if chain_cost < best_cost:
+            best_tour = list(chain_tour)
+            best_cost = chain_cost
+
+    return best_tour
+
+
+def _calc_multi_start_worker(matrix, tour, chain_seeds):
+    """
+    Process pool entry point. Runs one annealing chain per seed, polishing each result with local search.
+    :return: List of (tour, cost) tuples, in same order as seeds.
+    """
+    results = []
+    for chain_seed in chain_seeds:
+        annealer = TourAnnealer(
+            matrix,
+            tour,
+            seed=chain_seed,
+            cooling_steps=MULTI_START_STEPS_PER_NODE * len(tour),
+        )
+        annealer.run()
+        chain_tour = annealer.best_tour
+        improve_tour(matrix, chain_tour)
+        results.append((chain_tour, calc_tour_cost(matrix, chain_tour)))
+
+    return results
+
+# endregion Multi-Start
+
+
+# region Hierarchical Planning
+
+def calc_tour_clusters(matrix, cluster_count, iteration_count=CLUSTER_ITERATIONS):
+    """
+    Groups all trash tile nodes into clusters of nearby nodes, via k-medoids on the true tour costs.
+
+    Medoids are seeded by splitting a quick candidate tour into equal runs, and taking the middle node of each. Runs of
+    a good tour already make compact groups, and also come in a good visiting order, which clusters keep. Each
+    iteration then assigns every node to its nearest medoid, and moves each medoid to whichever of its cluster's nodes
+    has the lowest total cost to all the others. Stops early once no medoid moves.
+
+    Nearest medoids are found with a single combined search, and costs within each cluster are filled as a block. So no
+    full rows are ever needed.
+    :param matrix: Candidate cost matrix.
+    :param cluster_count: Number of clusters to create. Capped at the number of trash tile nodes.
+    :param iteration_count: Max number of k-medoids iterations.
+    :return: List of cluster dicts, in visiting order. See calc_hierarchical_tour().
+    """
+    logger.debug('calc_tour_clusters()')
+
+    # Seed medoids from equal runs of a quick tour.
+    seed_tour = build_candidate_tour(matrix)
+    node_count = len(seed_tour) - 1
+    cluster_count = max(1, min(cluster_count, node_count))
+    medoids = []
+    for cluster_index in range(cluster_count):
+        run_start = 1 + cluster_index * node_count // cluster_count
+        run_end = 1 + (cluster_index + 1) * node_count // cluster_count
+        medoids.append(seed_tour[(run_start + run_end) // 2])
+
+    cluster_nodes = _assign_cluster_nodes(matrix, medoids)
+    for _ in range(iteration_count):
+        new_medoids = []
+        for members in cluster_nodes:
+            matrix.fill_block(members)
+            new_medoids.append(min(members, key=lambda node: sum(map(matrix[node].__getitem__, members))))
+        if new_medoids == medoids:
+            break
+
+        medoids = new_medoids
+        cluster_nodes = _assign_cluster_nodes(matrix, medoids)
+
+    return [
+        {'medoid': medoid, 'members': members, 'tour': None}
+        for medoid, members in zip(medoids, cluster_nodes)
+        if members
+    ]
+
+
+def _assign_cluster_nodes(matrix, medoids):
+    """
+    :param matrix: Candidate cost matrix.
+    :param medoids: List of medoid nodes, one per cluster.
+    :return: List of member node lists, one per cluster. Each node belongs to the cluster of its nearest medoid.
+    """
+    cluster_nodes = [[] for _ in medoids]
+    for node, cluster_index in enumerate(matrix.find_nearest(medoids)[1:], start=1):
+        cluster_nodes[cluster_index].append(node)
+    return cluster_nodes
+
+
+def add_cluster_nodes(matrix, clusters, new_nodes):
+    """
+    Adds new trash tile nodes to existing clusters, each joining the cluster of its nearest medoid. Only clusters that
+    gain nodes have their sub-tour cleared, so every other cluster keeps its sub-tour as-is.
+
+    Any cluster that has lost its medoid is first given a new one, from the middle of its sub-tour.
+    :param matrix: Candidate cost matrix.
+    :param clusters: List of cluster dicts. See calc_hierarchical_tour(). Updated in place.
+    :param new_nodes: List of nodes to add.
+    """
+    logger.debug('add_cluster_nodes()')
+
+    for cluster in clusters:
+        if cluster['medoid'] is None:
+            cluster['medoid'] = cluster['members'][len(cluster['members']) // 2]
+
+    for node in new_nodes:
+        node_row = matrix.fill_row(node)
+        cluster = min(clusters, key=lambda cluster: node_row[cluster['medoid']])
+        cluster['members'].append(node)
+        cluster['tour'] = None
+
+
+def calc_hierarchical_tour(matrix, clusters, max_workers=None):
+    """
+    Builds tour "cluster first, route second", visiting clusters in the given order.
+
+    Each cluster gets its own sub-tour, which starts from the previous cluster's medoid (or the roomba), and ends as
+    near as possible to the next cluster's medoid. So sub-tours only ever depend on the cluster order, and not on each
+    other.
+    Sub-tours are then joined, and the full tour is improved with candidate moves, to smooth out the joins between
+    clusters. Lastly, clusters are updated to match the improved tour. See _split_cluster_tours().
+
+    Sub-tours are independent, so they are split across a pool of worker processes, where possible. Only clusters
+    without a sub-tour are solved, and any existing sub-tour is kept as-is.
+    :param matrix: Candidate cost matrix.
+    :param clusters: List of cluster dicts, in visiting order. Each holds:
+        * "medoid" - Node that best represents cluster.
+        * "members" - List of all nodes in cluster.
+        * "tour" - Order of visiting all member nodes | None if not yet solved.
+    :param max_workers: Max number of worker processes. Defaults to number of CPUs.
+    :return: Tuple of (tour, updated list of cluster dicts in visiting order, all with their sub-tours solved).
+    """
+    logger.debug('calc_hierarchical_tour()')
+
+    # Each sub-tour starts from the previous medoid, and heads towards the next.
+    start_nodes = [0] + [cluster['medoid'] for cluster in clusters[:-1]]
+    end_nodes = [cluster['medoid'] for cluster in clusters[1:]] + [None]
+
+    # Solve all missing sub-tours.
+    unsolved_indexes = [index for index, cluster in enumerate(clusters) if cluster['tour'] is None]
+    sub_matrices = []
+    member_counts = []
+    for index in unsolved_indexes:
+        members = clusters[index]['members']
+        matrix.fill_block(members)
+        anchor_nodes = [node for node in (start_nodes[index], end_nodes[index]) if node]
+        if anchor_nodes:
+            matrix.fill_block(anchor_nodes, members)
+        sub_matrices.append(_build_cluster_matrix(matrix, start_nodes[index], members, end_nodes[index]))
+        member_counts.append(len(members))
+    sub_tours = _calc_cluster_tours(sub_matrices, member_counts, max_workers)
+    for index, sub_tour in zip(unsolved_indexes, sub_tours):
+        members = clusters[index]['members']
+        clusters[index]['tour'] = [members[node - 1] for node in sub_tour]
+
+    # Join sub-tours, then smooth out the joins. Cost of each join is found first, as only nearby costs are known.
+    tour = [0]
+    for cluster in clusters:
+        matrix.get_cost(tour[-1], cluster['tour'][0])
+        tour += cluster['tour']
+    improve_candidate_tour(matrix, tour)
+
+    return tour, _split_cluster_tours(tour, clusters)
+
+
+def _build_cluster_matrix(matrix, start_node, members, end_node):
+    """
+    Builds standalone tour cost matrix for a single cluster's sub-tour.
+
+    Node 0 is the start node, followed by each member node in order. If given, the end node is added last, with the
+    extra "_CLUSTER_END_COST" on all its edges. So the best tour through all nodes always visits it last, and ends at
+    the member nearest to it.
+    :param matrix: Candidate cost matrix. Costs from start and end nodes to members must be filled, as well as costs
+        among members.
+    :param start_node: Node that sub-tour starts from.
+    :param members: List of member nodes of cluster.
+    :param end_node: Node that sub-tour heads towards | None to end anywhere.
+    :return: Cluster cost matrix, as list of int lists.
+    """
+    start_row = matrix[start_node]
+    sub_matrix = [[0] + [start_row[node] for node in members]]
+    for node in members:
+        node_row = matrix[node]
+        sub_matrix.append([0] + [node_row[other_node] for other_node in members])
+
+    if end_node is not None:
+        end_row = matrix[end_node]
+        end_costs = [end_row[node] + _CLUSTER_END_COST for node in members]
+        sub_matrix[0].append(2 * _CLUSTER_END_COST)
+        for sub_row, end_cost in zip(sub_matrix[1:], end_costs):
+            sub_row.append(end_cost)
+        sub_matrix.append([0] + end_costs + [0])
+
+    return sub_matrix
+
+
+def _calc_cluster_tours(sub_matrices, member_counts, max_workers=None):
+    """
+    Solves a sub-tour for each cluster cost matrix, split across worker processes where possible.
+    :param sub_matrices: List of cluster cost matrices. See _build_cluster_matrix().
+    :param member_counts: Number of member nodes in each cluster cost matrix.
+    :param max_workers: Max number of worker processes. Defaults to number of CPUs.
+    :return: List of sub-tours, one per cost matrix, each as list of member node indexes (starting at 1).
+    """
+    sub_tours = None
+    worker_count = min(max_workers or os.cpu_count() or 1, len(sub_matrices))
+    if worker_count > 1:
+        # Split clusters into one contiguous chunk per worker.
+        chunk_size = -(-len(sub_matrices) // worker_count)
+        chunk_starts = range(0, len(sub_matrices), chunk_size)
+        try:
+            process_pool = get_process_pool(worker_count)
+            sub_tours = []
+            for chunk_sub_tours in process_pool.map(
+                _calc_cluster_tours_worker,
+                [sub_matrices[index:(index + chunk_size)] for index in chunk_starts],
+                [member_counts[index:(index + chunk_size)] for index in chunk_starts],
+            ):
+                sub_tours += chunk_sub_tours
+        except (BrokenProcessPool, OSError) as err:
+            logger.warning('Process pool failed ({0}). Running cluster planning in-process instead.'.format(err))
+            shutdown_process_pool()
+            sub_tours = None
+
+    if sub_tours is None:
+        sub_tours = _calc_cluster_tours_worker(sub_matrices, member_counts)
+
+    return sub_tours
+
+
+def _calc_cluster_tours_worker(sub_matrices, member_counts):
+    """
+    Process pool entry point. Solves the sub-tour of each cluster cost matrix, via construction and local search.
+    :return: List of sub-tours, in same order as cost matrices. Start node and any end node are left out.
+    """
+    sub_tours = []
+    for sub_matrix, member_count in zip(sub_matrices, member_counts):
+        tour = calc_initial_tour(sub_matrix)
+        improve_tour(sub_matrix, tour)
+
+        # Drop any end node. Always last, as any other position costs an extra "_CLUSTER_END_COST".
+        sub_tours.append([node for node in tour[1:] if node <= member_count])
+
+    return sub_tours
+
+
+def _split_cluster_tours(tour, clusters):
+    """
+    Splits a full tour back into one sub-tour per cluster, so that every cluster is once again a single run of the tour.
+
+    Improving the joined tour may move a few nodes across the joins between clusters. So each cluster keeps only its
+    longest run of nodes, and any shorter runs are merged into the cluster run just before them.
+    :param tour: Full tour, made by joining the sub-tours of all clusters.
+    :param clusters: List of cluster dicts, in visiting order.
+    :return: New list of cluster dicts, in visiting order.
+    """
+    cluster_indexes = {}
+    for cluster_index, cluster in enumerate(clusters):
+        for node in cluster['tour']:
+            cluster_indexes[node] = cluster_index
+
+    # Find each run of consecutive nodes from the same cluster, and the longest run of each cluster.
+    runs = []
+    for node in tour[1:]:
+        cluster_index = cluster_indexes[node]
+        if runs and runs[-1][0] == cluster_index:
+            runs[-1][1].append(node)
+        else:
+            runs.append((cluster_index, [node]))
+    longest_runs = {}
+    for cluster_index, run_nodes in runs:
+        if len(run_nodes) > len(longest_runs.get(cluster_index, ())):
+            longest_runs[cluster_index] = run_nodes
+
+    new_clusters = []
+    pending_nodes = []
+    for cluster_index, run_nodes in runs:
+        if run_nodes is not longest_runs[cluster_index]:
+            if new_clusters:
+                new_clusters[-1]['tour'] += run_nodes
+            else:
+                pending_nodes += run_nodes
+            continue
+
+        medoid = clusters[cluster_index]['medoid']
+        sub_tour = pending_nodes + run_nodes
+        pending_nodes = []
+        new_clusters.append({'medoid': medoid, 'members': sub_tour, 'tour': sub_tour})
+
+    # Any medoid that was moved out of its cluster is replaced.
+    for cluster in new_clusters:
+        if cluster['medoid'] not in cluster['tour']:
+            cluster['medoid'] = cluster['tour'][len(cluster['tour']) // 2]
+
+    return new_clusters
+
+# endregion Hierarchical Planning
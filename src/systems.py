@@ -11,7 +11,18 @@ from abc import ABC
 # User Imports.
 from src.entities.system_entities import AI, Movement
 from src.logging import init_logging
-from src.misc import calc_trash_distances, calc_traveling_salesman, get_tile_coord_from_id, get_tile_from_id
+from src.misc import (
+    calc_distance_cost,
+    calc_trash_distances,
+    calc_traveling_salesman,
+    get_display_id,
+    get_optimality_gap,
+    get_route_cursor,
+    get_tile_coord_from_index,
+    get_tile_index,
+    repair_traveling_salesman,
+    update_trash_distances_for_trash,
+)
 
 
 # Initialize logger.
@@ -33,9 +44,12 @@ class SoftwareRendererSystem(sdl2.ext.SoftwareSpriteRenderSystem):
 
         # Also update dynamic GUI text elements.
         # Set "optimal calculated solution" text.
-        self.data_manager.gui.optimal_counter_text.update(
-            'Optimal Solution Cost: {0}'.format(self.data_manager.gui_data['optimal_counter']),
-        )
+        # Also show how far it may be from the truly optimal solution, if known.
+        optimal_counter_text = 'Optimal Solution Cost: {0}'.format(self.data_manager.gui_data['optimal_counter'])
+        optimality_gap = get_optimality_gap(self.data_manager)
+        if optimality_gap is not None:
+            optimal_counter_text += ' (Gap: {0:.1%})'.format(optimality_gap)
+        self.data_manager.gui.optimal_counter_text.update(optimal_counter_text)
         # Set "total moves taken" counter text.
         self.data_manager.gui.total_move_counter_text.update(
             'Moves: {0}'.format(self.data_manager.gui_data['total_move_counter']),
@@ -215,22 +229,39 @@ class AbstractMovementSystem(ABC):
         tile_y = int((sprite.y - self.data_manager.tile_data['max_pixel_north']) / 50)
         sprite.tile = tile_x, tile_y
 
+        # Advance along planned roomba route, if any.
+        route_cursor = self.data_manager.route_cursor
+        on_route = route_cursor is not None and route_cursor.advance(get_tile_index(self.data_manager, tile_x, tile_y))
+
         # Handle if trash exists on tile.
         curr_tile = self.data_manager.tile_set.tiles[tile_y][tile_x]
         roomba_location = self.data_manager.roomba.sprite.tile
         logger.debug('roomba_location: {0}'.format(roomba_location))
+        trash_changed = False
         if roomba_location[0] == tile_x and roomba_location[1] == tile_y and curr_tile.trashpile.exists:
             curr_tile.trashpile.clean()
+            trash_changed = True
 
         # Handle if roomba is set to allow "failing".
         # Such an instance causes 10% chance of trash pile appearing in square roomba just left.
         roomba_failed = False
         if self.data_manager.ai_can_fail:
             roomba_failed = self._trigger_failure(orig_x, orig_y)
-
-        # Recalculate path distances for new roomba location.
-        calc_trash_distances(self.data_manager, roomba_only=(not roomba_failed))
-        calc_traveling_salesman(self.data_manager, calc_new=roomba_failed, total_move_reset=False)
+            trash_changed = trash_changed or roomba_failed
+
+        # Update path distances for trash changes. Only the affected tiles are updated.
+        if trash_changed:
+            update_trash_distances_for_trash(self.data_manager)
+
+        # Recalculate roomba distances and overall path, unless roomba is still following a route that holds.
+        # Failures place trash, which invalidates the route. So the existing path is repaired to include the new trash,
+        # and the route is rebuilt from it on next AI tick.
+        if roomba_failed:
+            calc_trash_distances(self.data_manager, roomba_only=True)
+            repair_traveling_salesman(self.data_manager, total_move_reset=False)
+        elif not on_route:
+            calc_trash_distances(self.data_manager, roomba_only=True)
+            calc_traveling_salesman(self.data_manager, calc_new=False, total_move_reset=False)
 
         # Update for a movement.
         self.data_manager.gui_data['total_move_counter'] += 1
@@ -337,6 +368,9 @@ class AISystem(sdl2.ext.Applicator, AbstractMovementSystem):
 
                 else:
                     # Move roomba, based on current setting.
+                    # Only "full tile sight" follows planned routes. Other settings leave the route, so discard it.
+                    if self.data_manager.roomba_vision != -1:
+                        self.data_manager.route_cursor = None
 
                     # Check vision range.
                     if self.data_manager.roomba_vision == 0:
@@ -453,48 +487,62 @@ class AISystem(sdl2.ext.Applicator, AbstractMovementSystem):
             logger.debug('Setting "prev_direction" to {0}'.format(prev_direction))
             self.prev_direction = prev_direction
 
-    def move_full_sight(self, sprite, path_set=None):
+    def move_full_sight(self, sprite, end_tile_id=None):
         """
         Move roomba with "full sight" setting.
 
         Assumes some "outside entity" knows what the full environment setup is, and is feeding the roomba this
         information. Roomba intelligently attempts to take the "most efficient path" to get to all trash piles.
         :param sprite: Roomba sprite entity.
+        :param end_tile_id: Optional id of trash tile to move towards. Defaults to following the planned route, which
+            visits tiles in order of the "calculated ideal path".
         """
-        if path_set is None:
-            # Get first set in "calculated ideal path".
-            end_tile_group_id = self.data_manager.ideal_overall_path['ordering'][1]
-            path_set = self.data_manager.ideal_trash_paths['roomba'][end_tile_group_id]
-
-        # Get first tile in path set.
-        curr_tile_id = path_set[0]
-        desired_next_tile_id = path_set[1]
-        curr_tile_x, curr_tile_y = get_tile_coord_from_id(curr_tile_id)
-        desired_tile_x, desired_tile_y = get_tile_coord_from_id(desired_next_tile_id)
-
-        # Determine which direction we move, in order to reach desired tile.
-        if curr_tile_x != desired_tile_x:
-            # Moving east/west.
+        if end_tile_id is None:
+            # Stream next move from planned route. Route is only replanned when the environment changes.
+            direction = get_route_cursor(self.data_manager).get_next_direction()
+            if direction is None:
+                # Route has no moves left, such as when remaining trash is walled off. Revert to "bump sensor" mode.
+                logger.warning('No moves left in planned route.')
+                self.move_bump_sensor(sprite)
+                return
+
+        else:
+            # Step down distance gradient towards desired trash tile.
+            next_tile_id = self.data_manager.trash_distances.get_next_step('roomba', end_tile_id)
+            if next_tile_id is None:
+                # Trash tile is walled off. Revert to "bump sensor" mode.
+                logger.warning('No path exists to trash tile ({0}).'.format(
+                    get_display_id(self.data_manager, end_tile_id),
+                ))
+                self.move_bump_sensor(sprite)
+                return
+
+            # Get current and next tile locations.
+            curr_tile_x, curr_tile_y = sprite.tile
+            desired_tile_x, desired_tile_y = get_tile_coord_from_index(self.data_manager, next_tile_id)
+
+            # Determine which direction we move, in order to reach desired tile.
             if curr_tile_x < desired_tile_x:
-                # Move east.
-                self.move_east(sprite)
-                self.prev_direction = 'east'
+                direction = 'east'
+            elif curr_tile_x > desired_tile_x:
+                direction = 'west'
+            elif curr_tile_y < desired_tile_y:
+                direction = 'south'
+            elif curr_tile_y > desired_tile_y:
+                direction = 'north'
             else:
-                # Move west.
-                self.move_west(sprite)
-                self.prev_direction = 'west'
-        elif curr_tile_y != desired_tile_y:
-            # Moving north/south.
-            if curr_tile_y < desired_tile_y:
-                # Move south.
-                self.move_south(sprite)
-                self.prev_direction = 'south'
-            else:
-                # Move north.
-                self.move_north(sprite)
-                self.prev_direction = 'north'
+                raise RuntimeError('Unable to determine where to move.')
+
+        # Move roomba.
+        if direction == 'north':
+            self.move_north(sprite)
+        elif direction == 'east':
+            self.move_east(sprite)
+        elif direction == 'south':
+            self.move_south(sprite)
         else:
-            raise RuntimeError('Unable to determine where to move.')
+            self.move_west(sprite)
+        self.prev_direction = direction
 
     def move_limited_vision(self, sprite):
         """
@@ -514,114 +562,24 @@ class AISystem(sdl2.ext.Applicator, AbstractMovementSystem):
             )
             raise RuntimeError(err_msg)
 
-        # Compile list of all tiles within current vision range.
-        tiles_in_vision = []
+        # Find closest trash tile within current vision range.
+        # Roomba has x-ray vision, so vision distance ignores walls. Ties go to the lowest tile id.
         roomba_x, roomba_y = sprite.tile
-        x_index = 0
-        while x_index <= vision_radius:
-            y_index = 0
-
-            while x_index + y_index <= vision_radius:
-                # Handle for (+x/+y) tiles.
-                tile_x = roomba_x + x_index
-                tile_y = roomba_y + y_index
-
-                # Skip bad tile coord locations.
-                if (
-                    # Skip tile roomba is on.
-                    (roomba_x == tile_x and roomba_y == tile_y) or
-                    # Skip already-checked tiles.
-                    ('{0}, {1}'.format(tile_x, tile_y) in tiles_in_vision) or
-                    # Skip tiles with invalid x-axises.
-                    (tile_x < 0 or tile_x > (self.data_manager.tile_data['tile_w_count'] - 1)) or
-                    # Skip tiles with invalid y-axises.
-                    (tile_y < 0 or tile_y > (self.data_manager.tile_data['tile_h_count'] - 1))
-                ):
-                    pass
-                else:
-                    # Append tile to list.
-                    tiles_in_vision.append('{0}, {1}'.format(tile_x, tile_y))
-
-                # Handle for (+x/-y) tiles.
-                tile_x = roomba_x + x_index
-                tile_y = roomba_y - y_index
-
-                # Skip bad tile coord locations.
-                if (
-                    # Skip tile roomba is on.
-                    (roomba_x == tile_x and roomba_y == tile_y) or
-                    # Skip already-checked tiles.
-                    ('{0}, {1}'.format(tile_x, tile_y) in tiles_in_vision) or
-                    # Skip tiles with invalid x-axises.
-                    (tile_x < 0 or tile_x > (self.data_manager.tile_data['tile_w_count'] - 1)) or
-                    # Skip tiles with invalid y-axises.
-                    (tile_y < 0 or tile_y > (self.data_manager.tile_data['tile_h_count'] - 1))
-                ):
-                    pass
-                else:
-                    # Append tile to list.
-                    tiles_in_vision.append('{0}, {1}'.format(tile_x, tile_y))
-
-                # Handle for (-x/+y) tiles.
-                tile_x = roomba_x - x_index
-                tile_y = roomba_y + y_index
-
-                # Skip bad tile coord locations.
-                if (
-                    # Skip tile roomba is on.
-                    (roomba_x == tile_x and roomba_y == tile_y) or
-                    # Skip already-checked tiles.
-                    ('{0}, {1}'.format(tile_x, tile_y) in tiles_in_vision) or
-                    # Skip tiles with invalid x-axises.
-                    (tile_x < 0 or tile_x > (self.data_manager.tile_data['tile_w_count'] - 1)) or
-                    # Skip tiles with invalid y-axises.
-                    (tile_y < 0 or tile_y > (self.data_manager.tile_data['tile_h_count'] - 1))
-                ):
-                    pass
-                else:
-                    # Append tile to list.
-                    tiles_in_vision.append('{0}, {1}'.format(tile_x, tile_y))
-
-                # Handle for (-x/-y) tiles.
-                tile_x = roomba_x - x_index
-                tile_y = roomba_y - y_index
-
-                # Skip bad tile coord locations.
-                if (
-                    # Skip tile roomba is on.
-                    (roomba_x == tile_x and roomba_y == tile_y) or
-                    # Skip already-checked tiles.
-                    ('{0}, {1}'.format(tile_x, tile_y) in tiles_in_vision) or
-                    # Skip tiles with invalid x-axises.
-                    (tile_x < 0 or tile_x > (self.data_manager.tile_data['tile_w_count'] - 1)) or
-                    # Skip tiles with invalid y-axises.
-                    (tile_y < 0 or tile_y > (self.data_manager.tile_data['tile_h_count'] - 1))
-                ):
-                    pass
-                else:
-                    # Append tile to list.
-                    tiles_in_vision.append('{0}, {1}'.format(tile_x, tile_y))
-
-                y_index += 1
-
-            x_index += 1
-
-        # Ensure no duplicates are in set.
-        tiles_in_vision = list(set(tiles_in_vision))
-
-        # Loop through set of tiles and go to first found trash tile (if any).
-        has_moved = False
-        for tile_id in tiles_in_vision:
-            next_tile = get_tile_from_id(self.data_manager, tile_id)
-
-            # Check if trash exists at location.
-            if next_tile.trashpile.exists:
-                # Trash exists. Attempt to move to location.
-                path_set = self.data_manager.ideal_trash_paths['roomba'][tile_id]
-                self.move_full_sight(sprite, path_set=path_set)
-                has_moved = True
-                break
-
-        if has_moved is False:
+        closest_tile_id = None
+        closest_distance = None
+        for tile_id in self.data_manager.graph.data['trash_tiles']:
+            tile_x, tile_y = get_tile_coord_from_index(self.data_manager, tile_id)
+            distance = calc_distance_cost(roomba_x, roomba_y, tile_x, tile_y)
+            if 0 < distance <= vision_radius and (
+                closest_tile_id is None or
+                (distance, tile_id) < (closest_distance, closest_tile_id)
+            ):
+                closest_tile_id = tile_id
+                closest_distance = distance
+
+        if closest_tile_id is not None:
+            # Trash exists. Walk down its distance gradient.
+            self.move_full_sight(sprite, end_tile_id=closest_tile_id)
+        else:
             # Failed to find any tiles within range. Revert to "bump sensor" mode.
             self.move_bump_sensor(sprite)